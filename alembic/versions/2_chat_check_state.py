@@ -0,0 +1,30 @@
+"""отметка, докуда каждый чат проверен по чс
+создано: 17.10.2026
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "002"
+down_revision: Union[str, None] = "001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+
+    op.create_table(
+        "chat_check_states",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("chat_id", sa.BigInteger, nullable=False, unique=True),
+        # максимальный blacklisted_users.id, который уже банили в этом чате
+        sa.Column("last_blacklist_id", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("last_checked_at", sa.DateTime, nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("chat_check_states")
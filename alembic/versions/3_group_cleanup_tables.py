@@ -0,0 +1,110 @@
+"""таблицы для GroupCleanupService: пользователи, группы, разрешенные, участники, логи
+создано: 17.10.2026
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "003"
+down_revision: Union[str, None] = "002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("telegram_id", sa.BigInteger, nullable=False, unique=True, index=True),
+        sa.Column("username", sa.String(255), nullable=True),
+        sa.Column("first_name", sa.String(255), nullable=True),
+        sa.Column("last_name", sa.String(255), nullable=True),
+        sa.Column("is_active", sa.Boolean, nullable=False, server_default=sa.true()),
+        sa.Column("is_admin", sa.Boolean, nullable=False, server_default=sa.false()),
+        sa.Column("created_at", sa.DateTime, server_default=sa.func.now(), nullable=False),
+        sa.Column("updated_at", sa.DateTime, server_default=sa.func.now(), nullable=False),
+    )
+
+    op.create_table(
+        "groups",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("telegram_id", sa.BigInteger, nullable=False, unique=True, index=True),
+        sa.Column("title", sa.String(255), nullable=True),
+        sa.Column("username", sa.String(255), nullable=True),
+        sa.Column("is_active", sa.Boolean, nullable=False, server_default=sa.true()),
+        sa.Column("created_at", sa.DateTime, server_default=sa.func.now(), nullable=False),
+    )
+
+    op.create_table(
+        "allowed_users",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column(
+            "user_id",
+            sa.Integer,
+            sa.ForeignKey("users.id", ondelete="CASCADE"),
+            nullable=False,
+            index=True,
+        ),
+        sa.Column(
+            "group_id",
+            sa.Integer,
+            sa.ForeignKey("groups.id", ondelete="CASCADE"),
+            nullable=False,
+            index=True,
+        ),
+        sa.Column("added_by", sa.Integer, nullable=True),
+        sa.Column("created_at", sa.DateTime, server_default=sa.func.now(), nullable=False),
+    )
+    op.create_index(
+        "idx_allowed_user_group", "allowed_users", ["user_id", "group_id"], unique=True
+    )
+
+    op.create_table(
+        "group_members",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column(
+            "user_id",
+            sa.Integer,
+            sa.ForeignKey("users.id", ondelete="CASCADE"),
+            nullable=False,
+            index=True,
+        ),
+        sa.Column(
+            "group_id",
+            sa.Integer,
+            sa.ForeignKey("groups.id", ondelete="CASCADE"),
+            nullable=False,
+            index=True,
+        ),
+        sa.Column("status", sa.String(50), nullable=False, server_default="member"),
+        sa.Column("joined_at", sa.DateTime, nullable=True),
+        sa.Column("last_seen", sa.DateTime, nullable=True),
+    )
+    op.create_index(
+        "idx_group_member_user_group", "group_members", ["user_id", "group_id"], unique=True
+    )
+
+    op.create_table(
+        "action_logs",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("action_type", sa.String(100), nullable=False, index=True),
+        sa.Column("user_id", sa.Integer, nullable=True),
+        sa.Column("group_id", sa.Integer, nullable=True, index=True),
+        sa.Column("target_user_id", sa.Integer, nullable=True),
+        sa.Column("details", sa.Text, nullable=True),
+        sa.Column("created_at", sa.DateTime, server_default=sa.func.now(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("action_logs")
+    op.drop_index("idx_group_member_user_group", table_name="group_members")
+    op.drop_table("group_members")
+    op.drop_index("idx_allowed_user_group", table_name="allowed_users")
+    op.drop_table("allowed_users")
+    op.drop_table("groups")
+    op.drop_table("users")
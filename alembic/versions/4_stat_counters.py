@@ -0,0 +1,37 @@
+"""счетчики для /stats вместо count(*) по таблицам
+создано: 17.10.2026
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "004"
+down_revision: Union[str, None] = "003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+
+    op.create_table(
+        "stat_counters",
+        sa.Column("name", sa.String(50), primary_key=True),
+        sa.Column("value", sa.BigInteger, nullable=False, server_default="0"),
+    )
+
+    # стартовые значения считаем один раз здесь, дальше их ведет репозиторий
+    op.execute(
+        "INSERT INTO stat_counters (name, value) "
+        "SELECT 'blacklist_count', count(*) FROM blacklisted_users"
+    )
+    op.execute(
+        "INSERT INTO stat_counters (name, value) "
+        "SELECT 'total_actions', count(*) FROM moderation_logs"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("stat_counters")
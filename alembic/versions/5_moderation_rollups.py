@@ -0,0 +1,30 @@
+"""почасовые итоги по moderation_logs для /stats за период
+создано: 17.10.2026
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "005"
+down_revision: Union[str, None] = "004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+
+    op.create_table(
+        "moderation_rollups",
+        sa.Column("hour", sa.DateTime, primary_key=True),
+        sa.Column("action", sa.String(50), primary_key=True),
+        # 0 - действия без чата (add/remove/import)
+        sa.Column("chat_id", sa.BigInteger, primary_key=True, server_default="0"),
+        sa.Column("count", sa.Integer, nullable=False, server_default="0"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("moderation_rollups")
@@ -0,0 +1,42 @@
+"""chat_id и индексы для moderation_logs
+создано: 17.10.2026
+
+В 001 таблица создавалась без chat_id, хотя модель и код его пишут.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "006"
+down_revision: Union[str, None] = "005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+
+    op.add_column("moderation_logs", sa.Column("chat_id", sa.BigInteger, nullable=True))
+
+    op.create_index(
+        "ix_moderation_logs_created_id", "moderation_logs", ["created_at", "id"]
+    )
+    op.create_index(
+        "ix_moderation_logs_chat_created", "moderation_logs", ["chat_id", "created_at", "id"]
+    )
+    op.create_index(
+        "ix_moderation_logs_user_created", "moderation_logs", ["telegram_id", "created_at", "id"]
+    )
+    op.create_index(
+        "ix_moderation_logs_action_created", "moderation_logs", ["action", "created_at"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_moderation_logs_action_created", table_name="moderation_logs")
+    op.drop_index("ix_moderation_logs_user_created", table_name="moderation_logs")
+    op.drop_index("ix_moderation_logs_chat_created", table_name="moderation_logs")
+    op.drop_index("ix_moderation_logs_created_id", table_name="moderation_logs")
+    op.drop_column("moderation_logs", "chat_id")
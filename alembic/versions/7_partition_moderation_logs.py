@@ -0,0 +1,119 @@
+"""moderation_logs -> таблица с помесячными партициями (только Postgres)
+создано: 17.10.2026
+
+Партиции называются moderation_logs_yГГГГmММ, плюс moderation_logs_default
+на всякий случай. Новые месяцы заранее создает LogArchive.ensure_partitions,
+старые отцепляет и архивирует LogArchive.run_retention.
+На других бд (SQLite в тестах) миграция ничего не делает.
+"""
+
+import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "007"
+down_revision: Union[str, None] = "006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = {
+    "ix_moderation_logs_created_id": "created_at, id",
+    "ix_moderation_logs_chat_created": "chat_id, created_at, id",
+    "ix_moderation_logs_user_created": "telegram_id, created_at, id",
+    "ix_moderation_logs_action_created": "action, created_at",
+}
+
+
+def _month_start(value: datetime.datetime) -> datetime.date:
+    return datetime.date(value.year, value.month, 1)
+
+
+def _next_month(value: datetime.date) -> datetime.date:
+    return datetime.date(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+
+    op.execute("ALTER TABLE moderation_logs RENAME TO moderation_logs_old")
+    op.execute("ALTER TABLE moderation_logs_old RENAME CONSTRAINT moderation_logs_pkey TO moderation_logs_old_pkey")
+    for name in INDEXES:
+        op.execute(f"ALTER INDEX {name} RENAME TO {name}_old")
+
+    # ключ партиционирования обязан входить в первичный ключ
+    op.execute(
+        """
+        CREATE TABLE moderation_logs (
+            id integer NOT NULL DEFAULT nextval('moderation_logs_id_seq'),
+            action varchar(50) NOT NULL,
+            telegram_id bigint,
+            chat_id bigint,
+            details text,
+            created_at timestamp without time zone NOT NULL DEFAULT now(),
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+        """
+    )
+    op.execute("ALTER SEQUENCE moderation_logs_id_seq OWNED BY moderation_logs.id")
+    op.execute("CREATE TABLE moderation_logs_default PARTITION OF moderation_logs DEFAULT")
+
+    # партиции на все месяцы, где уже есть строки, и на следующий месяц
+    oldest = bind.execute(sa.text("SELECT min(created_at) FROM moderation_logs_old")).scalar()
+    today = datetime.datetime.utcnow()
+    month = _month_start(oldest or today)
+    last = _next_month(_month_start(today))
+    while month <= last:
+        following = _next_month(month)
+        op.execute(
+            f"CREATE TABLE moderation_logs_y{month:%Y}m{month:%m} "
+            f"PARTITION OF moderation_logs "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{following:%Y-%m-%d}')"
+        )
+        month = following
+
+    op.execute(
+        "INSERT INTO moderation_logs (id, action, telegram_id, chat_id, details, created_at) "
+        "SELECT id, action, telegram_id, chat_id, details, created_at FROM moderation_logs_old"
+    )
+    op.execute("DROP TABLE moderation_logs_old")
+
+    for name, columns in INDEXES.items():
+        op.execute(f"CREATE INDEX {name} ON moderation_logs ({columns})")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+
+    op.execute("ALTER TABLE moderation_logs RENAME TO moderation_logs_partitioned")
+    for name in INDEXES:
+        op.execute(f"ALTER INDEX {name} RENAME TO {name}_partitioned")
+
+    op.execute(
+        """
+        CREATE TABLE moderation_logs (
+            id integer PRIMARY KEY DEFAULT nextval('moderation_logs_id_seq'),
+            action varchar(50) NOT NULL,
+            telegram_id bigint,
+            chat_id bigint,
+            details text,
+            created_at timestamp without time zone NOT NULL DEFAULT now()
+        )
+        """
+    )
+    op.execute("ALTER SEQUENCE moderation_logs_id_seq OWNED BY moderation_logs.id")
+    op.execute(
+        "INSERT INTO moderation_logs (id, action, telegram_id, chat_id, details, created_at) "
+        "SELECT id, action, telegram_id, chat_id, details, created_at FROM moderation_logs_partitioned"
+    )
+    # партиции удаляются вместе с родительской таблицей
+    op.execute("DROP TABLE moderation_logs_partitioned CASCADE")
+
+    for name, columns in INDEXES.items():
+        op.execute(f"CREATE INDEX {name} ON moderation_logs ({columns})")
@@ -0,0 +1,108 @@
+"""
+Замер холодного старта бота: сколько стоит импорт и подготовка до первого
+запроса в сеть (python -X importtime в свежем процессе).
+
+Запуск из корня проекта:
+    python benchmarks/startup_bench.py [--runs 5] [--top 15]
+
+Большую часть времени занимает сам aiogram (сборка pydantic-моделей всех
+типов Bot API), а на него мы повлиять не можем и на разных машинах он
+стоит по-разному. Поэтому отдельно меряем пустой `import aiogram` и
+бюджет ставим на нашу надбавку сверх него: настройки, sqlalchemy,
+модули бота.
+
+Печатает медианы по запускам и самые дорогие модули. Код возврата 1,
+если надбавка больше BUDGET_MS - так скрипт можно ставить в CI.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+# бюджет на импорт и подготовку сверх голого aiogram (без сети), мс
+BUDGET_MS = 1000
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# то же, что делает main.main() до startup(): импорты, настройки,
+# регистрация роутеров и создание сервисов
+STARTUP_SNIPPET = """
+import main
+import config
+config.load()
+from aiogram import Dispatcher
+from bot.handlers import register_all_handlers
+from bot.services.audit_sink import audit_sink
+from bot.services.chat_check_scheduler import ChatCheckScheduler
+from bot.services.maintenance import MaintenanceLoop
+register_all_handlers(Dispatcher())
+"""
+
+# нижняя граница: без aiogram бот не стартует
+FLOOR_SNIPPET = """
+import aiogram
+from aiogram import Bot, Dispatcher
+"""
+
+
+def run_once(snippet: str) -> Tuple[float, Dict[str, int]]:
+    """Один холодный старт: (всего мс, модуль -> cumulative мкс)."""
+    env = dict(os.environ)
+    env.setdefault("BOT_TOKEN", "123456:bench")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", snippet],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    total_us = 0
+    cumulative: Dict[str, int] = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        total_us += int(self_us)
+        cumulative[name.strip()] = int(cumulative_us)
+    return total_us / 1000, cumulative
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    totals: List[float] = []
+    floors: List[float] = []
+    last: Dict[str, int] = {}
+    for _ in range(args.runs):
+        total_ms, last = run_once(STARTUP_SNIPPET)
+        totals.append(total_ms)
+        floors.append(run_once(FLOOR_SNIPPET)[0])
+
+    median = statistics.median(totals)
+    floor = statistics.median(floors)
+    overhead = median - floor
+    print(f"startup imports: median {median:.0f} ms over {args.runs} runs "
+          f"(min {min(totals):.0f}, max {max(totals):.0f})")
+    print(f"bare aiogram:    median {floor:.0f} ms")
+    print(f"bot overhead:    {overhead:.0f} ms, budget {BUDGET_MS} ms")
+
+    print(f"\ntop {args.top} by cumulative time (last run):")
+    for name, us in sorted(last.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+    if overhead > BUDGET_MS:
+        print(f"\nover budget by {overhead - BUDGET_MS:.0f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
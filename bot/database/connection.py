@@ -5,60 +5,185 @@
 Используется асинхронный режим SQLAlchemy.
 
 Важно:
-- Для "боевого" кода есть класс Database и объект db.
-- Для старого кода и тестов оставлен совместимый интерфейс engine + SessionFactory.
+- На весь процесс один engine с пулом соединений (настройки DB_POOL_* в конфиге),
+  его используют и репозиторий (engine + SessionFactory), и класс Database (объект db).
+- Engine создается не при импорте, а при первой сессии или в init_db() на старте бота.
+- pool_stats() показывает, сколько соединений занято и сколько ждали свободного.
 """
 
 from __future__ import annotations
 
-from typing import AsyncGenerator
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Optional
 
+from sqlalchemy import make_url, text
 from sqlalchemy.ext.asyncio import (
     AsyncSession,
     AsyncEngine,
     async_sessionmaker,
     create_async_engine,
 )
-from sqlalchemy.pool import NullPool
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
-from config import DATABASE_URL
+import config
 from bot.database.models import Base
 
 
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Обычный пул, который дополнительно считает, сколько ждали соединение.
+    Если среднее/максимальное ожидание растет - пул мал для нагрузки
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._wait_lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - started
+            with self._wait_lock:
+                self.checkouts += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+
+    def recreate(self) -> "TimedQueuePool":
+        # при dispose() пул пересоздается - счетчики переносим
+        new_pool = super().recreate()
+        new_pool.checkouts = self.checkouts
+        new_pool.wait_total = self.wait_total
+        new_pool.wait_max = self.wait_max
+        return new_pool
+
+
+def _connect_args(url: str) -> dict:
+    if make_url(url).get_driver_name() != "asyncpg":
+        return {}
+    size = config.DB_STATEMENT_CACHE_SIZE
+    return {
+        # кэш SQLAlchemy: текст запроса -> подготовленное выражение asyncpg
+        "prepared_statement_cache_size": size,
+        # кэш самого asyncpg (именованные выражения на сервере)
+        "statement_cache_size": size,
+    }
+
+
+def create_engine(url: str | None = None) -> AsyncEngine:
+    """
+    Создать engine с пулом соединений по настройкам из конфига
+    """
+    url = url or config.DATABASE_URL
+    return create_async_engine(
+        url,
+        connect_args=_connect_args(url),
+        echo=False,
+        future=True,
+        poolclass=TimedQueuePool,
+        pool_size=config.DB_POOL_SIZE,
+        max_overflow=config.DB_MAX_OVERFLOW,
+        pool_timeout=config.DB_POOL_TIMEOUT,
+        pool_recycle=config.DB_POOL_RECYCLE,
+        pool_pre_ping=config.DB_POOL_PRE_PING,
+    )
+
+
+class _LazySessionFactory(async_sessionmaker):
+    """
+    SessionFactory без engine: при первом вызове создает общий engine
+    и привязывается к нему. Явно переданный bind (тесты) не трогаем
+    """
+
+    def __call__(self, **local_kw: Any) -> AsyncSession:
+        if self.kw.get("bind") is None:
+            get_engine()
+        return super().__call__(**local_kw)
+
+
+def make_session_factory(bind: AsyncEngine | None = None) -> async_sessionmaker[AsyncSession]:
+    return _LazySessionFactory(bind, class_=AsyncSession, expire_on_commit=False)
+
+
+_engine: Optional[AsyncEngine] = None
+SessionFactory = make_session_factory()
+
+
+def get_engine() -> AsyncEngine:
+    """Общий engine процесса (создается при первом вызове)."""
+    global _engine
+    if _engine is None:
+        _engine = create_engine()
+        SessionFactory.configure(bind=_engine)
+    return _engine
+
+
+def __getattr__(name: str) -> Any:
+    # старый код импортирует connection.engine - отдаем его лениво
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def pool_stats(bind: AsyncEngine | None = None) -> dict:
+    """
+    Состояние пула: размер, занято/свободно, сколько сверх размера,
+    число выдач соединений и время ожидания (среднее и максимум, мс)
+    """
+    pool = (bind or get_engine()).pool
+    stats = {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+    }
+    if isinstance(pool, TimedQueuePool):
+        stats["checkouts"] = pool.checkouts
+        stats["wait_avg_ms"] = (
+            pool.wait_total / pool.checkouts * 1000 if pool.checkouts else 0.0
+        )
+        stats["wait_max_ms"] = pool.wait_max * 1000
+    return stats
+
+
 class Database:
     """Класс для управления подключением к базе данных"""
 
-    def __init__(self) -> None:
-        self.engine: AsyncEngine | None = None
-        self.session_factory: async_sessionmaker[AsyncSession] | None = None
+    def __init__(
+        self,
+        engine: AsyncEngine | None = None,
+        session_factory: async_sessionmaker[AsyncSession] | None = None,
+    ) -> None:
+        self.engine = engine
+        self.session_factory = session_factory
 
     def initialize(self, url: str | None = None) -> None:
         """
-        Инициализировать подключение к базе данных
+        Инициализировать подключение к базе данных.
+        Без url используется общий engine процесса, с url - отдельный
+        (например, для другой бд в тестах)
         """
-        db_url = url or DATABASE_URL
+        if url is None:
+            self.engine = get_engine()
+            self.session_factory = SessionFactory
+            return
 
-        self.engine = create_async_engine(
-            db_url,
-            echo=False,
-            poolclass=NullPool,
-            future=True,
-        )
-
-        self.session_factory = async_sessionmaker(
-            self.engine,
-            class_=AsyncSession,
-            expire_on_commit=False,
-            autoflush=False,
-            autocommit=False,
-        )
+        self.engine = create_engine(url)
+        self.session_factory = make_session_factory(self.engine)
 
     async def close(self) -> None:
         """Закрыть подключение к базе данных"""
         if self.engine:
             await self.engine.dispose()
 
-    async def get_session(self) -> AsyncGenerator[AsyncSession, None]:
+    @asynccontextmanager
+    async def get_session(self) -> AsyncIterator[AsyncSession]:
         """
         Получить сессию БД.
 
@@ -67,7 +192,7 @@ class Database:
                 ...
         """
         if not self.session_factory:
-            raise RuntimeError("Database not initialized. Call db.initialize() first.")
+            self.initialize()
 
         async with self.session_factory() as session:
             try:
@@ -82,24 +207,23 @@ class Database:
     async def create_tables(self) -> None:
         """Создать все таблицы в базе данных"""
         if not self.engine:
-            raise RuntimeError("Database not initialized. Call db.initialize() first.")
+            self.initialize()
 
         async with self.engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
 
 
-# Глобальный объект БД
+# Глобальный объект БД - поверх того же engine, что и SessionFactory
+# (подключается к нему при первой сессии)
 db = Database()
 
-engine: AsyncEngine = create_async_engine(DATABASE_URL, echo=False, future=True)
-SessionFactory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
-# совместимость с main.py: инициализация БД при старте бота
 async def init_db() -> None:
     """
-    Инициализация БД для старта бота.
-    Сейчас engine/SessionFactory создаются при импорте модуля,
-    поэтому здесь достаточно заглушки. При желании сюда можно
-    добавить создание таблиц через Base.metadata.create_all.
+    Фаза старта бота: создать engine и сразу открыть первое соединение
+    (SELECT 1), чтобы недоступная бд обнаружилась до приема апдейтов,
+    а пул был прогрет
     """
-    return None
\ No newline at end of file
+    db.initialize()
+    async with get_engine().connect() as conn:
+        await conn.execute(text("SELECT 1"))
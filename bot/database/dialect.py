@@ -0,0 +1,26 @@
+"""
+Мелочи, которые зависят от диалекта бд.
+
+В проде у нас Postgres, а тесты гоняются на SQLite, поэтому
+INSERT ... ON CONFLICT собираем через insert() нужного диалекта:
+у обоих есть on_conflict_do_nothing / on_conflict_do_update и RETURNING.
+"""
+
+from __future__ import annotations
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def dialect_name(session: AsyncSession) -> str:
+    """Имя диалекта, к которому привязана сессия ("postgresql", "sqlite"...)"""
+    return session.get_bind().dialect.name
+
+
+def insert_for(session: AsyncSession, model):
+    """
+    insert(model) нужного диалекта - чтобы работал on_conflict_*
+    """
+    if dialect_name(session) == "sqlite":
+        return sqlite.insert(model)
+    return postgresql.insert(model)
@@ -8,7 +8,17 @@ from __future__ import annotations
 import datetime
 from typing import Optional
 
-from sqlalchemy import BigInteger, String, DateTime, Integer, Text, func
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    String,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    Text,
+    func,
+)
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 
 
@@ -46,12 +56,25 @@ class ModerationLog(Base):
     telegram_id: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
     chat_id: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
     details: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    # время ставим и на стороне python: у строк одной пачки оно тогда в одном
+    # формате с параметрами запросов (SQLite иначе сравнивает created_at как
+    # строки разного вида и курсор /logs съезжает)
     created_at: Mapped[datetime.datetime] = mapped_column(
         DateTime,
+        default=datetime.datetime.utcnow,
         server_default=func.now(),
         nullable=False,
     )
 
+    # под постраничный просмотр /logs (ключ - (created_at, id)) и выборки
+    # по пользователю/чату/типу действия
+    __table_args__ = (
+        Index("ix_moderation_logs_created_id", "created_at", "id"),
+        Index("ix_moderation_logs_chat_created", "chat_id", "created_at", "id"),
+        Index("ix_moderation_logs_user_created", "telegram_id", "created_at", "id"),
+        Index("ix_moderation_logs_action_created", "action", "created_at"),
+    )
+
 
 class ModeratedChat(Base):
     """
@@ -66,4 +89,176 @@ class ModeratedChat(Base):
         DateTime,
         server_default=func.now(),
         nullable=False,
-    )
\ No newline at end of file
+    )
+
+class ChatCheckState(Base):
+    """
+    Докуда чат уже проверен по черному списку.
+    last_blacklist_id - максимальный blacklisted_users.id, который
+    уже прогнали через бан в этом чате; обычная проверка банит только
+    тех, кто добавлен после него.
+    """
+    __tablename__ = "chat_check_states"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    chat_id: Mapped[int] = mapped_column(BigInteger, unique=True, nullable=False)
+    last_blacklist_id: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    last_checked_at: Mapped[Optional[datetime.datetime]] = mapped_column(
+        DateTime,
+        nullable=True,
+    )
+
+
+
+# ==== модели для GroupCleanupService и bot/database/repositories ====
+
+
+class User(Base):
+    """
+    Пользователь телеграма, которого бот видел в группах
+    """
+    __tablename__ = "users"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    telegram_id: Mapped[int] = mapped_column(BigInteger, unique=True, nullable=False, index=True)
+    username: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    first_name: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    last_name: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    is_active: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
+    is_admin: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
+    created_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime,
+        server_default=func.now(),
+        nullable=False,
+    )
+    updated_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime,
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False,
+    )
+
+
+class Group(Base):
+    """
+    Группа, которую чистит GroupCleanupService
+    """
+    __tablename__ = "groups"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    telegram_id: Mapped[int] = mapped_column(BigInteger, unique=True, nullable=False, index=True)
+    title: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    username: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    is_active: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
+    created_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime,
+        server_default=func.now(),
+        nullable=False,
+    )
+
+
+class AllowedUser(Base):
+    """
+    Пользователь, которому разрешено быть в группе.
+    added_by специально без внешнего ключа: иначе у allowed_users будет
+    два ключа на users и join(User, AllowedUser) станет неоднозначным
+    """
+    __tablename__ = "allowed_users"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(
+        Integer,
+        ForeignKey("users.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    group_id: Mapped[int] = mapped_column(
+        Integer,
+        ForeignKey("groups.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    added_by: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    created_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime,
+        server_default=func.now(),
+        nullable=False,
+    )
+
+    __table_args__ = (
+        Index("idx_allowed_user_group", "user_id", "group_id", unique=True),
+    )
+
+
+class GroupMember(Base):
+    """
+    Участник группы, каким его последний раз видел бот
+    """
+    __tablename__ = "group_members"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(
+        Integer,
+        ForeignKey("users.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    group_id: Mapped[int] = mapped_column(
+        Integer,
+        ForeignKey("groups.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    status: Mapped[str] = mapped_column(String(50), default="member", nullable=False)
+    joined_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime, nullable=True)
+    last_seen: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("idx_group_member_user_group", "user_id", "group_id", unique=True),
+    )
+
+
+class ActionLog(Base):
+    """
+    Лог действий GroupCleanupService (user_removed, user_allowed, group_cleanup...)
+    """
+    __tablename__ = "action_logs"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    action_type: Mapped[str] = mapped_column(String(100), nullable=False, index=True)
+    user_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    group_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True, index=True)
+    target_user_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    details: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime,
+        server_default=func.now(),
+        nullable=False,
+    )
+
+
+class StatCounter(Base):
+    """
+    Счетчики для /stats (blacklist_count, total_actions), которые
+    репозиторий правит в тех же транзакциях, что и сами изменения,
+    чтобы не считать count(*) по большим таблицам
+    """
+    __tablename__ = "stat_counters"
+
+    name: Mapped[str] = mapped_column(String(50), primary_key=True)
+    value: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
+
+class ModerationRollup(Base):
+    """
+    Почасовые итоги по moderation_logs: сколько было действий action
+    в чате chat_id за час hour (chat_id = 0 - действия без чата).
+    Пересчитывается из сырых логов целыми часами, поэтому повторный
+    пересчет ничего не задваивает
+    """
+    __tablename__ = "moderation_rollups"
+
+    hour: Mapped[datetime.datetime] = mapped_column(DateTime, primary_key=True)
+    action: Mapped[str] = mapped_column(String(50), primary_key=True)
+    chat_id: Mapped[int] = mapped_column(BigInteger, primary_key=True, default=0)
+    count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
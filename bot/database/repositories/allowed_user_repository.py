@@ -1,26 +1,201 @@
 """
 Репозиторий для работы с разрешенными пользователями.
+
+Списки разрешенных читаются на каждой проверке, поэтому держим их в
+памяти (AllowlistCache): по группе - frozenset внутренних id и
+frozenset Telegram ID, вытеснение самых давних групп (LRU, не больше
+ALLOWLIST_CACHE_GROUPS) и счетчик версий на группу. Любое изменение
+списка поднимает версию группы, а запись в кэш принимается, только если
+версия не менялась, пока шел запрос - устаревший список не вернется
+в кэш, даже если его дочитали после изменения.
+
+Версию репозиторий поднимает, только когда транзакция сессии с
+изменением закончилась (коммит или откат): до коммита другие сессии
+видят старый список, и если сбросить кэш раньше, он тут же наполнится
+этим старым списком уже с новой версией. Сама сессия до конца
+транзакции читает список измененной группы из бд, мимо кэша.
 """
 
-from typing import Optional
+from collections import OrderedDict
+from itertools import count
+from typing import AsyncIterator, Dict, FrozenSet, Iterable, NamedTuple, Optional, Tuple
 
-from sqlalchemy import select, delete, and_
+from sqlalchemy import select, delete, and_, event
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, SessionTransaction
 
+import config
+from bot.database import statements
 from bot.database.models import AllowedUser, User, Group
 from bot.database.repositories.base import BaseRepository
 
+# ключ в Session.info: группы, чьи списки поменяли в текущей транзакции
+_PENDING_KEY = "allowlist_pending"
+
+
+class AllowedSet(NamedTuple):
+    """Разрешенные пользователи группы."""
+    
+    version: int
+    user_ids: FrozenSet[int]
+    telegram_ids: FrozenSet[int]
+
+
+class AllowlistCache:
+    """LRU-кэш списков разрешенных по группам с версиями."""
+    
+    def __init__(self, max_groups: Optional[int] = None) -> None:
+        """Инициализация кэша.
+        
+        Args:
+            max_groups: Сколько групп держать в памяти
+                (None - ALLOWLIST_CACHE_GROUPS)
+        """
+        self._max_groups = max_groups
+        self._entries: "OrderedDict[int, AllowedSet]" = OrderedDict()
+        # версии только у групп, которые меняли; у остальных 0
+        self._versions: Dict[int, int] = {}
+        self._counter = count(1)
+        self.hits = 0
+        self.misses = 0
+    
+    @property
+    def max_groups(self) -> int:
+        if self._max_groups is None:
+            return config.ALLOWLIST_CACHE_GROUPS
+        return self._max_groups
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def version(self, group_id: int) -> int:
+        """Текущая версия списка группы (запомнить до запроса в бд)."""
+        return self._versions.get(group_id, 0)
+    
+    def get(self, group_id: int) -> Optional[AllowedSet]:
+        """Список группы из кэша или None, если его нет или он устарел."""
+        entry = self._entries.get(group_id)
+        if entry is None or entry.version != self.version(group_id):
+            self.misses += 1
+            return None
+        self._entries.move_to_end(group_id)
+        self.hits += 1
+        return entry
+    
+    def put(
+        self,
+        group_id: int,
+        version: int,
+        rows: Iterable[Tuple[int, int]]
+    ) -> AllowedSet:
+        """Положить прочитанный список в кэш.
+        
+        Args:
+            group_id: ID группы
+            version: Версия, взятая до запроса в бд
+            rows: Пары (ID пользователя, Telegram ID)
+            
+        Returns:
+            Список группы (даже если в кэш он не попал из-за смены версии)
+        """
+        entry = _allowed_set(version, rows)
+        if version != self.version(group_id):
+            return entry
+        
+        self._entries[group_id] = entry
+        self._entries.move_to_end(group_id)
+        while len(self._entries) > max(self.max_groups, 0):
+            self._entries.popitem(last=False)
+        return entry
+    
+    def invalidate(self, group_id: int) -> None:
+        """Список группы изменился: поднять версию и выбросить запись."""
+        self._versions[group_id] = next(self._counter)
+        self._entries.pop(group_id, None)
+    
+    def clear(self) -> None:
+        """Выбросить все записи (версии остаются)."""
+        self._entries.clear()
+
+
+allowlist_cache = AllowlistCache()
+
+
+def _allowed_set(version: int, rows: Iterable[Tuple[int, int]]) -> AllowedSet:
+    rows = list(rows)
+    return AllowedSet(
+        version=version,
+        user_ids=frozenset(user_id for user_id, _ in rows),
+        telegram_ids=frozenset(telegram_id for _, telegram_id in rows),
+    )
+
+
+def _invalidate_pending(session: Session, transaction: SessionTransaction) -> None:
+    """after_transaction_end: сбросить в кэше списки, измененные в транзакции."""
+    if transaction.parent is not None:
+        # вложенная транзакция (savepoint) - ждем внешнюю
+        return
+    for cache, group_id in session.info.pop(_PENDING_KEY, ()):
+        cache.invalidate(group_id)
+
 
 class AllowedUserRepository(BaseRepository[AllowedUser]):
     """Репозиторий для работы с разрешенными пользователями."""
     
-    def __init__(self, session: AsyncSession) -> None:
+    def __init__(
+        self,
+        session: AsyncSession,
+        cache: Optional[AllowlistCache] = None
+    ) -> None:
         """Инициализация репозитория разрешенных пользователей.
         
         Args:
             session: Сессия базы данных
+            cache: Кэш списков разрешенных (по умолчанию общий)
         """
         super().__init__(session, AllowedUser)
+        self.cache = cache if cache is not None else allowlist_cache
+    
+    async def get_allowed_set(self, group_id: int) -> AllowedSet:
+        """Разрешенные пользователи группы из кэша (или из бд при промахе).
+        
+        Args:
+            group_id: ID группы
+            
+        Returns:
+            Множества внутренних id и Telegram ID разрешенных
+        """
+        if (self.cache, group_id) in self._pending():
+            # список меняли в этой транзакции: читаем свои изменения из бд
+            # и в общий кэш их не кладем - они еще не закоммичены
+            conn = await self.session.connection()
+            result = await conn.execute(statements.allowed_users(group_id))
+            return _allowed_set(self.cache.version(group_id), result.tuples())
+        
+        entry = self.cache.get(group_id)
+        if entry is not None:
+            return entry
+        
+        version = self.cache.version(group_id)
+        # горячий путь проверок: готовый Core-запрос мимо ORM
+        conn = await self.session.connection()
+        result = await conn.execute(statements.allowed_users(group_id))
+        return self.cache.put(group_id, version, result.tuples())
+    
+    def _pending(self) -> set:
+        """Группы, чьи списки поменяли в текущей транзакции сессии."""
+        return self.session.sync_session.info.get(_PENDING_KEY, set())
+    
+    def _invalidate_after_commit(self, group_id: int) -> None:
+        """Сбросить список группы в кэше, когда закончится транзакция сессии.
+        
+        Args:
+            group_id: ID группы
+        """
+        sync_session = self.session.sync_session
+        if not event.contains(sync_session, "after_transaction_end", _invalidate_pending):
+            event.listen(sync_session, "after_transaction_end", _invalidate_pending)
+        sync_session.info.setdefault(_PENDING_KEY, set()).add((self.cache, group_id))
     
     async def get_by_user_and_group(
         self,
@@ -56,8 +231,7 @@ class AllowedUserRepository(BaseRepository[AllowedUser]):
         Returns:
             True, если пользователь разрешен, False иначе
         """
-        allowed = await self.get_by_user_and_group(user_id, group_id)
-        return allowed is not None
+        return user_id in (await self.get_allowed_set(group_id)).user_ids
     
     async def add_allowed_user(
         self,
@@ -79,11 +253,13 @@ class AllowedUserRepository(BaseRepository[AllowedUser]):
         if existing:
             return existing
         
-        return await self.create(
+        allowed = await self.create(
             user_id=user_id,
             group_id=group_id,
             added_by=added_by
         )
+        self._invalidate_after_commit(group_id)
+        return allowed
     
     async def remove_allowed_user(self, user_id: int, group_id: int) -> bool:
         """Удалить разрешение пользователя в группе.
@@ -104,6 +280,8 @@ class AllowedUserRepository(BaseRepository[AllowedUser]):
             )
         )
         await self.session.flush()
+        if result.rowcount > 0:
+            self._invalidate_after_commit(group_id)
         return result.rowcount > 0
     
     async def get_allowed_users_for_group(self, group_id: int) -> list[User]:
@@ -122,6 +300,26 @@ class AllowedUserRepository(BaseRepository[AllowedUser]):
         )
         return list(result.scalars().all())
     
+    async def iter_allowed_users_for_group(
+        self,
+        group_id: int,
+        batch_size: int = 1000,
+        server_side: bool = False
+    ) -> AsyncIterator[User]:
+        """Перебрать разрешенных пользователей группы по частям.
+        
+        Args:
+            group_id: ID группы
+            batch_size: Сколько пользователей читать за раз
+            server_side: Серверный курсор вместо keyset-страниц
+            
+        Yields:
+            Разрешенные пользователи по возрастанию ID
+        """
+        query = select(User).join(AllowedUser).where(AllowedUser.group_id == group_id)
+        async for user in self._iter_query(query, User.id, batch_size, server_side):
+            yield user
+    
     async def get_allowed_telegram_ids_for_group(self, group_id: int) -> list[int]:
         """Получить список Telegram ID разрешенных пользователей для группы.
         
@@ -131,10 +329,4 @@ class AllowedUserRepository(BaseRepository[AllowedUser]):
         Returns:
             Список Telegram ID разрешенных пользователей
         """
-        result = await self.session.execute(
-            select(User.telegram_id).join(AllowedUser).where(
-                AllowedUser.group_id == group_id
-            )
-        )
-        return list(result.scalars().all())
-
+        return list((await self.get_allowed_set(group_id)).telegram_ids)
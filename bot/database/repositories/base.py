@@ -3,14 +3,26 @@
 
 Содержит базовый класс для всех репозиториев,
 реализующий общие методы работы с БД.
+
+Запись идет через INSERT/UPDATE ... RETURNING: id и значения по
+умолчанию с сервера приходят в ответе на сам запрос, без отдельного
+SELECT (RETURNING есть и в Postgres, и в SQLite 3.35+).
+
+Большие выборки читаются по частям, не целым списком:
+- iter_all / _iter_keyset - keyset-пагинация (WHERE key > последний
+  ORDER BY key LIMIT n): каждая страница стоит одинаково, сколько бы
+  строк ни было до нее, и между страницами соединение не занято;
+- stream / _stream - серверный курсор (yield_per): один запрос, строки
+  приходят пачками, но соединение занято до конца перебора.
 """
 
-from typing import Generic, TypeVar, Type, Optional
+from typing import Any, AsyncIterator, Dict, Generic, Iterable, TypeVar, Type, Optional
 from abc import ABC
 
-from sqlalchemy import select, delete, update
+from sqlalchemy import Select, select, delete, insert, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from bot.database.dialect import dialect_name
 from bot.database.models import Base
 
 ModelType = TypeVar("ModelType", bound=Base)
@@ -60,8 +72,99 @@ class BaseRepository(ABC, Generic[ModelType]):
         result = await self.session.execute(query)
         return list(result.scalars().all())
     
+    async def iter_all(
+        self,
+        batch_size: int = 1000,
+        order_by: Any = None
+    ) -> AsyncIterator[ModelType]:
+        """Перебрать все записи страницами по ключу (без OFFSET).
+        
+        Args:
+            batch_size: Сколько записей в одной странице
+            order_by: Уникальная NOT NULL колонка для пагинации
+                (по умолчанию первичный ключ)
+            
+        Yields:
+            Модели по возрастанию ключа
+        """
+        async for instance in self._iter_keyset(
+            select(self.model), order_by if order_by is not None else self.model.id, batch_size
+        ):
+            yield instance
+    
+    async def stream(self, batch_size: int = 1000) -> AsyncIterator[ModelType]:
+        """Перебрать все записи одним запросом через серверный курсор.
+        
+        Args:
+            batch_size: Сколько строк забирать с сервера за раз
+            
+        Yields:
+            Модели по возрастанию первичного ключа
+        """
+        async for instance in self._stream(select(self.model).order_by(self.model.id), batch_size):
+            yield instance
+    
+    async def _iter_keyset(
+        self,
+        query: Select,
+        key: Any,
+        batch_size: int
+    ) -> AsyncIterator[Any]:
+        """Выполнить query страницами по ключу key.
+        
+        Args:
+            query: SELECT одной сущности (без ORDER BY и LIMIT)
+            key: Уникальная колонка этой сущности
+            batch_size: Сколько строк в странице
+            
+        Yields:
+            Объекты по возрастанию key
+        """
+        last = None
+        while True:
+            page = query.order_by(key).limit(batch_size)
+            if last is not None:
+                page = page.where(key > last)
+            rows = (await self.session.execute(page)).scalars().all()
+            for row in rows:
+                yield row
+            if len(rows) < batch_size:
+                return
+            last = getattr(rows[-1], key.key)
+    
+    def _iter_query(
+        self,
+        query: Select,
+        key: Any,
+        batch_size: int,
+        server_side: bool = False
+    ) -> AsyncIterator[Any]:
+        """query по частям: keyset-страницами по key или серверным курсором."""
+        if server_side:
+            return self._stream(query.order_by(key), batch_size)
+        return self._iter_keyset(query, key, batch_size)
+    
+    async def _stream(self, query: Select, batch_size: int) -> AsyncIterator[Any]:
+        """Выполнить query через серверный курсор пачками по batch_size.
+        
+        Args:
+            query: SELECT одной сущности
+            batch_size: Сколько строк забирать с сервера за раз
+            
+        Yields:
+            Объекты в порядке query
+        """
+        result = await self.session.stream_scalars(
+            query.execution_options(yield_per=batch_size)
+        )
+        try:
+            async for row in result:
+                yield row
+        finally:
+            await result.close()
+    
     async def create(self, **kwargs) -> ModelType:
-        """Создать новую запись.
+        """Создать новую запись одним INSERT ... RETURNING.
         
         Args:
             **kwargs: Поля для создания записи
@@ -69,14 +172,52 @@ class BaseRepository(ABC, Generic[ModelType]):
         Returns:
             Созданная модель
         """
-        instance = self.model(**kwargs)
-        self.session.add(instance)
-        await self.session.flush()
-        await self.session.refresh(instance)
-        return instance
+        result = await self.session.execute(
+            insert(self.model).values(**kwargs).returning(self.model)
+        )
+        return result.scalar_one()
+    
+    async def create_many(
+        self,
+        rows: Iterable[Dict[str, Any]],
+        batch_size: int = 1000
+    ) -> list[ModelType]:
+        """Создать пачку записей многострочным INSERT ... RETURNING.
+        
+        Args:
+            rows: Поля для каждой записи (у всех строк - один набор ключей)
+            batch_size: Сколько строк в одном запросе
+            
+        Returns:
+            Созданные модели в том же порядке, что и rows
+        """
+        rows = list(rows)
+        created: list[ModelType] = []
+        sqlite = dialect_name(self.session) == "sqlite"
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            if not sqlite:
+                # Postgres: insertmanyvalues сам склеивает пачку в
+                # многострочный INSERT и возвращает строки по порядку параметров
+                result = await self.session.execute(
+                    insert(self.model).returning(self.model, sort_by_parameter_order=True),
+                    batch
+                )
+                created.extend(result.scalars().all())
+                continue
+            
+            # SQLite (тесты): executemany с sort_by_parameter_order здесь
+            # разваливается в INSERT на строку, поэтому один многострочный
+            # VALUES. Порядок строк в RETURNING не гарантирован, а id
+            # выдаются по порядку VALUES - по ним и восстанавливаем порядок
+            result = await self.session.execute(
+                insert(self.model).values(batch).returning(self.model)
+            )
+            created.extend(sorted(result.scalars().all(), key=lambda instance: instance.id))
+        return created
     
     async def update(self, id: int, **kwargs) -> Optional[ModelType]:
-        """Обновить запись.
+        """Обновить запись одним UPDATE ... RETURNING.
         
         Args:
             id: Идентификатор записи
@@ -85,11 +226,19 @@ class BaseRepository(ABC, Generic[ModelType]):
         Returns:
             Обновленная модель или None, если не найдена
         """
-        await self.session.execute(
-            update(self.model).where(self.model.id == id).values(**kwargs)
+        if not kwargs:
+            return await self.get_by_id(id)
+        
+        # populate_existing: если объект уже загружен в сессию,
+        # его поля обновятся из ответа, refresh не нужен
+        result = await self.session.execute(
+            update(self.model)
+            .where(self.model.id == id)
+            .values(**kwargs)
+            .returning(self.model)
+            .execution_options(populate_existing=True)
         )
-        await self.session.flush()
-        return await self.get_by_id(id)
+        return result.scalar_one_or_none()
     
     async def delete(self, id: int) -> bool:
         """Удалить запись.
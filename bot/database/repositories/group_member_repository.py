@@ -2,12 +2,13 @@
 Репозиторий для работы с участниками групп.
 """
 
-from typing import Optional
+from typing import AsyncIterator, Iterable, Mapping, Optional, Tuple
 from datetime import datetime
 
-from sqlalchemy import select, delete, and_
+from sqlalchemy import BigInteger, DateTime, and_, bindparam, column, delete, select, update, values
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from bot.database.dialect import dialect_name, insert_for
 from bot.database.models import GroupMember, User, Group
 from bot.database.repositories.base import BaseRepository
 
@@ -66,13 +67,11 @@ class GroupMemberRepository(BaseRepository[GroupMember]):
         existing = await self.get_by_user_and_group(user_id, group_id)
         if existing:
             # Обновляем статус и время последнего визита
-            await self.update(
+            return await self.update(
                 existing.id,
                 status=status,
                 last_seen=datetime.utcnow()
             )
-            await self.session.refresh(existing)
-            return existing
         
         return await self.create(
             user_id=user_id,
@@ -82,6 +81,50 @@ class GroupMemberRepository(BaseRepository[GroupMember]):
             last_seen=datetime.utcnow()
         )
     
+    async def upsert_many(
+        self,
+        group_id: int,
+        members: Iterable[Tuple[int, str]],
+        batch_size: int = 1000
+    ) -> int:
+        """Добавить или обновить пачку участников группы многострочным upsert.
+        
+        То же, что add_member для каждого: новым ставится joined_at,
+        у существующих обновляются status и last_seen.
+        
+        Args:
+            group_id: ID группы
+            members: Пары (ID пользователя, статус); повторы схлопываются
+            batch_size: Сколько строк в одном запросе
+            
+        Returns:
+            Сколько участников записано
+        """
+        now = datetime.utcnow()
+        rows = [
+            {
+                "user_id": user_id,
+                "group_id": group_id,
+                "status": status,
+                "joined_at": now,
+                "last_seen": now,
+            }
+            for user_id, status in dict(members).items()
+        ]
+        
+        for start in range(0, len(rows), batch_size):
+            stmt = insert_for(self.session, GroupMember).values(rows[start:start + batch_size])
+            await self.session.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[GroupMember.user_id, GroupMember.group_id],
+                    set_={
+                        "status": stmt.excluded.status,
+                        "last_seen": stmt.excluded.last_seen,
+                    },
+                )
+            )
+        return len(rows)
+    
     async def remove_member(self, user_id: int, group_id: int) -> bool:
         """Удалить участника из группы.
         
@@ -103,6 +146,37 @@ class GroupMemberRepository(BaseRepository[GroupMember]):
         await self.session.flush()
         return result.rowcount > 0
     
+    async def remove_many(
+        self,
+        group_id: int,
+        user_ids: Iterable[int],
+        batch_size: int = 1000
+    ) -> int:
+        """Удалить пачку участников группы одним DELETE на batch_size id.
+        
+        Args:
+            group_id: ID группы
+            user_ids: ID пользователей
+            batch_size: Сколько id в одном запросе
+            
+        Returns:
+            Сколько участников удалено
+        """
+        ids = list(dict.fromkeys(user_ids))
+        removed = 0
+        for start in range(0, len(ids), batch_size):
+            result = await self.session.execute(
+                delete(GroupMember).where(
+                    and_(
+                        GroupMember.group_id == group_id,
+                        GroupMember.user_id.in_(ids[start:start + batch_size])
+                    )
+                )
+            )
+            removed += result.rowcount
+        await self.session.flush()
+        return removed
+    
     async def get_members_for_group(self, group_id: int) -> list[User]:
         """Получить список участников группы.
         
@@ -119,6 +193,26 @@ class GroupMemberRepository(BaseRepository[GroupMember]):
         )
         return list(result.scalars().all())
     
+    async def iter_members_for_group(
+        self,
+        group_id: int,
+        batch_size: int = 1000,
+        server_side: bool = False
+    ) -> AsyncIterator[User]:
+        """Перебрать участников группы по частям (как get_members_for_group).
+        
+        Args:
+            group_id: ID группы
+            batch_size: Сколько участников читать за раз
+            server_side: Серверный курсор вместо keyset-страниц
+            
+        Yields:
+            Участники группы по возрастанию ID пользователя
+        """
+        query = select(User).join(GroupMember).where(GroupMember.group_id == group_id)
+        async for user in self._iter_query(query, User.id, batch_size, server_side):
+            yield user
+    
     async def get_member_telegram_ids_for_group(self, group_id: int) -> list[int]:
         """Получить список Telegram ID участников группы.
         
@@ -135,14 +229,105 @@ class GroupMemberRepository(BaseRepository[GroupMember]):
         )
         return list(result.scalars().all())
     
+    async def get_member_profiles_for_group(self, group_id: int) -> list[tuple]:
+        """Получить участников группы с профилем и статусом (без ORM-объектов).
+        
+        Args:
+            group_id: ID группы
+            
+        Returns:
+            Кортежи (telegram_id, username, first_name, last_name, status)
+        """
+        result = await self.session.execute(
+            select(
+                User.telegram_id,
+                User.username,
+                User.first_name,
+                User.last_name,
+                GroupMember.status,
+            ).join(GroupMember).where(GroupMember.group_id == group_id)
+        )
+        return [tuple(row) for row in result.all()]
+    
     async def update_last_seen(self, user_id: int, group_id: int) -> None:
-        """Обновить время последнего визита участника.
+        """Обновить время последнего визита участника (один UPDATE, без SELECT).
         
         Args:
             user_id: ID пользователя
             group_id: ID группы
         """
-        member = await self.get_by_user_and_group(user_id, group_id)
-        if member:
-            await self.update(member.id, last_seen=datetime.utcnow())
-
+        await self.session.execute(
+            update(GroupMember)
+            .where(
+                and_(
+                    GroupMember.user_id == user_id,
+                    GroupMember.group_id == group_id
+                )
+            )
+            .values(last_seen=datetime.utcnow())
+        )
+    
+    async def update_last_seen_many(
+        self,
+        seen: Mapping[Tuple[int, int], datetime],
+        batch_size: int = 1000
+    ) -> int:
+        """Проставить last_seen пачке участников по их Telegram ID.
+        
+        На Postgres - один UPDATE ... FROM (VALUES ...) на batch_size строк,
+        внутренние id пользователя и группы находятся в том же запросе.
+        На SQLite - тот же UPDATE с подзапросами через executemany.
+        Тех, кого еще нет в group_members, запрос просто пропускает.
+        
+        Args:
+            seen: (Telegram ID пользователя, Telegram ID чата) -> время
+            batch_size: Сколько строк в одном запросе
+            
+        Returns:
+            Сколько строк передано в бд
+        """
+        rows = [
+            {"user_tg": user_tg, "chat_tg": chat_tg, "seen_at": seen_at}
+            for (user_tg, chat_tg), seen_at in seen.items()
+        ]
+        if not rows:
+            return 0
+        
+        if dialect_name(self.session) == "sqlite":
+            stmt = (
+                update(GroupMember.__table__)
+                .where(
+                    GroupMember.user_id == select(User.id)
+                    .where(User.telegram_id == bindparam("user_tg"))
+                    .scalar_subquery(),
+                    GroupMember.group_id == select(Group.id)
+                    .where(Group.telegram_id == bindparam("chat_tg"))
+                    .scalar_subquery(),
+                )
+                .values(last_seen=bindparam("seen_at"))
+            )
+            conn = await self.session.connection()
+            await conn.execute(stmt, rows)
+            return len(rows)
+        
+        for start in range(0, len(rows), batch_size):
+            batch = values(
+                column("user_tg", BigInteger),
+                column("chat_tg", BigInteger),
+                column("seen_at", DateTime),
+                name="seen",
+            ).data([(r["user_tg"], r["chat_tg"], r["seen_at"]) for r in rows[start:start + batch_size]])
+            await self.session.execute(
+                update(GroupMember)
+                .where(
+                    and_(
+                        GroupMember.user_id == User.id,
+                        GroupMember.group_id == Group.id,
+                        User.telegram_id == batch.c.user_tg,
+                        Group.telegram_id == batch.c.chat_tg
+                    )
+                )
+                .values(last_seen=batch.c.seen_at)
+                .execution_options(synchronize_session=False)
+            )
+        return len(rows)
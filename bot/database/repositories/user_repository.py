@@ -2,11 +2,12 @@
 Репозиторий для работы с пользователями.
 """
 
-from typing import Optional
+from typing import AsyncIterator, Dict, Iterable, Optional
 
-from sqlalchemy import select
+from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from bot.database.dialect import insert_for
 from bot.database.models import User
 from bot.database.repositories.base import BaseRepository
 
@@ -36,6 +37,23 @@ class UserRepository(BaseRepository[User]):
         )
         return result.scalar_one_or_none()
     
+    async def get_ids_by_telegram_ids(self, telegram_ids: Iterable[int]) -> Dict[int, int]:
+        """Получить внутренние ID известных пользователей одним запросом.
+        
+        Args:
+            telegram_ids: Telegram ID пользователей
+            
+        Returns:
+            Словарь telegram_id -> ID (неизвестных в нем нет)
+        """
+        ids = list(set(telegram_ids))
+        if not ids:
+            return {}
+        result = await self.session.execute(
+            select(User.telegram_id, User.id).where(User.telegram_id.in_(ids))
+        )
+        return dict(result.tuples().all())
+    
     async def get_or_create(
         self,
         telegram_id: int,
@@ -76,6 +94,52 @@ class UserRepository(BaseRepository[User]):
             last_name=last_name
         )
     
+    async def upsert_many(
+        self,
+        profiles: Iterable[dict],
+        batch_size: int = 1000
+    ) -> Dict[int, int]:
+        """Создать или обновить пачку пользователей многострочным upsert.
+        
+        То же, что get_or_create для каждого, но одним
+        INSERT ... ON CONFLICT DO UPDATE ... RETURNING на batch_size строк.
+        Как и в get_or_create, None в username/first_name/last_name
+        не затирает уже известное значение.
+        
+        Args:
+            profiles: Словари с telegram_id и (необязательно) username,
+                first_name, last_name; повторы telegram_id схлопываются
+            batch_size: Сколько строк в одном запросе
+            
+        Returns:
+            Словарь telegram_id -> внутренний ID пользователя
+        """
+        rows = {}
+        for profile in profiles:
+            rows[profile["telegram_id"]] = {
+                "telegram_id": profile["telegram_id"],
+                "username": profile.get("username"),
+                "first_name": profile.get("first_name"),
+                "last_name": profile.get("last_name"),
+            }
+        rows = list(rows.values())
+        
+        ids: Dict[int, int] = {}
+        for start in range(0, len(rows), batch_size):
+            stmt = insert_for(self.session, User).values(rows[start:start + batch_size])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[User.telegram_id],
+                set_={
+                    "username": func.coalesce(stmt.excluded.username, User.username),
+                    "first_name": func.coalesce(stmt.excluded.first_name, User.first_name),
+                    "last_name": func.coalesce(stmt.excluded.last_name, User.last_name),
+                    "updated_at": func.now(),
+                },
+            ).returning(User.telegram_id, User.id)
+            result = await self.session.execute(stmt)
+            ids.update(result.tuples().all())
+        return ids
+    
     async def get_active_users(self) -> list[User]:
         """Получить список активных пользователей.
         
@@ -87,6 +151,24 @@ class UserRepository(BaseRepository[User]):
         )
         return list(result.scalars().all())
     
+    async def iter_active_users(
+        self,
+        batch_size: int = 1000,
+        server_side: bool = False
+    ) -> AsyncIterator[User]:
+        """Перебрать активных пользователей по частям (как get_active_users).
+        
+        Args:
+            batch_size: Сколько пользователей читать за раз
+            server_side: Серверный курсор вместо keyset-страниц
+            
+        Yields:
+            Активные пользователи по возрастанию ID
+        """
+        query = select(User).where(User.is_active == True)
+        async for user in self._iter_query(query, User.id, batch_size, server_side):
+            yield user
+    
     async def get_admins(self) -> list[User]:
         """Получить список администраторов.
         
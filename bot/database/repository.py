@@ -4,104 +4,536 @@ Repository-слой, который общается с бд
 
 from __future__ import annotations
 
-from typing import List
+import asyncio
+import datetime
+import time
+from collections import Counter
+from itertools import islice
+from logging import getLogger
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
 
-from sqlalchemy import select, func
+from sqlalchemy import Row, case, delete, insert, select, func, tuple_, update
 from sqlalchemy.exc import SQLAlchemyError
 
+import config
+from . import statements
 from .connection import SessionFactory
-from .models import BlacklistedUser, ModerationLog, ModeratedChat
+from .dialect import insert_for
+from .models import (
+    BlacklistedUser,
+    ChatCheckState,
+    ModerationLog,
+    ModeratedChat,
+    ModerationRollup,
+    StatCounter,
+)
+
+logger = getLogger(__name__)
+
+# имена счетчиков в stat_counters
+BLACKLIST_COUNT = "blacklist_count"
+TOTAL_ACTIONS = "total_actions"
+# до какого moderation_logs.id уже пересчитаны почасовые итоги
+ROLLUP_LOG_ID = "rollup_log_id"
+
+
+def _hour(value: datetime.datetime) -> datetime.datetime:
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def _batches(items: Iterable, size: int) -> Iterator[list]:
+    """Нарезать итерируемое на списки по size штук, не читая его целиком"""
+    it = iter(items)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+class ChatCheck(NamedTuple):
+    """
+    Результат run_check_for_chat: кого проверить и до какого
+    blacklisted_users.id дошли (отметку потом отдают в confirm_chat_check)
+    """
+
+    ids: List[int]
+    watermark: int
 
 
 class UserRepository:
-    def __init__(self, session_factory=SessionFactory):
+    def __init__(self, session_factory=SessionFactory, stats_ttl: float | None = None):
         self._session_factory = session_factory
 
+        # кэш /stats: (monotonic-время загрузки, версия, данные).
+        # версия растет при каждом изменении, так что после add/remove
+        # цифры перечитываются сразу, а не через ttl.
+        # stats_ttl=None - берем STATS_CACHE_TTL из конфига при первом /stats
+        self._stats_ttl_override = stats_ttl
+        self._stats_cache: Optional[Tuple[float, int, dict]] = None
+        self._stats_version = 0
+        self._stats_lock = asyncio.Lock()
+
+    @property
+    def _stats_ttl(self) -> float:
+        if self._stats_ttl_override is None:
+            return config.STATS_CACHE_TTL
+        return self._stats_ttl_override
+
+    # чтение черного списка
+    #
+    # локального индекса чс нет: проверки чатов читают из бд только id
+    # после отметки чата (полная - id вместе с отметкой одним запросом),
+    # а копия в памяти каждого процесса не видела бы записей из других
+    # процессов и могла бы разойтись с отметкой
+
+    async def is_blacklisted(self, user_id: int) -> bool:
+        async with self._session_factory() as session:
+            conn = await session.connection()
+            res = await conn.execute(statements.blacklist_contains(user_id))
+            return res.scalar() is not None
+
+    async def get_blacklisted_ids(self) -> List[int]:
+        async with self._session_factory() as session:
+            conn = await session.connection()
+            res = await conn.execute(statements.BLACKLIST_TELEGRAM_IDS)
+            return list(res.scalars())
+
     # черный список
 
-    async def add_to_blacklist(self, user_id: int, username: str | None = None) -> bool:
+    async def _insert_blacklist_rows(self, session, rows: List[dict]) -> List[int]:
+        """
+        Один INSERT ... ON CONFLICT DO NOTHING RETURNING на пачку,
+        возвращает telegram_id тех, кого реально добавили
+        """
+        res = await session.execute(
+            insert_for(session, BlacklistedUser)
+            .values(rows)
+            .on_conflict_do_nothing(index_elements=["telegram_id"])
+            .returning(BlacklistedUser.telegram_id)
+        )
+        return list(res.scalars().all())
+
+    async def _bump_counters(self, session, **deltas: int) -> None:
+        """
+        Поправить счетчики /stats одним UPDATE (в той же транзакции,
+        что и само изменение). Если счетчика еще нет в таблице, UPDATE
+        его не тронет - он досчитается при первом get_stats
+        """
+        deltas = {name: delta for name, delta in deltas.items() if delta}
+        if not deltas:
+            return
+
+        await session.execute(
+            update(StatCounter)
+            .where(StatCounter.name.in_(deltas))
+            .values(value=StatCounter.value + case(deltas, value=StatCounter.name))
+        )
+        self._stats_version += 1
+
+    async def _insert_logs(self, session, rows: List[dict]) -> None:
+        """Записать пачку строк лога одним многострочным INSERT"""
+        if rows:
+            await session.execute(insert(ModerationLog).values(rows))
+            await self._bump_counters(session, **{TOTAL_ACTIONS: len(rows)})
+
+    async def write_logs(self, rows: List[dict]) -> None:
+        """
+        Записать готовые строки moderation_logs одной транзакцией
+        (через нее пишет AuditSink, счетчик действий обновляется вместе с ними)
+        """
         async with self._session_factory() as session:
-            try:
-                res = await session.execute(
-                    select(BlacklistedUser).where(BlacklistedUser.telegram_id == user_id)
-                )
-                existing = res.scalar_one_or_none()
-                if existing:
-                    return False
+            await self._insert_logs(session, rows)
+            await session.commit()
 
-                session.add(BlacklistedUser(telegram_id=user_id, username=username))
-                session.add(
-                    ModerationLog(action="add", telegram_id=user_id, details=None)
+    async def _add_rows(self, rows: List[dict]) -> List[int]:
+        async with self._session_factory() as session:
+            try:
+                added = await self._insert_blacklist_rows(session, rows)
+                await self._bump_counters(session, **{BLACKLIST_COUNT: len(added)})
+                await self._insert_logs(
+                    session,
+                    [{"action": "add", "telegram_id": uid, "details": None} for uid in added],
                 )
                 await session.commit()
-                return True
             except SQLAlchemyError:
                 await session.rollback()
-                return False
+                return []
+        return added
 
-    async def remove_from_blacklist(self, user_id: int) -> bool:
+    async def _remove_ids(self, user_ids: List[int]) -> List[int]:
         async with self._session_factory() as session:
             try:
                 res = await session.execute(
-                    select(BlacklistedUser).where(BlacklistedUser.telegram_id == user_id)
+                    delete(BlacklistedUser)
+                    .where(BlacklistedUser.telegram_id.in_(user_ids))
+                    .returning(BlacklistedUser.telegram_id)
                 )
-                user = res.scalar_one_or_none()
-                if user is None:
-                    return False
-
-                await session.delete(user)
-                session.add(
-                    ModerationLog(action="remove", telegram_id=user_id, details=None)
+                removed = list(res.scalars().all())
+                await self._bump_counters(session, **{BLACKLIST_COUNT: -len(removed)})
+                await self._insert_logs(
+                    session,
+                    [{"action": "remove", "telegram_id": uid, "details": None} for uid in removed],
                 )
                 await session.commit()
-                return True
             except SQLAlchemyError:
                 await session.rollback()
-                return False
+                return []
+        return removed
 
-    async def get_stats(self) -> dict:
+    async def add_to_blacklist(self, user_id: int, username: str | None = None) -> bool:
+        added = await self._add_rows([{"telegram_id": user_id, "username": username}])
+        return bool(added)
+
+    async def remove_from_blacklist(self, user_id: int) -> bool:
+        removed = await self._remove_ids([user_id])
+        return bool(removed)
+
+    async def add_many(self, user_ids: Iterable[int], batch_size: int = 1000) -> List[int]:
+        """
+        Добавить в чс сразу много id. На каждую пачку - один INSERT в чс
+        и один INSERT в лог в одной транзакции.
+        Возвращает id, которых раньше в чс не было.
+        """
+        added: List[int] = []
+        for batch in _batches(dict.fromkeys(user_ids), batch_size):
+            added.extend(
+                await self._add_rows([{"telegram_id": uid, "username": None} for uid in batch])
+            )
+        return added
+
+    async def remove_many(self, user_ids: Iterable[int], batch_size: int = 1000) -> List[int]:
+        """
+        Убрать из чс сразу много id: DELETE ... RETURNING и лог на пачку.
+        Возвращает id, которые реально были в чс.
+        """
+        removed: List[int] = []
+        for batch in _batches(dict.fromkeys(user_ids), batch_size):
+            removed.extend(await self._remove_ids(batch))
+        return removed
+
+    async def import_blacklist(
+        self,
+        user_ids: Iterable[int],
+        batch_size: int = 1000,
+    ) -> Dict[str, int]:
+        """
+        Массовое добавление в чс (например, из присланного файла).
+
+        user_ids читаем лениво пачками по batch_size, каждая пачка - один
+        INSERT ... ON CONFLICT DO NOTHING RETURNING и одна запись в логе.
+        Возвращает {"inserted": ..., "duplicates": ..., "failed": ...}.
+        Если пачка не записалась (ошибка бд), импорт на ней и заканчивается:
+        то, что закоммичено до нее, остается, а ее id попадают в "failed"
+        """
+        inserted_total = 0
+        duplicates_total = 0
+
+        for batch in _batches(user_ids, batch_size):
+            async with self._session_factory() as session:
+                unique_ids = list(dict.fromkeys(batch))
+                try:
+                    inserted = await self._insert_blacklist_rows(
+                        session, [{"telegram_id": uid} for uid in unique_ids]
+                    )
+                    await self._bump_counters(session, **{BLACKLIST_COUNT: len(inserted)})
+                    await self._insert_logs(
+                        session,
+                        [{
+                            "action": "import",
+                            "telegram_id": None,
+                            "details": f"inserted {len(inserted)} of {len(batch)}",
+                        }],
+                    )
+                    await session.commit()
+                except SQLAlchemyError as e:
+                    await session.rollback()
+                    logger.error(
+                        f"Blacklist import stopped after {inserted_total} inserted: {str(e)}",
+                        exc_info=True,
+                    )
+                    return {
+                        "inserted": inserted_total,
+                        "duplicates": duplicates_total,
+                        "failed": len(batch),
+                    }
+
+            inserted_total += len(inserted)
+            duplicates_total += len(batch) - len(inserted)
+
+        return {"inserted": inserted_total, "duplicates": duplicates_total, "failed": 0}
+
+    async def iter_blacklist(
+        self,
+        chunk_size: int = 5000,
+    ) -> AsyncIterator[Sequence[Row]]:
+        """
+        Потоково отдать весь чс пачками строк (telegram_id, username, created_at).
+
+        Читаем через серверный курсор (stream + yield_per), так что в памяти
+        одновременно только одна пачка, сколько бы строк ни было в таблице.
+        """
         async with self._session_factory() as session:
-            total_blacklisted = await session.scalar(
-                select(func.count(BlacklistedUser.id))
+            result = await session.stream(
+                select(
+                    BlacklistedUser.telegram_id,
+                    BlacklistedUser.username,
+                    BlacklistedUser.created_at,
+                )
+                .order_by(BlacklistedUser.id)
+                .execution_options(yield_per=chunk_size)
             )
-            total_actions = await session.scalar(
-                select(func.count(ModerationLog.id))
+            async for chunk in result.partitions():
+                yield chunk
+
+    async def _load_counters(self, session) -> Dict[str, int]:
+        res = await session.execute(select(StatCounter.name, StatCounter.value))
+        counters = {row.name: int(row.value) for row in res.all()}
+
+        # таблицу создали через create_all, а не миграцией - досчитываем
+        # недостающие счетчики один раз честным count(*)
+        sources = {BLACKLIST_COUNT: BlacklistedUser.id, TOTAL_ACTIONS: ModerationLog.id}
+        missing = [name for name in sources if name not in counters]
+        if missing:
+            for name in missing:
+                counters[name] = int(await session.scalar(select(func.count(sources[name]))) or 0)
+            await session.execute(
+                insert_for(session, StatCounter)
+                .values([{"name": name, "value": counters[name]} for name in missing])
+                .on_conflict_do_nothing(index_elements=["name"])
             )
-            last = await session.execute(
-                select(ModerationLog)
-                .order_by(ModerationLog.created_at.desc())
-                .limit(1)
+            await session.commit()
+        return counters
+
+    async def _load_stats(self) -> dict:
+        async with self._session_factory() as session:
+            counters = await self._load_counters(session)
+
+            # последнее действие - по первичному ключу, без сортировки по created_at
+            last_log = await session.scalar(
+                select(ModerationLog).order_by(ModerationLog.id.desc()).limit(1)
             )
-            last_log = last.scalar_one_or_none()
             last_action = None
             if last_log is not None:
                 last_action = f"{last_log.action} (user_id={last_log.telegram_id})"
 
             return {
-                "blacklist_count": int(total_blacklisted or 0),
-                "total_actions": int(total_actions or 0),
+                "blacklist_count": counters[BLACKLIST_COUNT],
+                "total_actions": counters[TOTAL_ACTIONS],
                 "last_action": last_action,
             }
 
-    async def run_check_for_chat(self, chat_id: int) -> List[int]:
+    async def get_stats(self) -> dict:
+        """
+        Статистика для /stats. Берется из счетчиков и кэшируется на
+        STATS_CACHE_TTL секунд; одновременные вызовы ждут одну загрузку
         """
-        Проверка чата по черному списку
+        async with self._stats_lock:
+            cached = self._stats_cache
+            if (
+                cached is not None
+                and cached[1] == self._stats_version
+                and time.monotonic() - cached[0] < self._stats_ttl
+            ):
+                return dict(cached[2])
+
+            version = self._stats_version
+            stats = await self._load_stats()
+            self._stats_cache = (time.monotonic(), version, stats)
+            return dict(stats)
+
+    async def run_check_for_chat(self, chat_id: int, full: bool = False) -> ChatCheck:
+        """
+        Проверка чата по черному списку.
+
+        Обычно отдает только тех, кто попал в чс после прошлой
+        подтвержденной проверки этого чата. full=True (или чат еще ни разу
+        не проверяли) - весь черный список.
+
+        Отметка из результата в бд не пишется: ее сохраняет
+        confirm_chat_check, когда проверка доведена до конца, - так
+        упавшая на середине проверка не сдвинет отметку, а две проверки
+        одного чата не перетрут отметки друг друга
         """
         async with self._session_factory() as session:
-            res = await session.execute(select(BlacklistedUser.telegram_id))
-            ids = [row[0] for row in res.all()]
+            # только целые числа - читаем Core-запросами мимо ORM
+            conn = await session.connection()
+            last_id = (await conn.execute(statements.chat_watermark(chat_id))).scalar()
 
-            session.add(
-                ModerationLog(
-                    action="check_chat",
-                    telegram_id=None,
-                    chat_id=chat_id,
-                    details=f"checked {len(ids)} users",
+            if full or last_id is None:
+                # id и отметка - из одного запроса, а не из локального кэша:
+                # иначе отметка могла бы уйти дальше того, что попало в ids
+                rows = (await conn.execute(statements.BLACKLIST_ROWS)).all()
+                ids = [telegram_id for _, telegram_id in rows]
+                watermark = max((row_id for row_id, _ in rows), default=0)
+            else:
+                rows = (await conn.execute(statements.blacklist_since(last_id))).all()
+                ids = [telegram_id for _, telegram_id in rows]
+                watermark = rows[-1][0] if rows else last_id
+
+            await self._insert_logs(
+                session,
+                [{
+                    "action": "check_chat",
+                    "telegram_id": None,
+                    "chat_id": chat_id,
+                    "details": f"checked {len(ids)} users" + (" (full)" if full else ""),
+                }],
+            )
+            await session.commit()
+
+        return ChatCheck(ids=ids, watermark=int(watermark))
+
+    async def confirm_chat_check(self, chat_id: int, watermark: int) -> None:
+        """
+        Закончить проверку, начатую run_check_for_chat: сдвинуть отметку
+        чата до watermark из ее результата - то есть запомнить, что всех,
+        кого отдала run_check_for_chat, уже обработали. Отметка только растет.
+        Баны по итогам проверки пишутся в лог отдельно, через AuditSink
+        """
+        async with self._session_factory() as session:
+            state = await session.scalar(
+                select(ChatCheckState).where(ChatCheckState.chat_id == chat_id)
+            )
+            now = datetime.datetime.utcnow()
+            if state is None:
+                session.add(
+                    ChatCheckState(
+                        chat_id=chat_id,
+                        last_blacklist_id=watermark,
+                        last_checked_at=now,
+                    )
+                )
+            else:
+                state.last_blacklist_id = max(state.last_blacklist_id, watermark)
+                state.last_checked_at = now
+            await session.commit()
+
+    async def get_chat_check_times(self) -> Dict[int, Optional[datetime.datetime]]:
+        """
+        Когда каждый чат последний раз успешно проверяли (chat_id -> время)
+        """
+        async with self._session_factory() as session:
+            conn = await session.connection()
+            res = await conn.execute(statements.CHAT_CHECK_TIMES)
+            return dict(res.all())
+
+    # просмотр лога
+
+    async def get_logs_page(
+        self,
+        limit: int = 10,
+        before: Optional[Tuple[datetime.datetime, int]] = None,
+        telegram_id: Optional[int] = None,
+        chat_id: Optional[int] = None,
+    ) -> Tuple[List[ModerationLog], Optional[Tuple[datetime.datetime, int]]]:
+        """
+        Страница лога от новых к старым.
+
+        Пагинация по ключу (created_at, id), а не через OFFSET: следующая
+        страница - это строки строго "раньше" последней показанной, поэтому
+        сотая страница стоит столько же, сколько первая.
+        Возвращает (строки, курсор следующей страницы или None).
+        """
+        query = select(ModerationLog)
+        if telegram_id is not None:
+            query = query.where(ModerationLog.telegram_id == telegram_id)
+        if chat_id is not None:
+            query = query.where(ModerationLog.chat_id == chat_id)
+        if before is not None:
+            query = query.where(
+                tuple_(ModerationLog.created_at, ModerationLog.id) < tuple_(*before)
+            )
+        query = query.order_by(
+            ModerationLog.created_at.desc(), ModerationLog.id.desc()
+        ).limit(limit + 1)
+
+        async with self._session_factory() as session:
+            rows = list((await session.scalars(query)).all())
+
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, (rows[-1].created_at, rows[-1].id)
+
+    # почасовые итоги по логу
+
+    async def compact_rollups(self, batch_size: int = 1000) -> int:
+        """
+        Досчитать moderation_rollups по новым строкам лога.
+
+        Берем все часы, в которые попали строки лога после прошлого
+        пересчета, и пересчитываем эти часы целиком из сырых логов,
+        перезаписывая итоги (а не прибавляя) - поэтому повторный запуск
+        ничего не задваивает. Возвращает число обновленных итогов.
+        """
+        async with self._session_factory() as session:
+            done_id = await session.scalar(
+                select(StatCounter.value).where(StatCounter.name == ROLLUP_LOG_ID)
+            ) or 0
+
+            res = await session.execute(
+                select(func.min(ModerationLog.created_at), func.max(ModerationLog.id))
+                .where(ModerationLog.id > done_id)
+            )
+            first_new_at, last_id = res.one()
+            if last_id is None:
+                return 0
+
+            start_hour = _hour(first_new_at)
+            counts: Counter = Counter()
+            result = await session.stream(
+                select(ModerationLog.created_at, ModerationLog.action, ModerationLog.chat_id)
+                .where(ModerationLog.created_at >= start_hour, ModerationLog.id <= last_id)
+                .execution_options(yield_per=5000)
+            )
+            async for created_at, action, chat_id in result:
+                counts[(_hour(created_at), action, chat_id or 0)] += 1
+
+            rows = [
+                {"hour": hour, "action": action, "chat_id": chat_id, "count": count}
+                for (hour, action, chat_id), count in counts.items()
+            ]
+            for batch in _batches(rows, batch_size):
+                stmt = insert_for(session, ModerationRollup).values(batch)
+                await session.execute(
+                    stmt.on_conflict_do_update(
+                        index_elements=["hour", "action", "chat_id"],
+                        set_={"count": stmt.excluded.count},
+                    )
+                )
+
+            stmt = insert_for(session, StatCounter).values(name=ROLLUP_LOG_ID, value=last_id)
+            await session.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=["name"], set_={"value": stmt.excluded.value}
                 )
             )
             await session.commit()
 
-        return ids
+        return len(rows)
+
+    async def get_activity(
+        self,
+        period: datetime.timedelta,
+        chat_id: Optional[int] = None,
+    ) -> Dict[str, int]:
+        """
+        Сколько было действий каждого типа за последний period
+        (с точностью до часа), читаем только moderation_rollups
+        """
+        since = _hour(datetime.datetime.utcnow() - period)
+        query = (
+            select(ModerationRollup.action, func.sum(ModerationRollup.count))
+            .where(ModerationRollup.hour >= since)
+            .group_by(ModerationRollup.action)
+        )
+        if chat_id is not None:
+            query = query.where(ModerationRollup.chat_id == chat_id)
+
+        async with self._session_factory() as session:
+            res = await session.execute(query)
+            return {action: int(total or 0) for action, total in res.all()}
 
     # чаты под модерацией
 
@@ -133,8 +565,8 @@ class UserRepository:
 
     async def get_moderated_chats(self) -> list[int]:
         async with self._session_factory() as session:
-            res = await session.execute(select(ModeratedChat.chat_id))
-            return [row[0] for row in res.all()]
+            conn = await session.connection()
+            return list((await conn.execute(statements.MODERATED_CHAT_IDS)).scalars())
 
 
 # один общий репозиторий, которым пользуются хендлеры
@@ -0,0 +1,73 @@
+"""
+Готовые Core-запросы для горячих мест.
+
+Проверки чатов, загрузка черного списка и списков разрешенных читают
+только целые числа, поэтому идут мимо ORM: запросы собраны один раз
+по колонкам таблиц (без сущностей и identity map), а запросы с
+параметрами завернуты в lambda_stmt - SQLAlchemy не пересобирает их
+при каждом вызове и берет скомпилированный SQL из кэша по ключу.
+Выполнять их нужно через соединение сессии:
+
+    conn = await session.connection()
+    ids = (await conn.execute(statements.BLACKLIST_TELEGRAM_IDS)).scalars().all()
+
+На asyncpg сверху работает кэш подготовленных выражений
+(DB_STATEMENT_CACHE_SIZE), так что один и тот же SQL не парсится
+сервером заново.
+"""
+
+from sqlalchemy import StatementLambdaElement, lambda_stmt, select
+
+from .models import AllowedUser, BlacklistedUser, ChatCheckState, ModeratedChat, User
+
+_blacklist = BlacklistedUser.__table__
+_chat_state = ChatCheckState.__table__
+_moderated = ModeratedChat.__table__
+_allowed = AllowedUser.__table__
+_users = User.__table__
+
+# весь чс (перечисление id)
+BLACKLIST_TELEGRAM_IDS = select(_blacklist.c.telegram_id)
+
+# весь чс вместе с id записей - для полной проверки чата (отметка
+# берется из тех же строк, что и сами id)
+BLACKLIST_ROWS = select(_blacklist.c.id, _blacklist.c.telegram_id)
+
+MODERATED_CHAT_IDS = select(_moderated.c.chat_id)
+
+CHAT_CHECK_TIMES = select(_chat_state.c.chat_id, _chat_state.c.last_checked_at)
+
+# админы, назначенные через бд (users.is_admin)
+ADMIN_TELEGRAM_IDS = select(_users.c.telegram_id).where(_users.c.is_admin.is_(True))
+
+
+def blacklist_since(last_id: int) -> StatementLambdaElement:
+    """(id, telegram_id) всех, кто попал в чс после записи last_id, по порядку."""
+    return lambda_stmt(
+        lambda: select(_blacklist.c.id, _blacklist.c.telegram_id)
+        .where(_blacklist.c.id > last_id)
+        .order_by(_blacklist.c.id)
+    )
+
+
+def blacklist_contains(telegram_id: int) -> StatementLambdaElement:
+    """1, если telegram_id в чс; пустой результат - нет."""
+    return lambda_stmt(
+        lambda: select(_blacklist.c.id).where(_blacklist.c.telegram_id == telegram_id).limit(1)
+    )
+
+
+def chat_watermark(chat_id: int) -> StatementLambdaElement:
+    """Отметка чата (last_blacklist_id); пустой результат - чат еще не проверяли."""
+    return lambda_stmt(
+        lambda: select(_chat_state.c.last_blacklist_id).where(_chat_state.c.chat_id == chat_id)
+    )
+
+
+def allowed_users(group_id: int) -> StatementLambdaElement:
+    """(id, telegram_id) разрешенных пользователей группы (group_id - внутренний id)."""
+    return lambda_stmt(
+        lambda: select(_users.c.id, _users.c.telegram_id)
+        .select_from(_users.join(_allowed, _allowed.c.user_id == _users.c.id))
+        .where(_allowed.c.group_id == group_id)
+    )
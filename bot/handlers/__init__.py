@@ -1,12 +1,14 @@
 from aiogram import Dispatcher
 
-from . import start, admin, common
-
 
 def register_all_handlers(dp: Dispatcher) -> None:
+    # роутеры импортируем здесь, а не на уровне пакета: так импорт
+    # bot.handlers (и любого одного модуля из него) не тянет остальные
+    from . import start, admin, common
+
     dp.include_router(start.router)
     dp.include_router(admin.router)
     dp.include_router(common.router)
 
 
-__all__ = ["register_all_handlers"]
\ No newline at end of file
+__all__ = ["register_all_handlers"]
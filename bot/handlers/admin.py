@@ -1,29 +1,57 @@
 from __future__ import annotations
 
-from typing import List, Optional, Tuple
+import asyncio
+import datetime
+import os
+import re
+import tempfile
+from collections import deque
+from itertools import islice
+from typing import Any, Iterator, List, Optional, Tuple
 
 from aiogram import Router, types, Bot
 from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import Command
+from aiogram.types import FSInputFile
 
-import config
+from bot.database.connection import pool_stats
 from bot.database.repository import user_repo
+from bot.keyboards.admin import LogsPage, decode_cursor, get_logs_keyboard
+from bot.services.audit_sink import audit_sink
+from bot.services.authorization import authorizer
+from bot.services.ban_executor import ban_executor
+from bot.services.blacklist_io import IdFileParser, open_id_file, write_blacklist_csv_gz
+from bot.services.log_archive import log_archive
 
 router = Router()
 
 def _is_admin(message: Any) -> bool:
+    # глобальный админ бота (ADMIN_IDS) - без запросов к бд и API
     user = getattr(message, "from_user", None)
     user_id = getattr(user, "id", None)
     if user_id is None:
         return False
 
-    admin_ids = getattr(config, "ADMIN_IDS", []) or []
+    return authorizer.is_bot_admin(user_id)
 
-    # если список админов пустой – по умолчанию считаем, что admin_id = 1
-    if not admin_ids:
-        return user_id == 1
 
-    return user_id in admin_ids
+async def _can_moderate(message: Any, chat_scoped: bool = False) -> bool:
+    """
+    можно ли автору пользоваться командой: ADMIN_IDS, users.is_admin,
+    а для команд про текущий чат (chat_scoped) - еще и админы этого чата.
+    права берутся из кэша (authorizer), в API - только при промахе
+    """
+    if _is_admin(message):
+        return True
+
+    user_id = getattr(getattr(message, "from_user", None), "id", None)
+    if user_id is None:
+        return False
+
+    chat_id = None
+    if chat_scoped:
+        chat_id = getattr(getattr(message, "chat", None), "id", None)
+    return await authorizer.can_moderate(user_id, bot=getattr(message, "bot", None), chat_id=chat_id)
 
 
 def _get_args(message: Any) -> List[str]:
@@ -44,11 +72,11 @@ def _get_args(message: Any) -> List[str]:
 
 
 
-def _extract_target_user(
+def _extract_target_users(
     message: types.Message,
-) -> Tuple[Optional[int], Optional[str], Optional[str]]:
+) -> Tuple[List[int], Optional[str], Optional[str]]:
     """
-    Пытаемся вытащить id пользователя и username из сообщения
+    Пытаемся вытащить id пользователей (и username, если это reply) из сообщения
     """
     # Вариант 1: команда в ответ на сообщение пользователя
     reply = getattr(message, "reply_to_message", None)
@@ -57,45 +85,57 @@ def _extract_target_user(
         uid = getattr(reply_user, "id", None)
         uname = getattr(reply_user, "username", None)
         if uid is not None:
-            return uid, uname, None
+            return [uid], uname, None
 
-    # Вариант 2: id передан в аргументах
+    # Вариант 2: один или несколько id переданы в аргументах
     args = _get_args(message)
     if not args:
         # Тесты ищут подстроку "Нужно указать id"
-        return None, None, "Нужно указать id"
+        return [], None, "Нужно указать id"
 
-    raw_id = args[0]
     try:
-        uid = int(raw_id)
+        uids = [int(raw_id) for raw_id in args]
     except (TypeError, ValueError):
         # Тесты ищут подстроку "должен быть числом"
-        return None, None, "id должен быть числом"
+        return [], None, "id должен быть числом"
 
     # username из текста не выдергиваем, оставляем None
-    return uid, None, None
+    return uids, None, None
+
+
+def _format_ids(ids: List[int]) -> str:
+    return ", ".join(str(uid) for uid in ids) if ids else "-"
 
 
 @router.message(Command("adduser"))
 async def add_user_cmd(message: types.Message) -> None:
     """
-    /adduser <id> - добавить пользователя в черный список.
+    /adduser <id> [<id> ...] - добавить пользователей в черный список.
 
     Можно:
         /adduser 123
+        /adduser 123 456 789
     или ответом на сообщение пользователя:
         (reply) /adduser
     """
-    if not _is_admin(message):
+    if not await _can_moderate(message):
         await message.answer("Команда только для админов.")
         return
 
-    user_id, username, error = _extract_target_user(message)
+    user_ids, username, error = _extract_target_users(message)
     if error:
         await message.answer(error)
         return
 
-    # user_id здесь гарантированно не None
+    if len(user_ids) > 1:
+        added_ids = await user_repo.add_many(user_ids)
+        await message.answer(
+            f"Добавлено в черный список: {len(added_ids)} из {len(user_ids)}.\n"
+            f"Новые: {_format_ids(added_ids)}"
+        )
+        return
+
+    user_id = user_ids[0]
     added = await user_repo.add_to_blacklist(user_id=user_id, username=username)
 
     if added:
@@ -107,17 +147,26 @@ async def add_user_cmd(message: types.Message) -> None:
 @router.message(Command("deluser"))
 async def del_user_cmd(message: types.Message) -> None:
     """
-    /deluser <id> - удалить пользователя из черного списка
+    /deluser <id> [<id> ...] - удалить пользователей из черного списка
     """
-    if not _is_admin(message):
+    if not await _can_moderate(message):
         await message.answer("Команда только для админов.")
         return
 
-    user_id, _username, error = _extract_target_user(message)
+    user_ids, _username, error = _extract_target_users(message)
     if error:
         await message.answer(error)
         return
 
+    if len(user_ids) > 1:
+        removed_ids = await user_repo.remove_many(user_ids)
+        await message.answer(
+            f"Удалено из черного списка: {len(removed_ids)} из {len(user_ids)}.\n"
+            f"Удалены: {_format_ids(removed_ids)}"
+        )
+        return
+
+    user_id = user_ids[0]
     deleted = await user_repo.remove_from_blacklist(user_id=user_id)
 
     if deleted:
@@ -126,15 +175,139 @@ async def del_user_cmd(message: types.Message) -> None:
         await message.answer("Этого пользователя нет в черном списке.")
 
 
+# сколько id из файла разбираем за раз (в отдельном потоке)
+IMPORT_CHUNK_SIZE = 10000
+
+
+def _take_ids(ids: Iterator[int], size: int) -> List[int]:
+    """следующие size id из файла (зовется через to_thread: чтение и разбор - блокирующие)"""
+    return list(islice(ids, size))
+
+
+@router.message(Command("importblacklist"))
+async def import_blacklist_cmd(message: types.Message) -> None:
+    """
+    /importblacklist - массово добавить id в черный список из файла.
+
+    Файл (txt/csv, по одному id в начале строки, можно .gz) прикладываем
+    к сообщению с командой в подписи или отвечаем командой на сообщение с файлом.
+    """
+    if not await _can_moderate(message):
+        await message.answer("Команда только для админов.")
+        return
+
+    document = getattr(message, "document", None)
+    reply = getattr(message, "reply_to_message", None)
+    if document is None and reply is not None:
+        document = getattr(reply, "document", None)
+    if document is None:
+        await message.answer("Нужно приложить файл со списком id (txt или csv).")
+        return
+
+    bot: Bot = message.bot  # type: ignore[assignment]
+
+    # качаем во временный файл и читаем его построчно, а не в память
+    fd, path = tempfile.mkstemp(prefix="blacklist_import_")
+    os.close(fd)
+    try:
+        try:
+            await bot.download(document, destination=path)
+        except TelegramBadRequest:
+            # например, файл больше 20 МБ - столько Bot API отдавать не умеет
+            await message.answer("Не получилось скачать файл :(")
+            return
+
+        parser = IdFileParser()
+        counts = {"inserted": 0, "duplicates": 0, "failed": 0}
+        with open_id_file(path) as lines:
+            ids = parser.iter_ids(lines)
+            while not counts["failed"]:
+                chunk = await asyncio.to_thread(_take_ids, ids, IMPORT_CHUNK_SIZE)
+                if not chunk:
+                    break
+                part = await user_repo.import_blacklist(chunk)
+                for key in counts:
+                    counts[key] += part.get(key, 0)
+    finally:
+        os.remove(path)
+
+    if counts["failed"]:
+        await message.answer(
+            "Импорт прервался из-за ошибки базы данных.\n"
+            f"- Добавлено до ошибки: {counts['inserted']}\n"
+            f"- Уже были в чс: {counts['duplicates']}\n"
+            "Можно прислать файл еще раз - уже добавленные просто пропустятся."
+        )
+        return
+
+    await message.answer(
+        "Импорт закончен.\n"
+        f"- Добавлено: {counts['inserted']}\n"
+        f"- Уже были в чс: {counts['duplicates']}\n"
+        f"- Битых строк: {parser.invalid}"
+    )
+
+
+@router.message(Command("exportblacklist"))
+async def export_blacklist_cmd(message: types.Message) -> None:
+    """
+    /exportblacklist - выгрузить весь черный список файлом (csv.gz)
+    """
+    if not await _can_moderate(message):
+        await message.answer("Команда только для админов.")
+        return
+
+    # пишем во временный файл пачками из курсора, память не растет
+    fd, path = tempfile.mkstemp(prefix="blacklist_export_", suffix=".csv.gz")
+    os.close(fd)
+    try:
+        total = await write_blacklist_csv_gz(user_repo.iter_blacklist(), path)
+        filename = f"blacklist_{datetime.date.today():%Y%m%d}.csv.gz"
+        await message.answer_document(
+            FSInputFile(path, filename=filename),
+            caption=f"Черный список: {total} записей",
+        )
+    finally:
+        os.remove(path)
+
+
+# подписи для действий из moderation_logs в /stats за период
+_ACTION_TITLES = {
+    "ban": "Забанено в чатах",
+    "add": "Добавлено в чс",
+    "remove": "Удалено из чс",
+    "import": "Пачек импорта",
+    "check_chat": "Проверок чатов",
+}
+
+
+def _parse_period(raw: str) -> Optional[datetime.timedelta]:
+    """
+    "24h" -> 24 часа, "7d" -> 7 дней; все остальное - None
+    """
+    match = re.fullmatch(r"(\d+)([hd])", raw.lower())
+    if not match:
+        return None
+    amount, unit = int(match.group(1)), match.group(2)
+    return datetime.timedelta(hours=amount) if unit == "h" else datetime.timedelta(days=amount)
+
+
 @router.message(Command("stats"))
 async def stats_cmd(message: types.Message) -> None:
     """
     /stats - показать статистику по черному списку
+    /stats 7d [chat_id] - сколько чего было за период (24h, 7d, 30d...),
+    можно только по одному чату
     """
-    if not _is_admin(message):
+    if not await _can_moderate(message):
         await message.answer("Команда только для админов.")
         return
 
+    args = _get_args(message)
+    if args:
+        await _period_stats(message, args)
+        return
+
     stats = await user_repo.get_stats()
     blacklist_count = stats.get("blacklist_count", 0)
     total_actions = stats.get("total_actions", 0)
@@ -144,28 +317,199 @@ async def stats_cmd(message: types.Message) -> None:
         "Статистика только для админов:\n"
         f"- В черном списке: {blacklist_count}\n"
         f"- Всего действий: {total_actions}\n"
-        f"- Последнее действие: {last_action}"
+        f"- Последнее действие: {last_action}\n"
+        f"- {_format_pool_stats()}"
     )
     await message.answer(text)
 
 
-async def _ban_blacklisted_in_chat(bot: Bot, chat_id: int) -> list[int]:
+def _format_pool_stats() -> str:
+    pool = pool_stats()
+    line = f"Соединения с бд: занято {pool['checked_out']} из {pool['size']}"
+    if pool["overflow"]:
+        line += f" (+{pool['overflow']} сверх пула)"
+    if "wait_avg_ms" in pool:
+        line += (
+            f", ожидание свободного: в среднем {pool['wait_avg_ms']:.1f} мс,"
+            f" максимум {pool['wait_max_ms']:.1f} мс"
+        )
+    return line
+
+
+async def _period_stats(message: types.Message, args: List[str]) -> None:
+    period = _parse_period(args[0])
+    if period is None:
+        await message.answer("Период пишется как 24h, 7d или 30d. Пример: /stats 7d")
+        return
+
+    chat_id: Optional[int] = None
+    if len(args) > 1:
+        try:
+            chat_id = int(args[1])
+        except ValueError:
+            await message.answer("id чата должен быть числом")
+            return
+
+    # итоги не пересчитываем - это делает MaintenanceLoop в фоне,
+    # иначе каждый /stats 7d стоил бы прохода по свежим логам
+    activity = await user_repo.get_activity(period, chat_id=chat_id)
+
+    where = f" в чате {chat_id}" if chat_id is not None else ""
+    lines = [f"Статистика за {args[0]}{where}:"]
+    for action, title in _ACTION_TITLES.items():
+        lines.append(f"- {title}: {activity.get(action, 0)}")
+    lines.append("(итоги пересчитываются в фоне, последние действия могут быть еще не учтены)")
+    await message.answer("\n".join(lines))
+
+
+LOGS_PAGE_SIZE = 10
+
+
+def _logs_filter(kind: str, value: int) -> dict:
+    if kind == "u":
+        return {"telegram_id": value}
+    if kind == "c":
+        return {"chat_id": value}
+    return {}
+
+
+async def _render_logs_page(kind: str, value: int, before=None):
+    rows, next_cursor = await user_repo.get_logs_page(
+        limit=LOGS_PAGE_SIZE, before=before, **_logs_filter(kind, value)
+    )
+    if not rows:
+        return "В логе ничего нет.", None
+
+    lines = []
+    for row in rows:
+        parts = [f"{row.created_at:%Y-%m-%d %H:%M}", row.action]
+        if row.telegram_id is not None:
+            parts.append(f"user {row.telegram_id}")
+        if row.chat_id is not None:
+            parts.append(f"chat {row.chat_id}")
+        if row.details:
+            parts.append(row.details)
+        lines.append(" · ".join(parts))
+    return "\n".join(lines), get_logs_keyboard(kind, value, next_cursor)
+
+
+@router.message(Command("logs"))
+async def logs_cmd(message: types.Message) -> None:
     """
-    Вспомогательная функция
+    /logs - последние действия модерации, кнопка "дальше" листает назад.
+    /logs <user_id> - только по пользователю,
+    /logs <chat_id> - только по чату (id группы отрицательный)
     """
-    bad_ids = await user_repo.run_check_for_chat(chat_id)
-    banned: list[int] = []
+    if not await _can_moderate(message):
+        await message.answer("Команда только для админов.")
+        return
 
-    for user_id in bad_ids:
+    kind, value = "a", 0
+    args = _get_args(message)
+    if args:
         try:
-            # В тестах у FakeBot есть именно ban_chat_member
-            await bot.ban_chat_member(chat_id, user_id)
-        except TelegramBadRequest:
-            # Если не получилось забанить (нет прав, нет в чате и т.п.) - просто пропускаем
-            continue
-        else:
-            banned.append(user_id)
+            value = int(args[0])
+        except ValueError:
+            await message.answer("id должен быть числом")
+            return
+        kind = "c" if value < 0 else "u"
+
+    text, keyboard = await _render_logs_page(kind, value)
+    await message.answer(text, reply_markup=keyboard)
+
+
+@router.callback_query(LogsPage.filter())
+async def logs_next_page(callback: types.CallbackQuery, callback_data: LogsPage) -> None:
+    if not await _can_moderate(callback):
+        await callback.answer("Только для админов.", show_alert=True)
+        return
+
+    text, keyboard = await _render_logs_page(
+        callback_data.kind,
+        callback_data.value,
+        before=decode_cursor(callback_data.ts, callback_data.id),
+    )
+    await callback.message.edit_text(text, reply_markup=keyboard)
+    await callback.answer()
+
+
+ARCHIVE_PREVIEW_SIZE = 20
+
+
+def _read_archive(month: Tuple[int, int], kind: str, value: int) -> Tuple[int, list]:
+    """сколько строк в архиве месяца и последние ARCHIVE_PREVIEW_SIZE из них"""
+    total, tail = 0, deque(maxlen=ARCHIVE_PREVIEW_SIZE)
+    for row in log_archive.iter_archived(month, **_logs_filter(kind, value)):
+        total += 1
+        tail.append(row)
+    return total, list(tail)
+
+
+@router.message(Command("archivelogs"))
+async def archive_logs_cmd(message: types.Message) -> None:
+    """
+    /archivelogs ГГГГ-ММ [id] - лог модерации за месяц, который уже
+    убрали из бд в архив (см. LOG_RETENTION_MONTHS)
+    """
+    if not await _can_moderate(message):
+        await message.answer("Команда только для админов.")
+        return
+
+    args = _get_args(message)
+    match = re.fullmatch(r"(\d{4})-(\d{2})", args[0]) if args else None
+    if not match or not 1 <= int(match.group(2)) <= 12:
+        await message.answer("Использование: /archivelogs ГГГГ-ММ [id]")
+        return
+    month = (int(match.group(1)), int(match.group(2)))
+
+    kind, value = "a", 0
+    if len(args) > 1:
+        try:
+            value = int(args[1])
+        except ValueError:
+            await message.answer("id должен быть числом")
+            return
+        kind = "c" if value < 0 else "u"
+
+    # gzip читаем в отдельном потоке, чтобы не держать event loop
+    total, rows = await asyncio.to_thread(_read_archive, month, kind, value)
+    if not total:
+        await message.answer(f"В архиве за {args[0]} ничего нет.")
+        return
+
+    lines = [f"В архиве за {args[0]}: {total}, последние {len(rows)}:"]
+    for row in rows:
+        parts = [row["created_at"][:16].replace("T", " "), row["action"]]
+        if row["telegram_id"] is not None:
+            parts.append(f"user {row['telegram_id']}")
+        if row["chat_id"] is not None:
+            parts.append(f"chat {row['chat_id']}")
+        if row["details"]:
+            parts.append(row["details"])
+        lines.append(" · ".join(parts))
+    await message.answer("\n".join(lines))
+
+
+async def _ban_blacklisted_in_chat(bot: Bot, chat_id: int, full: bool = False) -> list[int]:
+    """
+    Вспомогательная функция: банит в чате тех, кто попал в чс после
+    прошлой проверки (или весь чс, если full=True)
+    """
+    check = await user_repo.run_check_for_chat(chat_id, full=full)
+
+    # В тестах у FakeBot есть именно ban_chat_member
+    outcomes = await ban_executor.ban_many(bot, chat_id, check.ids)
+    # если не получилось забанить (нет прав, нет в чате и т.п.) - просто пропускаем
+    banned = [o.user_id for o in outcomes if o.ok]
+
+    # баны - в лог аудита (в фоне, одной пачкой с остальными записями)
+    for user_id in banned:
+        await audit_sink.log_moderation("ban", telegram_id=user_id, chat_id=chat_id)
 
+    # отметку чата сдвигаем, только если никого не бросили из-за лимитов
+    # или временных ошибок - иначе инкрементальная проверка их не увидит
+    if not any(o.retryable for o in outcomes):
+        await user_repo.confirm_chat_check(chat_id, check.watermark)
     return banned
 
 
@@ -173,8 +517,10 @@ async def _ban_blacklisted_in_chat(bot: Bot, chat_id: int) -> list[int]:
 async def cmd_force_check(message: types.Message) -> None:
     """
     /force_check - вручную запустить проверку текущего чата
+    (только тех, кого добавили в чс с прошлой проверки)
+    /force_check full - прогнать по чату весь черный список
     """
-    if not _is_admin(message):
+    if not await _can_moderate(message, chat_scoped=True):
         await message.answer("Команда только для админов.")
         return
 
@@ -192,7 +538,8 @@ async def cmd_force_check(message: types.Message) -> None:
 
     bot: Bot = message.bot  # type: ignore[assignment]
 
-    banned_users = await _ban_blacklisted_in_chat(bot, chat_id)
+    full = "full" in _get_args(message)
+    banned_users = await _ban_blacklisted_in_chat(bot, chat_id, full=full)
 
     if not banned_users:
         await message.answer("Проверила чат, никого не пришлось банить.")
@@ -207,4 +554,6 @@ async def cmd_force_check(message: types.Message) -> None:
 
 
 is_admin = _is_admin
-get_args = _get_args
\ No newline at end of file
+can_moderate = _can_moderate
+get_args = _get_args
+ban_blacklisted_in_chat = _ban_blacklisted_in_chat
\ No newline at end of file
@@ -14,13 +14,59 @@
 - [ ] Реализовать inline-клавиатуру для статистики
 - [ ] Создать клавиатуру для управления пользователями
 - [ ] Добавить клавиатуру для рассылки сообщений
-- [ ] Реализовать клавиатуру для просмотра логов
+- [x] Реализовать клавиатуру для просмотра логов
 - [ ] Создать клавиатуру подтверждения действий (да/нет)
 - [ ] Добавить callback_data для всех админ-кнопок
 
 """
 
-# TODO: Создать админ-клавиатуры
-# TODO: Добавить callback_data
-# TODO: Реализовать клавиатуру подтверждения
+from __future__ import annotations
 
+import datetime
+from typing import Optional, Tuple
+
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+class LogsPage(CallbackData, prefix="logs"):
+    """
+    Кнопка "дальше" в /logs.
+    kind: "a" - весь лог, "u" - по пользователю, "c" - по чату;
+    ts/id - курсор (created_at в микросекундах от эпохи и id последней строки).
+    Все поля - числа, чтобы влезть в 64 байта callback_data
+    """
+
+    kind: str
+    value: int
+    ts: int
+    id: int
+
+
+def encode_cursor(cursor: Tuple[datetime.datetime, int]) -> Tuple[int, int]:
+    created_at, log_id = cursor
+    return (created_at - _EPOCH) // datetime.timedelta(microseconds=1), log_id
+
+
+def decode_cursor(ts: int, log_id: int) -> Tuple[datetime.datetime, int]:
+    return _EPOCH + datetime.timedelta(microseconds=ts), log_id
+
+
+def get_logs_keyboard(
+    kind: str,
+    value: int,
+    cursor: Optional[Tuple[datetime.datetime, int]],
+) -> Optional[InlineKeyboardMarkup]:
+    """
+    Клавиатура под страницей лога; None, если дальше страниц нет
+    """
+    if cursor is None:
+        return None
+
+    ts, log_id = encode_cursor(cursor)
+    data = LogsPage(kind=kind, value=value, ts=ts, id=log_id).pack()
+    return InlineKeyboardMarkup(
+        inline_keyboard=[[InlineKeyboardButton(text="Дальше »", callback_data=data)]]
+    )
@@ -6,12 +6,27 @@
 Этот файл регистрирует все middleware бота.
 
 ЧТО НУЖНО СДЕЛАТЬ:
-- [ ] Импортировать все middleware
-- [ ] Создать функцию setup_middleware(dp: Dispatcher)
-- [ ] Зарегистрировать все middleware в правильном порядке
+- [x] Импортировать все middleware
+- [x] Создать функцию setup_middleware(dp: Dispatcher)
+- [x] Зарегистрировать все middleware в правильном порядке
 
 """
 
-# TODO: Импортировать middleware
-# TODO: Создать функцию setup_middleware
+from aiogram import Dispatcher
 
+from .membership import MembershipMiddleware
+from .throttling import ThrottlingMiddleware
+
+
+def setup_middleware(dp: Dispatcher) -> None:
+    """Зарегистрировать middleware бота."""
+    # учет участников групп - снаружи, чтобы видеть все апдейты
+    dp.update.outer_middleware(MembershipMiddleware())
+
+    # антифлуд - внутренний: считаются только апдейты, которые дошли
+    # до хендлеров; обычные сообщения в группах (не команды) он
+    # пропускает сам - их ловит fallback из common.py.
+    # один экземпляр на сообщения и кнопки - лимит на пользователя общий
+    throttling = ThrottlingMiddleware()
+    dp.message.middleware(throttling)
+    dp.callback_query.middleware(throttling)
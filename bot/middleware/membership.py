@@ -0,0 +1,114 @@
+"""
+Middleware, которое кормит индекс участников групп (MembershipTracker).
+
+Заодно отмечает активность авторов сообщений (LastSeenBuffer) и
+сбрасывает кэш чата (ChatCache), когда меняются админы или название,
+а права на команды (Authorizer) поправляет прямо по апдейту.
+Стоит снаружи (dp.update.outer_middleware), поэтому видит каждый апдейт,
+даже если ни один хендлер на него не сработал. Работает только с
+памятью, в бд не ходит; ошибка учета никогда не мешает обработке апдейта.
+"""
+
+from logging import getLogger
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import ChatMemberUpdated, Message, TelegramObject, Update
+
+from bot.services.authorization import Authorizer, authorizer
+from bot.services.chat_cache import ChatCache, chat_cache
+from bot.services.last_seen_buffer import LastSeenBuffer, last_seen_buffer
+from bot.services.membership_tracker import GONE_STATUSES, MembershipTracker, membership_tracker
+
+logger = getLogger(__name__)
+
+GROUP_CHAT_TYPES = ("group", "supergroup")
+ADMIN_STATUSES = ("creator", "administrator")
+
+
+class MembershipMiddleware(BaseMiddleware):
+    """Отмечает в индексе участников групп всех, кого видно в апдейтах."""
+
+    def __init__(
+        self,
+        tracker: Optional[MembershipTracker] = None,
+        last_seen: Optional[LastSeenBuffer] = None,
+        chats: Optional[ChatCache] = None,
+        roles: Optional[Authorizer] = None,
+    ) -> None:
+        self.tracker = tracker or membership_tracker
+        self.last_seen = last_seen or last_seen_buffer
+        self.chats = chats or chat_cache
+        self.roles = roles or authorizer
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        try:
+            bot = data.get("bot")
+            self.observe(event, bot_id=bot.id if bot is not None else None)
+        except Exception as e:
+            logger.error(f"Failed to track membership: {str(e)}", exc_info=True)
+        return await handler(event, data)
+
+    def observe(self, event: TelegramObject, bot_id: Optional[int] = None) -> None:
+        """Разобрать апдейт (или само сообщение / chat_member).
+
+        Args:
+            event: Апдейт, сообщение или ChatMemberUpdated
+            bot_id: ID нашего бота - чтобы отличить его статус от статуса
+                других ботов в chat_member
+        """
+        if isinstance(event, Update):
+            if event.my_chat_member is not None:
+                self._observe_chat_member(event.my_chat_member, own=True)
+                return
+            event = event.message or event.chat_member
+        if isinstance(event, Message):
+            self._observe_message(event)
+        elif isinstance(event, ChatMemberUpdated):
+            own = bot_id is not None and event.new_chat_member.user.id == bot_id
+            self._observe_chat_member(event, own=own)
+
+    def _observe_message(self, message: Message) -> None:
+        chat = message.chat
+        if chat.type not in GROUP_CHAT_TYPES:
+            return
+        # от имени канала/анонимного админа from_user - служебный бот, его отсеет трекер
+        if message.from_user is not None:
+            self.tracker.observe(chat.id, message.from_user, title=chat.title)
+            if not message.from_user.is_bot:
+                self.last_seen.touch(chat.id, message.from_user.id)
+        for user in message.new_chat_members or ():
+            self.tracker.observe(chat.id, user, status="member", title=chat.title)
+        if message.left_chat_member is not None:
+            self.tracker.forget(chat.id, message.left_chat_member.id)
+        if message.new_chat_title is not None or message.migrate_to_chat_id is not None:
+            self.chats.invalidate(chat.id)
+
+    def _observe_chat_member(self, update: ChatMemberUpdated, own: bool = False) -> None:
+        chat = update.chat
+        if chat.type not in GROUP_CHAT_TYPES:
+            return
+        new = update.new_chat_member
+        if update.old_chat_member.status in ADMIN_STATUSES or new.status in ADMIN_STATUSES:
+            # кого-то назначили/сняли админом (или его права поменялись):
+            # права на команды правим на месте, список админов перечитаем
+            self.chats.invalidate(chat.id, admins_only=True)
+            self.roles.observe_member(chat.id, new)
+        if own:
+            # my_chat_member: сменился статус самого бота
+            if new.status in GONE_STATUSES:
+                self.tracker.drop_chat(chat.id)
+                self.chats.invalidate(chat.id)
+                self.roles.forget_chat(chat.id)
+            else:
+                self.tracker.observe(chat.id, update.from_user, title=chat.title)
+            return
+        if new.user.is_bot:
+            # чужие боты в индекс не попадают (трекер их и так отсеет)
+            return
+        self.tracker.observe(chat.id, new.user, status=new.status, title=chat.title)
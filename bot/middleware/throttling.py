@@ -9,17 +9,221 @@ MIDDLEWARE ДЛЯ ОГРАНИЧЕНИЯ ЧАСТОТЫ ЗАПРОСОВ (THROTT
 - Временные блокировки при превышении лимита
 
 ЧТО НУЖНО СДЕЛАТЬ:
-- [ ] Реализовать класс ThrottlingMiddleware
-- [ ] Настроить лимиты (например, 3 сообщения в 5 секунд)
-- [ ] Использовать Redis или in-memory хранилище для отслеживания
-- [ ] Реализовать обработку превышения лимита (отправка предупреждения)
-- [ ] Добавить настройки лимитов в config
-- [ ] Реализовать разные лимиты для разных типов сообщений
-- [ ] Добавить исключения для администраторов
+- [x] Реализовать класс ThrottlingMiddleware
+- [x] Настроить лимиты (например, 3 сообщения в 5 секунд)
+- [x] Использовать Redis или in-memory хранилище для отслеживания
+- [x] Реализовать обработку превышения лимита (отправка предупреждения)
+- [x] Добавить настройки лимитов в config
+- [x] Реализовать разные лимиты для разных типов сообщений
+- [x] Добавить исключения для администраторов
 
+Как устроено:
+- лимит - GCRA (тот же token bucket, но состояние - одно число на ключ:
+  "теоретическое время прибытия" следующего запроса, TAT). Проверка - O(1);
+- ключи: пользователь (THROTTLE_RATE за THROTTLE_PERIOD) и пара
+  пользователь+команда (THROTTLE_COMMAND_LIMITS) для тяжелых команд;
+- ключ, у которого TAT уже в прошлом, ничем не отличается от нового -
+  такие выбрасываются по ходу (ключи лежат в порядке последнего
+  обращения), а всего ключей не больше THROTTLE_MAX_KEYS;
+- предупреждение "слишком часто" - не чаще раза за окно на ключ,
+  остальные лишние апдейты молча пропускаются;
+- админы (ADMIN_IDS и users.is_admin) лимитов не имеют;
+- обычные сообщения в группах (не команды) не считаются и не
+  ограничиваются вовсе: их ловит общий fallback-хендлер, и иначе
+  участник, который пишет чаще лимита, получал бы "слишком часто"
+  прямо в группе.
 """
 
-# TODO: Реализовать ThrottlingMiddleware
-# TODO: Настроить лимиты
-# TODO: Добавить обработку превышения лимита
+import time
+from collections import OrderedDict
+from logging import getLogger
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
 
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery, Message, TelegramObject
+
+import config
+from bot.services.authorization import Authorizer, authorizer
+
+logger = getLogger(__name__)
+
+GROUP_CHAT_TYPES = ("group", "supergroup")
+
+
+class GCRALimiter:
+    """Лимит "count событий за period секунд" на ключ, GCRA."""
+
+    def __init__(self, count: int, period: float, max_keys: Optional[int] = None) -> None:
+        """Инициализация лимита.
+
+        Args:
+            count: Сколько событий разрешено за окно (это же - размер всплеска)
+            period: Длина окна, секунды
+            max_keys: Сколько ключей держать в памяти (None - THROTTLE_MAX_KEYS)
+        """
+        self.period = period
+        # интервал между событиями при ровном потоке
+        self.interval = period / max(count, 1)
+        self._max_keys = max_keys
+        # ключ -> [TAT, до какого времени уже предупредили]
+        self._state: "OrderedDict[Hashable, List[float]]" = OrderedDict()
+
+    @property
+    def max_keys(self) -> int:
+        if self._max_keys is None:
+            return config.THROTTLE_MAX_KEYS
+        return self._max_keys
+
+    def __len__(self) -> int:
+        return len(self._state)
+
+    def hit(self, key: Hashable, now: Optional[float] = None) -> Tuple[bool, float]:
+        """Учесть событие.
+
+        Args:
+            key: Ключ (пользователь, пользователь+команда...)
+            now: Текущее monotonic-время (для тестов)
+
+        Returns:
+            (разрешено ли, через сколько секунд можно снова)
+        """
+        now = time.monotonic() if now is None else now
+        self._evict(now)
+
+        state = self._state.get(key)
+        tat = max(state[0], now) if state is not None else now
+        # новое событие сдвигает TAT на interval; пускаем, пока TAT
+        # не уходит вперед больше чем на окно
+        new_tat = tat + self.interval
+        if new_tat - now > self.period:
+            return False, new_tat - now - self.period
+
+        if state is None:
+            self._state[key] = [new_tat, 0.0]
+            # жесткий предел: выбрасываем самые давние ключи
+            while len(self._state) > max(self.max_keys, 1):
+                self._state.popitem(last=False)
+        else:
+            state[0] = new_tat
+            self._state.move_to_end(key)
+        return True, 0.0
+
+    def should_warn(self, key: Hashable, now: Optional[float] = None) -> bool:
+        """Предупреждать ли о превышении (не чаще раза за окно на ключ)."""
+        now = time.monotonic() if now is None else now
+        state = self._state.get(key)
+        if state is None or state[1] > now:
+            return False
+        state[1] = now + self.period
+        return True
+
+    def _evict(self, now: float) -> None:
+        # спереди - ключи, к которым дольше всего не обращались; если их
+        # TAT и срок предупреждения в прошлом, ключ можно забыть
+        while self._state:
+            key, (tat, warned_until) = next(iter(self._state.items()))
+            if tat > now or warned_until > now:
+                break
+            del self._state[key]
+
+
+def _command_name(event: TelegramObject) -> Optional[str]:
+    """Имя команды без "/" и "@bot" (None - не команда).
+
+    Как и фильтр Command, смотрит и в подпись: /importblacklist обычно
+    приходит подписью к файлу.
+    """
+    text = (event.text or event.caption) if isinstance(event, Message) else None
+    if not text or not text.startswith("/"):
+        return None
+    return text[1:].split(maxsplit=1)[0].split("@", 1)[0].lower() or None
+
+
+def _is_group_message(event: TelegramObject) -> bool:
+    chat = getattr(event, "chat", None) if isinstance(event, Message) else None
+    return getattr(chat, "type", None) in GROUP_CHAT_TYPES
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """Ограничивает частоту сообщений и нажатий кнопок от пользователя."""
+
+    def __init__(
+        self,
+        rate: Optional[int] = None,
+        period: Optional[float] = None,
+        command_limits: Optional[Dict[str, Tuple[int, float]]] = None,
+        max_keys: Optional[int] = None,
+        roles: Optional[Authorizer] = None,
+    ) -> None:
+        """Инициализация.
+
+        Args:
+            rate: Сколько апдейтов от пользователя за period (None - THROTTLE_RATE)
+            period: Окно, секунды (None - THROTTLE_PERIOD)
+            command_limits: Команда -> (сколько, за сколько секунд)
+                (None - THROTTLE_COMMAND_LIMITS)
+            max_keys: Сколько ключей держать в каждом лимите (None - THROTTLE_MAX_KEYS)
+            roles: Проверка админов (по умолчанию общая)
+        """
+        self.user_limit = GCRALimiter(
+            config.THROTTLE_RATE if rate is None else rate,
+            config.THROTTLE_PERIOD if period is None else period,
+            max_keys,
+        )
+        limits = config.THROTTLE_COMMAND_LIMITS if command_limits is None else command_limits
+        self.command_limits = {
+            command: GCRALimiter(count, seconds, max_keys)
+            for command, (count, seconds) in limits.items()
+        }
+        self.roles = roles or authorizer
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user = getattr(event, "from_user", None)
+        if user is None:
+            return await handler(event, data)
+
+        command = _command_name(event)
+        if command is None and _is_group_message(event):
+            # переписка в группе - не к боту
+            return await handler(event, data)
+
+        now = time.monotonic()
+        limiter, key = self.user_limit, user.id
+        allowed, retry_after = limiter.hit(key, now)
+
+        if allowed and command in self.command_limits:
+            limiter, key = self.command_limits[command], (user.id, command)
+            allowed, retry_after = limiter.hit(key, now)
+
+        # админов проверяем только когда лимит уже сработал: для остальных
+        # апдейтов это лишняя работа (хоть и без запросов - права кэшируются)
+        if allowed or await self._is_exempt(user.id):
+            return await handler(event, data)
+
+        if limiter.should_warn(key, now):
+            await self._warn(event, retry_after)
+        return None
+
+    async def _is_exempt(self, user_id: int) -> bool:
+        if self.roles.is_bot_admin(user_id):
+            return True
+        try:
+            return await self.roles.is_db_admin(user_id)
+        except Exception as e:
+            logger.error(f"Failed to check admin for throttling: {str(e)}", exc_info=True)
+            return False
+
+    @staticmethod
+    async def _warn(event: TelegramObject, retry_after: float) -> None:
+        text = f"Слишком часто. Попробуйте через {max(int(retry_after + 0.999), 1)} сек."
+        try:
+            # у сообщения - ответ в чат, у кнопки - всплывающая подсказка
+            if isinstance(event, (CallbackQuery, Message)):
+                await event.answer(text)
+        except Exception as e:
+            logger.warning(f"Failed to send throttling warning: {str(e)}")
@@ -0,0 +1,258 @@
+"""
+Асинхронная запись журналов аудита пачками.
+
+Горячие места (баны, чистка групп) кладут записи в ограниченную
+asyncio-очередь и не ждут бд. Фоновая задача забирает их пачками -
+как только набралось AUDIT_BATCH_SIZE или прошло AUDIT_FLUSH_INTERVAL
+секунд с первой записи пачки - и пишет каждую таблицу одним
+многострочным INSERT.
+
+- если очередь заполнена, log_* ждет, пока в ней освободится место
+  (писатели притормаживают, а память не растет); если фоновая задача
+  не запущена, ждать некого - тогда очередь сбрасывается в бд прямо
+  из log_*;
+- пачку, которую не удалось записать, повторяем с паузой (не больше
+  max_retries попыток) и только потом выбрасываем;
+- stop() дописывает все, что осталось в очереди, и только потом
+  останавливает задачу;
+- время записи фиксируется в момент вызова, а не при сбросе в бд.
+"""
+
+import asyncio
+import datetime
+from logging import getLogger
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import insert
+
+import config
+from bot.database.connection import SessionFactory
+from bot.database.models import ActionLog, ModerationLog
+from bot.database.repository import UserRepository, user_repo
+
+logger = getLogger(__name__)
+
+Record = Tuple[type, Dict]
+
+# метка в очереди: фоновая задача дописывает пачку и завершается
+_STOP = object()
+
+
+class AuditSink:
+    """Буфер записей ActionLog / ModerationLog с фоновой записью в бд."""
+
+    def __init__(
+        self,
+        session_factory=SessionFactory,
+        repo: UserRepository = user_repo,
+        max_size: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        max_retries: int = 3,
+        retry_backoff: float = 0.5,
+    ) -> None:
+        """Инициализация буфера.
+
+        Параметры, оставленные None, берутся из конфига (AUDIT_*) при первой
+        записи - общий audit_sink создается при импорте модуля.
+
+        Args:
+            session_factory: Фабрика сессий для action_logs
+            repo: Репозиторий, через который пишутся moderation_logs
+                (чтобы вместе со строками обновлялся счетчик действий)
+            max_size: Размер очереди; при заполнении писатели ждут
+            batch_size: Максимум записей в одной пачке
+            flush_interval: Сколько секунд пачка может ждать добора
+            max_retries: Сколько раз пробуем записать пачку, прежде чем
+                выбросить ее
+            retry_backoff: Пауза перед повтором, секунды (удваивается
+                с каждой попыткой)
+        """
+        self._session_factory = session_factory
+        self.repo = repo
+        self._max_size = max_size
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self.max_retries = max(1, max_retries)
+        self.retry_backoff = retry_backoff
+        self._queue_obj: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        # сколько записей не удалось записать (ошибка бд, попытки кончились)
+        self.dropped = 0
+
+    @property
+    def batch_size(self) -> int:
+        value = config.AUDIT_BATCH_SIZE if self._batch_size is None else self._batch_size
+        return max(1, value)
+
+    @property
+    def flush_interval(self) -> float:
+        if self._flush_interval is None:
+            return config.AUDIT_FLUSH_INTERVAL
+        return self._flush_interval
+
+    @property
+    def _queue(self) -> asyncio.Queue:
+        if self._queue_obj is None:
+            size = config.AUDIT_QUEUE_SIZE if self._max_size is None else self._max_size
+            self._queue_obj = asyncio.Queue(maxsize=max(1, size))
+        return self._queue_obj
+
+    @property
+    def pending(self) -> int:
+        """Сколько записей ждет записи в очереди."""
+        return self._queue.qsize()
+
+    @property
+    def running(self) -> bool:
+        """Работает ли фоновая запись."""
+        return self._task is not None and not self._task.done()
+
+    async def _put(self, record: Record) -> None:
+        # без фоновой задачи место в очереди само не освободится:
+        # сбрасываем ее в бд сами, а не ждем вечно
+        while not self.running and self._queue.full():
+            await self.flush()
+        await self._queue.put(record)
+
+    async def log_action(
+        self,
+        action_type: str,
+        user_id: Optional[int] = None,
+        group_id: Optional[int] = None,
+        target_user_id: Optional[int] = None,
+        details: Optional[str] = None,
+    ) -> None:
+        """Поставить в очередь запись action_logs (поля как у ActionLogRepository.create_log)."""
+        await self._put(
+            (
+                ActionLog,
+                {
+                    "action_type": action_type,
+                    "user_id": user_id,
+                    "group_id": group_id,
+                    "target_user_id": target_user_id,
+                    "details": details,
+                    "created_at": datetime.datetime.utcnow(),
+                },
+            )
+        )
+
+    async def log_moderation(
+        self,
+        action: str,
+        telegram_id: Optional[int] = None,
+        chat_id: Optional[int] = None,
+        details: Optional[str] = None,
+    ) -> None:
+        """Поставить в очередь запись moderation_logs."""
+        await self._put(
+            (
+                ModerationLog,
+                {
+                    "action": action,
+                    "telegram_id": telegram_id,
+                    "chat_id": chat_id,
+                    "details": details,
+                    "created_at": datetime.datetime.utcnow(),
+                },
+            )
+        )
+
+    async def _write(self, batch: List[Record]) -> None:
+        action_rows = [row for model, row in batch if model is ActionLog]
+        moderation_rows = [row for model, row in batch if model is ModerationLog]
+        # таблицы пишутся отдельно: повтор одной не задваивает другую
+        if action_rows:
+            await self._write_rows(self._insert_actions, action_rows)
+        if moderation_rows:
+            await self._write_rows(self.repo.write_logs, moderation_rows)
+
+    async def _insert_actions(self, rows: List[Dict]) -> None:
+        async with self._session_factory() as session:
+            await session.execute(insert(ActionLog).values(rows))
+            await session.commit()
+
+    async def _write_rows(
+        self,
+        write: Callable[[List[Dict]], Awaitable[None]],
+        rows: List[Dict],
+    ) -> None:
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                await write(rows)
+                return
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    self.dropped += len(rows)
+                    logger.error(
+                        f"Failed to write {len(rows)} audit records after {attempt} attempts: {str(e)}",
+                        exc_info=True,
+                    )
+                    return
+                logger.warning(f"Failed to write {len(rows)} audit records, retrying: {str(e)}")
+                await asyncio.sleep(self.retry_backoff * 2 ** (attempt - 1))
+
+    def _take_ready(self, batch: List) -> None:
+        while len(batch) < self.batch_size and batch[-1] is not _STOP:
+            try:
+                batch.append(self._queue.get_nowait())
+            except asyncio.QueueEmpty:
+                return
+
+    async def _collect(self) -> List:
+        """Дождаться первой записи и добрать пачку до размера, таймаута или _STOP."""
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.flush_interval
+        while len(batch) < self.batch_size and batch[-1] is not _STOP:
+            self._take_ready(batch)
+            timeout = deadline - loop.time()
+            if len(batch) >= self.batch_size or batch[-1] is _STOP or timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            stopping = batch[-1] is _STOP
+            try:
+                await self._write([record for record in batch if record is not _STOP])
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if stopping:
+                return
+
+    async def flush(self) -> None:
+        """Записать все, что сейчас лежит в очереди (без фоновой задачи)."""
+        while not self._queue.empty():
+            batch: List[Record] = [self._queue.get_nowait()]
+            self._take_ready(batch)
+            try:
+                await self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def start(self) -> None:
+        """Запустить фоновую запись."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Дописать очередь и остановить фоновую запись."""
+        if self._task is not None:
+            if not self._task.done():
+                # метка встает в конец очереди: все, что до нее, будет записано
+                await self._queue.put(_STOP)
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+
+audit_sink = AuditSink()
@@ -0,0 +1,177 @@
+"""
+Кто может пользоваться командами модерации.
+
+Права складываются из трех источников:
+- ADMIN_IDS из конфига - глобальные админы бота;
+- users.is_admin в бд - админы, назначенные через бд (список всех
+  читается одним запросом и живет ROLE_CACHE_TTL секунд);
+- админы конкретного чата с правом банить - только для команд,
+  которые работают с этим чатом (например /force_check).
+
+Админы чатов хранятся в ограниченном кэше (не больше ROLE_CACHE_CHATS
+чатов, LRU, запись живет ROLE_CACHE_TTL секунд). Апдейты chat_member
+прогревают его на месте: назначили или сняли админа - запись чата
+поправляется без запроса к API (см. bot/middleware/membership.py).
+В API идем, только когда чата в кэше нет или запись протухла, и то
+через ChatCache (один запрос на чат, сколько бы команд ни пришло).
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from logging import getLogger
+from typing import FrozenSet, Iterable, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.types import ChatMember
+
+import config
+from bot.database import statements
+from bot.database.connection import SessionFactory
+from bot.services.chat_cache import ChatCache, chat_cache
+
+logger = getLogger(__name__)
+
+
+def can_moderate_chat(member: ChatMember) -> bool:
+    """Может ли участник чата модерировать его (создатель или админ с правом банить)."""
+    if member.status == "creator":
+        return True
+    return member.status == "administrator" and bool(getattr(member, "can_restrict_members", False))
+
+
+class Authorizer:
+    """Проверка прав на команды модерации без запросов к API на горячем пути."""
+
+    def __init__(
+        self,
+        chats: ChatCache = chat_cache,
+        session_factory=SessionFactory,
+        ttl: Optional[float] = None,
+        max_chats: Optional[int] = None,
+    ) -> None:
+        """Инициализация.
+
+        Args:
+            chats: Кэш запросов к Telegram о чатах
+            session_factory: Фабрика сессий БД
+            ttl: Сколько секунд жить записям (None - ROLE_CACHE_TTL)
+            max_chats: Сколько чатов держать в кэше (None - ROLE_CACHE_CHATS)
+        """
+        self.chats = chats
+        self._session_factory = session_factory
+        self._ttl = ttl
+        self._max_chats = max_chats
+        # chat_id -> (monotonic-время, когда протухнет, кто может модерировать)
+        self._chat_admins: "OrderedDict[int, Tuple[float, FrozenSet[int]]]" = OrderedDict()
+        # (когда протухнет, telegram_id с users.is_admin)
+        self._db_admins: Optional[Tuple[float, FrozenSet[int]]] = None
+        self._db_lock = asyncio.Lock()
+
+    @property
+    def ttl(self) -> float:
+        if self._ttl is None:
+            return config.ROLE_CACHE_TTL
+        return self._ttl
+
+    @property
+    def max_chats(self) -> int:
+        if self._max_chats is None:
+            return config.ROLE_CACHE_CHATS
+        return self._max_chats
+
+    # глобальные права
+
+    @staticmethod
+    def is_bot_admin(user_id: int) -> bool:
+        """Есть ли пользователь в ADMIN_IDS."""
+        admin_ids = getattr(config, "ADMIN_IDS", []) or []
+        # если список админов пустой – по умолчанию считаем, что admin_id = 1
+        if not admin_ids:
+            return user_id == 1
+        return user_id in admin_ids
+
+    async def is_db_admin(self, user_id: int) -> bool:
+        """Отмечен ли пользователь как админ в бд (users.is_admin)."""
+        cached = self._db_admins
+        if cached is None or time.monotonic() >= cached[0]:
+            async with self._db_lock:
+                cached = self._db_admins
+                if cached is None or time.monotonic() >= cached[0]:
+                    async with self._session_factory() as session:
+                        conn = await session.connection()
+                        ids = frozenset((await conn.execute(statements.ADMIN_TELEGRAM_IDS)).scalars())
+                    cached = (time.monotonic() + self.ttl, ids)
+                    self._db_admins = cached
+        return user_id in cached[1]
+
+    # права в чате
+
+    async def is_chat_admin(self, bot: Bot, chat_id: int, user_id: int) -> bool:
+        """Может ли пользователь модерировать чат (по кэшу, в API - при промахе)."""
+        entry = self._chat_admins.get(chat_id)
+        if entry is not None and time.monotonic() < entry[0]:
+            self._chat_admins.move_to_end(chat_id)
+            return user_id in entry[1]
+
+        members = await self.chats.get_administrators(bot, chat_id)
+        admins = frozenset(member.user.id for member in members if can_moderate_chat(member))
+        self._remember(chat_id, admins)
+        return user_id in admins
+
+    def observe_member(self, chat_id: int, member: ChatMember) -> None:
+        """Поправить запись чата по апдейту chat_member (без запроса к API)."""
+        entry = self._chat_admins.get(chat_id)
+        if entry is None:
+            return
+        admins = set(entry[1])
+        if can_moderate_chat(member):
+            admins.add(member.user.id)
+        else:
+            admins.discard(member.user.id)
+        # запись не продлеваем: TTL страхует от пропущенных апдейтов
+        self._chat_admins[chat_id] = (entry[0], frozenset(admins))
+
+    def forget_chat(self, chat_id: int) -> None:
+        """Выбросить запись чата."""
+        self._chat_admins.pop(chat_id, None)
+
+    def _remember(self, chat_id: int, admins: Iterable[int]) -> None:
+        self._chat_admins[chat_id] = (time.monotonic() + self.ttl, frozenset(admins))
+        self._chat_admins.move_to_end(chat_id)
+        while len(self._chat_admins) > max(self.max_chats, 0):
+            self._chat_admins.popitem(last=False)
+
+    # все вместе
+
+    async def can_moderate(
+        self,
+        user_id: int,
+        bot: Optional[Bot] = None,
+        chat_id: Optional[int] = None,
+    ) -> bool:
+        """Можно ли пользователю модерировать.
+
+        Args:
+            user_id: Telegram ID пользователя
+            bot: Бот (нужен для проверки админов чата)
+            chat_id: Чат, с которым работает команда; None - команда
+                глобальная, права чата не учитываются
+
+        Returns:
+            True, если пользователь глобальный админ, админ в бд или
+            (для команд чата) может банить в этом чате
+        """
+        if self.is_bot_admin(user_id):
+            return True
+        try:
+            if await self.is_db_admin(user_id):
+                return True
+            if bot is not None and chat_id is not None and chat_id < 0:
+                return await self.is_chat_admin(bot, chat_id, user_id)
+        except Exception as e:
+            logger.error(f"Failed to resolve permissions for {user_id}: {str(e)}", exc_info=True)
+        return False
+
+
+authorizer = Authorizer()
@@ -0,0 +1,236 @@
+"""
+Исполнитель банов через Bot API.
+
+Вместо того чтобы ждать каждый ban_chat_member по очереди, держит
+несколько запросов в полете и сам следит за лимитами:
+- общий token bucket на бота и отдельный на каждый чат;
+- на TelegramRetryAfter ставит всех на паузу на retry_after секунд
+  и возвращает пользователя в очередь;
+- BadRequest/Forbidden (нет прав, пользователя нет в чате) - окончательный
+  отказ; остальные ошибки (сеть, 5xx, таймауты) - временные: пользователь
+  возвращается в очередь с паузой, а если попытки кончились - результат
+  BAN_ERROR, и такого пользователя надо проверить еще раз;
+- по каждому пользователю возвращает результат (BanOutcome).
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from logging import getLogger
+from typing import Dict, Iterable, List, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+
+import config
+
+logger = getLogger(__name__)
+
+BAN_OK = "banned"
+BAN_FAILED = "failed"
+BAN_RATE_LIMITED = "rate_limited"
+# временная ошибка (сеть, ошибка сервера телеграма), попытки кончились
+BAN_ERROR = "error"
+
+
+@dataclass
+class BanOutcome:
+    """Результат бана одного пользователя."""
+
+    user_id: int
+    status: str
+    error: Optional[str] = None
+    attempts: int = 1
+
+    @property
+    def ok(self) -> bool:
+        return self.status == BAN_OK
+
+    @property
+    def retryable(self) -> bool:
+        """Бан не удался по временной причине - пользователя стоит проверить снова."""
+        return self.status in (BAN_RATE_LIMITED, BAN_ERROR)
+
+
+class TokenBucket:
+    """Простой token bucket: rate токенов в секунду, не больше capacity."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None) -> None:
+        """Инициализация ведра.
+
+        Args:
+            rate: Сколько токенов добавляется в секунду
+            capacity: Размер ведра (по умолчанию равен rate, т.е. всплеск в 1 секунду)
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        """Дождаться и забрать один токен."""
+        while True:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class BanExecutor:
+    """Параллельный бан пользователей с учетом лимитов Bot API."""
+
+    def __init__(
+        self,
+        concurrency: Optional[int] = None,
+        global_rate: Optional[float] = None,
+        chat_rate: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        retry_backoff: float = 0.5,
+    ) -> None:
+        """Инициализация исполнителя.
+
+        Параметры, оставленные None, берутся из конфига (BAN_*) при первом бане,
+        а не при создании - общий ban_executor создается при импорте модуля.
+
+        Args:
+            concurrency: Сколько запросов к API держим одновременно
+            global_rate: Лимит запросов в секунду на весь бот
+            chat_rate: Лимит запросов в секунду в один чат
+            max_retries: Сколько раз повторяем бан после retry_after
+                или временной ошибки
+            retry_backoff: Пауза перед повтором после временной ошибки,
+                секунды (удваивается с каждой попыткой)
+        """
+        self._concurrency = concurrency
+        self._global_rate = global_rate
+        self._chat_rate = chat_rate
+        self._max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._global_bucket: Optional[TokenBucket] = None
+        self._chat_buckets: Dict[int, TokenBucket] = {}
+        # до какого момента (monotonic) телеграм попросил нас помолчать
+        self._paused_until = 0.0
+
+    @property
+    def concurrency(self) -> int:
+        value = config.BAN_CONCURRENCY if self._concurrency is None else self._concurrency
+        return max(1, value)
+
+    @property
+    def chat_rate(self) -> float:
+        return config.BAN_CHAT_RATE if self._chat_rate is None else self._chat_rate
+
+    @property
+    def max_retries(self) -> int:
+        return config.BAN_MAX_RETRIES if self._max_retries is None else self._max_retries
+
+    def _get_global_bucket(self) -> TokenBucket:
+        if self._global_bucket is None:
+            rate = config.BAN_GLOBAL_RATE if self._global_rate is None else self._global_rate
+            self._global_bucket = TokenBucket(rate)
+        return self._global_bucket
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(self.chat_rate)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    async def _wait_for_pause(self) -> None:
+        delay = self._paused_until - time.monotonic()
+        while delay > 0:
+            await asyncio.sleep(delay)
+            delay = self._paused_until - time.monotonic()
+
+    async def ban_many(
+        self,
+        bot: Bot,
+        chat_id: int,
+        user_ids: Iterable[int],
+    ) -> List[BanOutcome]:
+        """Забанить пользователей в чате.
+
+        Args:
+            bot: Бот, от имени которого баним
+            chat_id: ID чата
+            user_ids: ID пользователей (повторы схлопываются)
+
+        Returns:
+            Результаты в том же порядке, что и user_ids
+        """
+        order = list(dict.fromkeys(user_ids))
+        if not order:
+            return []
+
+        outcomes: Dict[int, BanOutcome] = {}
+        queue: "asyncio.Queue[tuple[int, int]]" = asyncio.Queue()
+        for user_id in order:
+            queue.put_nowait((user_id, 1))
+
+        chat_bucket = self._chat_bucket(chat_id)
+        global_bucket = self._get_global_bucket()
+
+        async def worker() -> None:
+            while True:
+                user_id, attempt = await queue.get()
+                try:
+                    await self._wait_for_pause()
+                    await global_bucket.acquire()
+                    await chat_bucket.acquire()
+                    await bot.ban_chat_member(chat_id=chat_id, user_id=user_id)
+                except TelegramRetryAfter as e:
+                    self._paused_until = max(
+                        self._paused_until, time.monotonic() + e.retry_after
+                    )
+                    if attempt < self.max_retries:
+                        logger.warning(
+                            "Flood control in chat %s, retry user %s in %ss",
+                            chat_id, user_id, e.retry_after,
+                        )
+                        queue.put_nowait((user_id, attempt + 1))
+                    else:
+                        outcomes[user_id] = BanOutcome(
+                            user_id, BAN_RATE_LIMITED, str(e), attempt
+                        )
+                except (TelegramBadRequest, TelegramForbiddenError) as e:
+                    # нет прав, пользователя нет в чате и т.п. - просто фиксируем
+                    outcomes[user_id] = BanOutcome(user_id, BAN_FAILED, str(e), attempt)
+                except Exception as e:
+                    # сеть, 5xx, таймаут - повторим чуть позже
+                    if attempt < self.max_retries:
+                        logger.warning(
+                            "Temporary error banning user %s in chat %s, retrying: %s",
+                            user_id, chat_id, e,
+                        )
+                        await asyncio.sleep(self.retry_backoff * 2 ** (attempt - 1))
+                        queue.put_nowait((user_id, attempt + 1))
+                    else:
+                        outcomes[user_id] = BanOutcome(user_id, BAN_ERROR, str(e), attempt)
+                else:
+                    outcomes[user_id] = BanOutcome(user_id, BAN_OK, None, attempt)
+                finally:
+                    queue.task_done()
+
+        workers = [
+            asyncio.create_task(worker())
+            for _ in range(min(self.concurrency, len(order)))
+        ]
+        try:
+            await queue.join()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+        return [outcomes[user_id] for user_id in order]
+
+
+# один общий исполнитель: лимиты у телеграма на бота, а не на вызов
+ban_executor = BanExecutor()
@@ -0,0 +1,119 @@
+"""
+Импорт и экспорт черного списка файлами.
+
+Чтение списков id для массового импорта в черный список.
+
+Файл читается построчно, целиком в память не загружается.
+Формат - обычный текст или CSV: в каждой строке первым полем идет
+telegram id, дальше может быть что угодно (username, комментарий).
+Разделители - запятая, точка с запятой, таб или пробел.
+Пустые строки и строки с # пропускаем, первую нечисловую строку
+считаем заголовком. Файл может быть сжат gzip (как тот, что отдает экспорт).
+
+Экспорт пишет CSV в gzip-файл по мере чтения из бд, пачками.
+"""
+
+import csv
+import gzip
+import re
+from typing import AsyncIterable, IO, Iterable, Iterator, Optional, Sequence
+
+_GZIP_MAGIC = b"\x1f\x8b"
+
+_SEPARATORS = re.compile(r"[,;\s]+")
+
+# telegram_id - BIGINT в бд; все, что больше, не запишется (а настоящие
+# id телеграма и так меньше 2**52)
+MAX_TELEGRAM_ID = 2**63 - 1
+
+
+def parse_id(line: str) -> Optional[int]:
+    """Достать telegram id из начала строки.
+
+    Args:
+        line: Строка файла
+
+    Returns:
+        id или None, если первое поле не целое от 1 до MAX_TELEGRAM_ID
+    """
+    first = _SEPARATORS.split(line.strip(), maxsplit=1)[0].strip("\"'")
+    try:
+        value = int(first)
+    except ValueError:
+        return None
+    return value if 0 < value <= MAX_TELEGRAM_ID else None
+
+
+class IdFileParser:
+    """Потоковый разбор строк с id; считает битые строки."""
+
+    def __init__(self) -> None:
+        """Инициализация счетчиков."""
+        self.invalid = 0
+
+    def iter_ids(self, lines: Iterable[str]) -> Iterator[int]:
+        """Перебрать id из строк файла.
+
+        Args:
+            lines: Строки (например, открытый текстовый файл)
+
+        Yields:
+            telegram id в порядке следования в файле
+        """
+        for number, line in enumerate(lines):
+            stripped = line.strip()
+            if not stripped or stripped.startswith("#"):
+                continue
+
+            user_id = parse_id(stripped)
+            if user_id is None:
+                # первая строка без числа - скорее всего заголовок CSV
+                if number == 0:
+                    continue
+                self.invalid += 1
+                continue
+
+            yield user_id
+
+
+def open_id_file(path: str) -> IO[str]:
+    """Открыть файл со списком id как текст (gzip распознается сам).
+
+    Args:
+        path: Путь к файлу
+
+    Returns:
+        Текстовый поток, который можно читать построчно
+    """
+    with open(path, "rb") as raw:
+        is_gzip = raw.read(2) == _GZIP_MAGIC
+
+    if is_gzip:
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, encoding="utf-8", errors="replace")
+
+
+async def write_blacklist_csv_gz(
+    chunks: AsyncIterable[Sequence[Sequence[object]]],
+    path: str,
+) -> int:
+    """Записать черный список в gzip CSV по мере поступления пачек.
+
+    Args:
+        chunks: Пачки строк (telegram_id, username, created_at)
+        path: Куда писать
+
+    Returns:
+        Сколько строк записали
+    """
+    total = 0
+    with gzip.open(path, "wt", encoding="utf-8", newline="") as out:
+        writer = csv.writer(out)
+        writer.writerow(["telegram_id", "username", "created_at"])
+        async for chunk in chunks:
+            writer.writerows(
+                (telegram_id, username or "", created_at.isoformat() if created_at else "")
+                for telegram_id, username, created_at in chunk
+            )
+            total += len(chunk)
+    return total
@@ -0,0 +1,109 @@
+"""
+Кэш данных о чатах из Telegram: get_chat и get_chat_administrators.
+
+Название чата и список админов меняются редко, а запрашиваются на
+каждой чистке группы, поэтому ответы живут CHAT_CACHE_TTL секунд.
+Одновременные промахи по одному чату схлопываются в один запрос к API
+(остальные ждут его результат); ошибки не кэшируются. Апдейты
+chat_member / my_chat_member, меняющие права, сбрасывают записи чата
+(см. bot/middleware/membership.py), так что новый админ не ждет TTL.
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.types import ChatMember
+
+import config
+
+# ключ записи: (что запрашивали, ID чата)
+_Key = Tuple[str, int]
+
+
+class ChatCache:
+    """TTL-кэш get_chat / get_chat_administrators по ID чата."""
+
+    def __init__(self, ttl: Optional[float] = None) -> None:
+        """Инициализация кэша.
+
+        Args:
+            ttl: Сколько секунд жить записи (None - CHAT_CACHE_TTL)
+        """
+        self._ttl = ttl
+        # ключ -> (monotonic-время, когда запись протухнет, значение)
+        self._entries: Dict[_Key, Tuple[float, Any]] = {}
+        # ключ -> идущий запрос к API (для схлопывания промахов)
+        self._inflight: Dict[_Key, asyncio.Future] = {}
+        # поколение чата: поднимается при сбросе, чтобы ответ на запрос,
+        # начатый до сброса, не попал в кэш
+        self._generations: Dict[int, int] = {}
+
+    @property
+    def ttl(self) -> float:
+        if self._ttl is None:
+            return config.CHAT_CACHE_TTL
+        return self._ttl
+
+    async def get_chat(self, bot: Bot, chat_id: int):
+        """bot.get_chat(chat_id) через кэш."""
+        return await self._get(("chat", chat_id), lambda: bot.get_chat(chat_id))
+
+    async def get_administrators(self, bot: Bot, chat_id: int) -> List[ChatMember]:
+        """bot.get_chat_administrators(chat_id) через кэш."""
+        return await self._get(
+            ("admins", chat_id), lambda: bot.get_chat_administrators(chat_id)
+        )
+
+    def invalidate(self, chat_id: int, admins_only: bool = False) -> None:
+        """Сбросить записи чата.
+
+        Args:
+            chat_id: ID чата
+            admins_only: Сбросить только список админов
+        """
+        self._generations[chat_id] = self._generations.get(chat_id, 0) + 1
+        kinds = ("admins",) if admins_only else ("admins", "chat")
+        for kind in kinds:
+            self._entries.pop((kind, chat_id), None)
+            # идущий запрос мог начаться до изменения - новые промахи его не ждут
+            self._inflight.pop((kind, chat_id), None)
+
+    def clear(self) -> None:
+        """Сбросить все записи."""
+        for _, chat_id in list(self._entries):
+            self._generations[chat_id] = self._generations.get(chat_id, 0) + 1
+        self._entries.clear()
+
+    async def _get(self, key: _Key, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        cached = self._entries.get(key)
+        if cached is not None:
+            expires_at, value = cached
+            if time.monotonic() < expires_at:
+                return value
+            del self._entries[key]
+
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._fetch(key, fetch))
+            # ошибку забираем сами: ждущих к этому моменту может не остаться
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+            self._inflight[key] = future
+        # shield: отмена одного ожидающего не отменяет запрос для остальных
+        return await asyncio.shield(future)
+
+    async def _fetch(self, key: _Key, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        chat_id = key[1]
+        generation = self._generations.get(chat_id, 0)
+        try:
+            value = await fetch()
+            if self._generations.get(chat_id, 0) == generation:
+                self._entries[key] = (time.monotonic() + self.ttl, value)
+            return value
+        finally:
+            if self._inflight.get(key) is asyncio.current_task():
+                del self._inflight[key]
+
+
+chat_cache = ChatCache()
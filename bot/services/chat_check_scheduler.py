@@ -0,0 +1,148 @@
+"""
+Фоновая проверка чатов по расписанию.
+
+Раз в CHECK_INTERVAL (+ случайная добавка до CHECK_JITTER) секунд
+берет все чаты под модерацией (MODERATED_CHAT_IDS из конфига и таблица
+moderated_chats) и прогоняет по ним проверку по черному списку:
+- сначала те, кого дольше всего не проверяли;
+- одновременно не больше CHECK_MAX_CONCURRENT_CHATS чатов;
+- если прошлая проверка чата еще идет, чат пропускается.
+"""
+
+import asyncio
+import datetime
+import random
+from logging import getLogger
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from aiogram import Bot
+
+import config
+from bot.database.repository import UserRepository, user_repo
+
+logger = getLogger(__name__)
+
+CheckFunc = Callable[[Bot, int], Awaitable[object]]
+
+
+class ChatCheckScheduler:
+    """Периодически проверяет все чаты под модерацией."""
+
+    def __init__(
+        self,
+        bot: Bot,
+        check: CheckFunc,
+        repo: UserRepository = user_repo,
+        interval: Optional[float] = None,
+        jitter: Optional[float] = None,
+        max_concurrent: Optional[int] = None,
+    ) -> None:
+        """Инициализация планировщика.
+
+        Args:
+            bot: Бот, от имени которого проверяем
+            check: Корутина check(bot, chat_id), которая проверяет один чат
+            repo: Репозиторий, откуда берем чаты и время прошлых проверок
+            interval: Пауза между проходами, секунды (None - CHECK_INTERVAL)
+            jitter: Максимальная случайная добавка к паузе, секунды (None - CHECK_JITTER)
+            max_concurrent: Сколько чатов проверяем одновременно
+                (None - CHECK_MAX_CONCURRENT_CHATS)
+        """
+        if interval is None:
+            interval = config.CHECK_INTERVAL
+        if jitter is None:
+            jitter = config.CHECK_JITTER
+        if max_concurrent is None:
+            max_concurrent = config.CHECK_MAX_CONCURRENT_CHATS
+
+        self.bot = bot
+        self.check = check
+        self.repo = repo
+        self.interval = interval
+        self.jitter = jitter
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrent))
+        self._in_flight: Dict[int, asyncio.Task] = {}
+        # когда последний раз запускали проверку чата в этом процессе
+        # (в бд время пишется только после успешной проверки)
+        self._last_started: Dict[int, datetime.datetime] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def _load_chats(self) -> Set[int]:
+        chats = set(config.MODERATED_CHAT_IDS)
+        try:
+            chats.update(await self.repo.get_moderated_chats())
+        except Exception as e:
+            logger.error(f"Error loading moderated chats: {str(e)}")
+        return chats
+
+    async def _prioritize(self, chats: Set[int]) -> List[int]:
+        try:
+            checked_at = await self.repo.get_chat_check_times()
+        except Exception as e:
+            logger.error(f"Error loading chat check times: {str(e)}")
+            checked_at = {}
+
+        def last_seen(chat_id: int) -> datetime.datetime:
+            known = [
+                t for t in (checked_at.get(chat_id), self._last_started.get(chat_id))
+                if t is not None
+            ]
+            # ни разу не проверяли - в самое начало очереди
+            return max(known) if known else datetime.datetime.min
+
+        return sorted(chats, key=last_seen)
+
+    async def _check_chat(self, chat_id: int) -> None:
+        try:
+            async with self._semaphore:
+                self._last_started[chat_id] = datetime.datetime.utcnow()
+                await self.check(self.bot, chat_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Scheduled check of chat {chat_id} failed: {str(e)}", exc_info=True)
+        finally:
+            self._in_flight.pop(chat_id, None)
+
+    async def run_once(self) -> List[int]:
+        """Запустить проверку всех чатов, которые сейчас не проверяются.
+
+        Returns:
+            Список чатов, для которых запустили проверку (в порядке очереди)
+        """
+        chats = await self._prioritize(await self._load_chats())
+
+        started: List[int] = []
+        for chat_id in chats:
+            if chat_id in self._in_flight:
+                logger.info(f"Chat {chat_id} is still being checked, skipping")
+                continue
+            self._in_flight[chat_id] = asyncio.create_task(self._check_chat(chat_id))
+            started.append(chat_id)
+        return started
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Scheduler pass failed: {str(e)}", exc_info=True)
+            await asyncio.sleep(self.interval + random.uniform(0, self.jitter))
+
+    def start(self) -> None:
+        """Запустить фоновый цикл (если интервал не 0)."""
+        if self.interval <= 0 or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Остановить цикл и прервать идущие проверки."""
+        tasks = list(self._in_flight.values())
+        if self._task is not None:
+            tasks.append(self._task)
+            self._task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
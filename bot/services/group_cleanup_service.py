@@ -2,12 +2,12 @@
 Сервис для очистки групп от неразрешенных пользователей.
 
 Реализует основную бизнес-логику бота:
-- Получение списка участников группы
+- Получение списка участников группы (админы из API + индекс из апдейтов)
 - Сравнение с разрешенным списком
 - Удаление неразрешенных пользователей
 """
 
-from typing import List, Set
+from typing import List
 from logging import getLogger
 
 from aiogram import Bot
@@ -18,9 +18,12 @@ from bot.database.repositories import (
     UserRepository,
     GroupRepository,
     AllowedUserRepository,
-    GroupMemberRepository,
-    ActionLogRepository
+    GroupMemberRepository
 )
+from bot.services.audit_sink import audit_sink
+from bot.services.ban_executor import ban_executor
+from bot.services.chat_cache import chat_cache
+from bot.services.membership_tracker import membership_tracker
 
 logger = getLogger(__name__)
 
@@ -61,12 +64,11 @@ class GroupCleanupService:
                 user_repo = UserRepository(session)
                 allowed_repo = AllowedUserRepository(session)
                 member_repo = GroupMemberRepository(session)
-                log_repo = ActionLogRepository(session)
                 
                 # Получаем или создаем группу в БД
                 group = await group_repo.get_by_telegram_id(group_telegram_id)
                 if not group:
-                    chat = await self.bot.get_chat(group_telegram_id)
+                    chat = await chat_cache.get_chat(self.bot, group_telegram_id)
                     group = await group_repo.get_or_create(
                         telegram_id=group_telegram_id,
                         title=chat.title,
@@ -77,28 +79,28 @@ class GroupCleanupService:
                 members = await self._get_group_members(group_telegram_id)
                 
                 # Получаем список разрешенных пользователей из БД
-                allowed_telegram_ids = await allowed_repo.get_allowed_telegram_ids_for_group(
-                    group.id
-                )
-                allowed_set = set(allowed_telegram_ids)
+                # (из кэша, в бд - только при промахе)
+                allowed_set = (await allowed_repo.get_allowed_set(group.id)).telegram_ids
                 
-                # Обновляем информацию об участниках в БД
-                for member in members:
-                    if member.user.is_bot:
-                        continue
-                    
-                    user = await user_repo.get_or_create(
-                        telegram_id=member.user.id,
-                        username=member.user.username,
-                        first_name=member.user.first_name,
-                        last_name=member.user.last_name
-                    )
-                    
-                    await member_repo.add_member(
-                        user_id=user.id,
-                        group_id=group.id,
-                        status=member.status
-                    )
+                # Обновляем информацию об участниках в БД: один upsert
+                # в users (получаем внутренние id) и один в group_members
+                humans = [member for member in members if not member.user.is_bot]
+                user_ids = await user_repo.upsert_many(
+                    {
+                        "telegram_id": member.user.id,
+                        "username": member.user.username,
+                        "first_name": member.user.first_name,
+                        "last_name": member.user.last_name,
+                    }
+                    for member in humans
+                )
+                await member_repo.upsert_many(
+                    group.id,
+                    ((user_ids[member.user.id], member.status) for member in humans)
+                )
+                # фиксируем синхронизацию и отдаем соединение в пул,
+                # чтобы оно не простаивало, пока идут запросы к Telegram
+                await session.commit()
                 
                 # Находим пользователей для удаления
                 members_to_remove = [
@@ -108,45 +110,52 @@ class GroupCleanupService:
                     and member.status not in ["creator", "administrator"]
                 ]
                 
-                # Удаляем неразрешенных пользователей
-                for member in members_to_remove:
-                    try:
-                        await self.bot.ban_chat_member(
-                            chat_id=group_telegram_id,
-                            user_id=member.user.id
-                        )
-                        
-                        result["removed_count"] += 1
-                        result["removed_users"].append({
-                            "telegram_id": member.user.id,
-                            "username": member.user.username,
-                            "first_name": member.user.first_name
-                        })
-                        
-                        # Удаляем из БД
-                        user = await user_repo.get_by_telegram_id(member.user.id)
-                        if user:
-                            await member_repo.remove_member(user.id, group.id)
-                        
-                        # Логируем действие
-                        await log_repo.create_log(
-                            action_type="user_removed",
-                            group_id=group.id,
-                            target_user_id=user.id if user else None,
-                            details=f"User {member.user.id} removed from group {group_telegram_id}"
-                        )
-                        
-                        logger.info(
-                            f"Removed user {member.user.id} from group {group_telegram_id}"
-                        )
-                    
-                    except Exception as e:
-                        error_msg = f"Failed to remove user {member.user.id}: {str(e)}"
+                # Удаляем неразрешенных пользователей (баны идут параллельно,
+                # лимиты API и retry_after учитывает исполнитель)
+                members_by_id = {member.user.id: member for member in members_to_remove}
+                outcomes = await ban_executor.ban_many(
+                    self.bot, group_telegram_id, list(members_by_id)
+                )
+                
+                # Во время банов в бд не ходим: собираем результаты,
+                # а участников удаляем и логируем одной пачкой после
+                removed_user_ids = []
+                for outcome in outcomes:
+                    member = members_by_id[outcome.user_id]
+                    if not outcome.ok:
+                        error_msg = f"Failed to remove user {outcome.user_id}: {outcome.error}"
                         result["errors"].append(error_msg)
                         logger.error(error_msg)
+                        continue
+                    
+                    result["removed_count"] += 1
+                    result["removed_users"].append({
+                        "telegram_id": member.user.id,
+                        "username": member.user.username,
+                        "first_name": member.user.first_name
+                    })
+                    removed_user_ids.append(user_ids[member.user.id])
+                    membership_tracker.forget(group_telegram_id, member.user.id)
+                
+                # Удаляем из БД (один DELETE на пачку)
+                await member_repo.remove_many(group.id, removed_user_ids)
+                
+                # Логируем действия (в фоне, одним INSERT с остальными)
+                for info, user_id in zip(result["removed_users"], removed_user_ids):
+                    await audit_sink.log_action(
+                        action_type="user_removed",
+                        group_id=group.id,
+                        target_user_id=user_id,
+                        details=f"User {info['telegram_id']} removed from group {group_telegram_id}"
+                    )
+                
+                if result["removed_count"]:
+                    logger.info(
+                        f"Removed {result['removed_count']} users from group {group_telegram_id}"
+                    )
                 
                 # Логируем общее действие
-                await log_repo.create_log(
+                await audit_sink.log_action(
                     action_type="group_cleanup",
                     group_id=group.id,
                     details=f"Cleaned group {group_telegram_id}, removed {result['removed_count']} users"
@@ -170,17 +179,23 @@ class GroupCleanupService:
         """
         members = []
         try:
-            # Получаем администраторов группы
-            administrators = await self.bot.get_chat_administrators(group_telegram_id)
+            # Получаем администраторов группы (их статус из API точнее нашего;
+            # список кэшируется и сбрасывается апдейтами chat_member)
+            administrators = await chat_cache.get_administrators(self.bot, group_telegram_id)
             members.extend(administrators)
-            
-            # Для получения всех участников нужно использовать другой метод
-            # В Telegram Bot API нет прямого метода для получения всех участников
-            # Поэтому мы работаем только с администраторами и теми, кого видим
-            
         except Exception as e:
             logger.error(f"Error getting group members: {str(e)}", exc_info=True)
         
+        # В Telegram Bot API нет метода для получения всех участников,
+        # поэтому остальных берем из того, что бот видел в апдейтах
+        try:
+            listed = {member.user.id for member in members}
+            for member in await membership_tracker.members(group_telegram_id):
+                if member.user.id not in listed:
+                    members.append(member)
+        except Exception as e:
+            logger.error(f"Error getting observed group members: {str(e)}", exc_info=True)
+        
         return members
     
     async def add_allowed_user(
@@ -204,12 +219,11 @@ class GroupCleanupService:
                 group_repo = GroupRepository(session)
                 user_repo = UserRepository(session)
                 allowed_repo = AllowedUserRepository(session)
-                log_repo = ActionLogRepository(session)
                 
                 # Получаем или создаем группу
                 group = await group_repo.get_by_telegram_id(group_telegram_id)
                 if not group:
-                    chat = await self.bot.get_chat(group_telegram_id)
+                    chat = await chat_cache.get_chat(self.bot, group_telegram_id)
                     group = await group_repo.get_or_create(
                         telegram_id=group_telegram_id,
                         title=chat.title,
@@ -228,17 +242,16 @@ class GroupCleanupService:
                     group_id=group.id,
                     added_by=added_by.id if added_by else None
                 )
-                
-                # Логируем действие
-                await log_repo.create_log(
-                    action_type="user_allowed",
-                    user_id=added_by.id if added_by else None,
-                    group_id=group.id,
-                    target_user_id=user.id,
-                    details=f"User {user_telegram_id} added to allowed list for group {group_telegram_id}"
-                )
-                
-                return True
+            
+            # Логируем действие (в фоне, уже после коммита)
+            await audit_sink.log_action(
+                action_type="user_allowed",
+                user_id=added_by.id if added_by else None,
+                group_id=group.id,
+                target_user_id=user.id,
+                details=f"User {user_telegram_id} added to allowed list for group {group_telegram_id}"
+            )
+            return True
         
         except Exception as e:
             logger.error(f"Error adding allowed user: {str(e)}", exc_info=True)
@@ -263,7 +276,6 @@ class GroupCleanupService:
                 group_repo = GroupRepository(session)
                 user_repo = UserRepository(session)
                 allowed_repo = AllowedUserRepository(session)
-                log_repo = ActionLogRepository(session)
                 
                 # Получаем группу
                 group = await group_repo.get_by_telegram_id(group_telegram_id)
@@ -277,17 +289,16 @@ class GroupCleanupService:
                 
                 # Удаляем из разрешенных
                 removed = await allowed_repo.remove_allowed_user(user.id, group.id)
-                
-                if removed:
-                    # Логируем действие
-                    await log_repo.create_log(
-                        action_type="user_disallowed",
-                        group_id=group.id,
-                        target_user_id=user.id,
-                        details=f"User {user_telegram_id} removed from allowed list for group {group_telegram_id}"
-                    )
-                
-                return removed
+            
+            if removed:
+                # Логируем действие (в фоне, уже после коммита)
+                await audit_sink.log_action(
+                    action_type="user_disallowed",
+                    group_id=group.id,
+                    target_user_id=user.id,
+                    details=f"User {user_telegram_id} removed from allowed list for group {group_telegram_id}"
+                )
+            return removed
         
         except Exception as e:
             logger.error(f"Error removing allowed user: {str(e)}", exc_info=True)
@@ -0,0 +1,120 @@
+"""
+Отложенная запись GroupMember.last_seen.
+
+Каждое сообщение в группе сдвигает last_seen автора. Писать это в бд
+на каждое сообщение - лишний UPDATE на апдейт, поэтому отметки копятся
+в памяти (для пары пользователь+чат хранится только последняя) и
+уходят в бд раз в LAST_SEEN_FLUSH_INTERVAL секунд одним bulk UPDATE
+(GroupMemberRepository.update_last_seen_many) и при остановке бота.
+Сколько бы сообщений ни пришло, за интервал в бд уходит не больше
+одной строки на активного участника.
+"""
+
+import asyncio
+from datetime import datetime
+from logging import getLogger
+from typing import Dict, Optional, Tuple
+
+import config
+from bot.database.connection import SessionFactory
+from bot.database.repositories import GroupMemberRepository
+
+logger = getLogger(__name__)
+
+
+class LastSeenBuffer:
+    """Копит отметки last_seen и пишет их в бд пачкой."""
+
+    def __init__(
+        self,
+        session_factory=SessionFactory,
+        interval: Optional[float] = None,
+    ) -> None:
+        """Инициализация буфера.
+
+        Args:
+            session_factory: Фабрика сессий БД
+            interval: Раз в сколько секунд писать в бд, 0 - только при
+                остановке (None - LAST_SEEN_FLUSH_INTERVAL)
+        """
+        self._session_factory = session_factory
+        self._interval = interval
+        # (telegram_id пользователя, telegram_id чата) -> когда видели
+        self._dirty: Dict[Tuple[int, int], datetime] = {}
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def interval(self) -> float:
+        if self._interval is None:
+            return config.LAST_SEEN_FLUSH_INTERVAL
+        return self._interval
+
+    @property
+    def pending(self) -> int:
+        """Сколько отметок ждет записи."""
+        return len(self._dirty)
+
+    def touch(self, chat_id: int, user_id: int, when: Optional[datetime] = None) -> None:
+        """Отметить, что пользователь был активен в чате.
+
+        Args:
+            chat_id: Telegram ID чата
+            user_id: Telegram ID пользователя
+            when: Время (по умолчанию - сейчас, UTC)
+        """
+        when = when or datetime.utcnow()
+        key = (user_id, chat_id)
+        known = self._dirty.get(key)
+        if known is None or when > known:
+            self._dirty[key] = when
+
+    async def flush(self) -> int:
+        """Записать накопленные отметки в бд.
+
+        Returns:
+            Сколько отметок отправлено
+        """
+        async with self._flush_lock:
+            dirty, self._dirty = self._dirty, {}
+            if not dirty:
+                return 0
+            try:
+                async with self._session_factory() as session:
+                    written = await GroupMemberRepository(session).update_last_seen_many(dirty)
+                    await session.commit()
+                return written
+            except Exception:
+                # вернем отметки обратно, более свежие не затираем
+                for key, when in dirty.items():
+                    known = self._dirty.get(key)
+                    if known is None or when > known:
+                        self._dirty[key] = when
+                raise
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Failed to write last_seen: {str(e)}", exc_info=True)
+
+    def start(self) -> None:
+        """Запустить периодическую запись (если интервал не 0)."""
+        if self.interval <= 0 or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Остановить запись и сбросить то, что накопилось."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+
+last_seen_buffer = LastSeenBuffer()
@@ -0,0 +1,304 @@
+"""
+Хранение и архивирование moderation_logs по месяцам.
+
+На Postgres moderation_logs разбита на помесячные партиции
+(см. миграцию 007), на остальных бд это обычная таблица.
+
+- ensure_partitions() заранее создает партиции на текущий и следующий месяц;
+- run_retention() все месяцы старше LOG_RETENTION_MONTHS выгружает в
+  сжатые файлы (jsonl.gz) в LOG_ARCHIVE_DIR, записывает их в manifest.json
+  и убирает из бд: партицию отцепляет и удаляет, без партиций - DELETE;
+- iter_archived() читает архив месяца обратно, когда он понадобился.
+
+Сжатие, json и запись файлов идут в отдельном потоке (asyncio.to_thread),
+чтобы не держать цикл событий. Запись manifest - по месяцу и диапазону
+id: повторный архив того же месяца (например, после падения между
+записью manifest и удалением строк) не дает второй записи.
+"""
+
+import asyncio
+import datetime
+import gzip
+import hashlib
+import json
+import os
+from logging import getLogger
+from typing import IO, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import delete, func, select, text
+
+import config
+from bot.database.connection import SessionFactory
+from bot.database.dialect import dialect_name
+from bot.database.models import ModerationLog
+
+logger = getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+
+Month = Tuple[int, int]
+
+
+def month_bounds(month: Month) -> Tuple[datetime.datetime, datetime.datetime]:
+    """Начало месяца и начало следующего месяца."""
+    year, number = month
+    start = datetime.datetime(year, number, 1)
+    end = datetime.datetime(year + number // 12, number % 12 + 1, 1)
+    return start, end
+
+
+def shift_month(month: Month, delta: int) -> Month:
+    """Сдвинуть месяц на delta (можно отрицательное)."""
+    index = month[0] * 12 + month[1] - 1 + delta
+    return index // 12, index % 12 + 1
+
+
+def partition_name(month: Month) -> str:
+    return f"moderation_logs_y{month[0]:04d}m{month[1]:02d}"
+
+
+def _entry_key(entry: Dict) -> Tuple[str, int, int]:
+    return entry["month"], entry["first_id"], entry["last_id"]
+
+
+def _write_lines(out: IO[str], digest, rows: List[Dict]) -> None:
+    """Дописать строки в jsonl.gz и в контрольную сумму (в отдельном потоке)."""
+    chunk = "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+    out.write(chunk)
+    digest.update(chunk.encode("utf-8"))
+
+
+class LogArchive:
+    """Помесячная ротация moderation_logs в сжатые файлы."""
+
+    def __init__(
+        self,
+        session_factory=SessionFactory,
+        archive_dir: Optional[str] = None,
+        retention_months: Optional[int] = None,
+    ) -> None:
+        """Инициализация архива.
+
+        Args:
+            session_factory: Фабрика сессий БД
+            archive_dir: Папка для файлов архива и manifest.json
+                (None - LOG_ARCHIVE_DIR из конфига)
+            retention_months: Сколько последних месяцев держим в бд, 0 - все
+                (None - LOG_RETENTION_MONTHS из конфига)
+        """
+        self._session_factory = session_factory
+        self._archive_dir = archive_dir
+        self._retention_months = retention_months
+
+    @property
+    def archive_dir(self) -> str:
+        return config.LOG_ARCHIVE_DIR if self._archive_dir is None else self._archive_dir
+
+    @property
+    def retention_months(self) -> int:
+        if self._retention_months is None:
+            return config.LOG_RETENTION_MONTHS
+        return self._retention_months
+
+    # manifest
+
+    @property
+    def _manifest_path(self) -> str:
+        return os.path.join(self.archive_dir, MANIFEST_NAME)
+
+    def load_manifest(self) -> List[Dict]:
+        """Прочитать список архивных файлов."""
+        if not os.path.exists(self._manifest_path):
+            return []
+        with open(self._manifest_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_manifest(self, entries: List[Dict]) -> None:
+        # пишем рядом и подменяем, чтобы не оставить битый manifest
+        tmp_path = self._manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._manifest_path)
+
+    def _add_to_manifest(self, entry: Dict) -> None:
+        # тот же месяц и диапазон id уже в manifest (прошлая попытка не
+        # дошла до удаления строк) - заменяем запись, а не дописываем вторую
+        entries = [e for e in self.load_manifest() if _entry_key(e) != _entry_key(entry)]
+        self._save_manifest(entries + [entry])
+
+    # партиции
+
+    async def ensure_partitions(self, months_ahead: int = 1) -> None:
+        """Создать партиции на текущий месяц и months_ahead вперед (только Postgres)."""
+        async with self._session_factory() as session:
+            if dialect_name(session) != "postgresql":
+                return
+
+            today = datetime.datetime.utcnow()
+            current = (today.year, today.month)
+            for delta in range(months_ahead + 1):
+                month = shift_month(current, delta)
+                start, end = month_bounds(month)
+                await session.execute(
+                    text(
+                        f"CREATE TABLE IF NOT EXISTS {partition_name(month)} "
+                        f"PARTITION OF moderation_logs "
+                        f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+                    )
+                )
+            await session.commit()
+
+    async def _partition_exists(self, session, month: Month) -> bool:
+        return bool(
+            await session.scalar(
+                text("SELECT to_regclass(:name) IS NOT NULL"),
+                {"name": partition_name(month)},
+            )
+        )
+
+    # архивирование
+
+    async def archive_month(self, month: Month) -> Optional[Dict]:
+        """Выгрузить месяц в файл и убрать его строки из бд.
+
+        Args:
+            month: (год, месяц)
+
+        Returns:
+            Запись manifest или None, если за месяц в бд ничего нет
+        """
+        await asyncio.to_thread(os.makedirs, self.archive_dir, exist_ok=True)
+        start, end = month_bounds(month)
+        in_month = (ModerationLog.created_at >= start, ModerationLog.created_at < end)
+
+        async with self._session_factory() as session:
+            first_id, last_id, rows_count = (
+                await session.execute(
+                    select(
+                        func.min(ModerationLog.id),
+                        func.max(ModerationLog.id),
+                        func.count(ModerationLog.id),
+                    ).where(*in_month)
+                )
+            ).one()
+            if not rows_count:
+                return None
+
+            filename = f"moderation_logs_{month[0]:04d}_{month[1]:02d}_{first_id}-{last_id}.jsonl.gz"
+            path = os.path.join(self.archive_dir, filename)
+            digest = hashlib.sha256()
+
+            result = await session.stream_scalars(
+                select(ModerationLog)
+                .where(*in_month, ModerationLog.id <= last_id)
+                .order_by(ModerationLog.id)
+                .execution_options(yield_per=5000)
+            )
+            out = await asyncio.to_thread(gzip.open, path, "wt", encoding="utf-8")
+            try:
+                async for logs in result.partitions():
+                    rows = [
+                        {
+                            "id": log.id,
+                            "action": log.action,
+                            "telegram_id": log.telegram_id,
+                            "chat_id": log.chat_id,
+                            "details": log.details,
+                            "created_at": log.created_at.isoformat(),
+                        }
+                        for log in logs
+                    ]
+                    await asyncio.to_thread(_write_lines, out, digest, rows)
+            finally:
+                await asyncio.to_thread(out.close)
+
+            entry = {
+                "month": f"{month[0]:04d}-{month[1]:02d}",
+                "file": filename,
+                "rows": int(rows_count),
+                "first_id": int(first_id),
+                "last_id": int(last_id),
+                "sha256": digest.hexdigest(),
+                "archived_at": datetime.datetime.utcnow().isoformat(),
+            }
+            # сначала manifest, потом удаление: если упадем между ними,
+            # строки останутся и в бд, и в архиве, но не потеряются, а
+            # повторный архив заменит эту же запись manifest
+            await asyncio.to_thread(self._add_to_manifest, entry)
+
+            if dialect_name(session) == "postgresql" and await self._partition_exists(session, month):
+                name = partition_name(month)
+                await session.execute(text(f"ALTER TABLE moderation_logs DETACH PARTITION {name}"))
+                await session.execute(text(f"DROP TABLE {name}"))
+            else:
+                await session.execute(
+                    delete(ModerationLog).where(*in_month, ModerationLog.id <= last_id)
+                )
+            await session.commit()
+
+        logger.info(f"Archived {rows_count} moderation logs for {entry['month']} to {path}")
+        return entry
+
+    async def run_retention(self, now: Optional[datetime.datetime] = None) -> List[Dict]:
+        """Заархивировать все месяцы старше retention_months.
+
+        Args:
+            now: Текущее время (для тестов)
+
+        Returns:
+            Новые записи manifest
+        """
+        if self.retention_months <= 0:
+            return []
+
+        now = now or datetime.datetime.utcnow()
+        cutoff = shift_month((now.year, now.month), -self.retention_months)
+
+        async with self._session_factory() as session:
+            oldest = await session.scalar(select(func.min(ModerationLog.created_at)))
+        if oldest is None:
+            return []
+
+        entries: List[Dict] = []
+        month = (oldest.year, oldest.month)
+        while month < cutoff:
+            entry = await self.archive_month(month)
+            if entry is not None:
+                entries.append(entry)
+            month = shift_month(month, 1)
+        return entries
+
+    def iter_archived(
+        self,
+        month: Month,
+        telegram_id: Optional[int] = None,
+        chat_id: Optional[int] = None,
+    ) -> Iterator[Dict]:
+        """Прочитать заархивированные строки месяца.
+
+        Args:
+            month: (год, месяц)
+            telegram_id: Только по этому пользователю
+            chat_id: Только по этому чату
+
+        Yields:
+            Строки лога в виде словарей, по возрастанию id
+        """
+        key = f"{month[0]:04d}-{month[1]:02d}"
+        for entry in self.load_manifest():
+            if entry["month"] != key:
+                continue
+            path = os.path.join(self.archive_dir, entry["file"])
+            with gzip.open(path, "rt", encoding="utf-8") as lines:
+                for line in lines:
+                    row = json.loads(line)
+                    if telegram_id is not None and row["telegram_id"] != telegram_id:
+                        continue
+                    if chat_id is not None and row["chat_id"] != chat_id:
+                        continue
+                    yield row
+
+
+log_archive = LogArchive()
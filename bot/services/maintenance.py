@@ -0,0 +1,76 @@
+"""
+Фоновое обслуживание moderation_logs.
+
+Раз в LOG_MAINTENANCE_INTERVAL секунд:
+- создает партиции лога на текущий и следующий месяц (Postgres);
+- досчитывает итоги по часам (moderation_rollups) - до архивирования,
+  чтобы статистика за старые месяцы осталась после удаления строк;
+- архивирует и убирает из бд месяцы старше LOG_RETENTION_MONTHS.
+"""
+
+import asyncio
+from logging import getLogger
+from typing import Optional
+
+import config
+from bot.database.repository import UserRepository, user_repo
+from bot.services.log_archive import LogArchive, log_archive
+
+logger = getLogger(__name__)
+
+
+class MaintenanceLoop:
+    """Периодически обслуживает таблицу лога модерации."""
+
+    def __init__(
+        self,
+        repo: UserRepository = user_repo,
+        archive: LogArchive = log_archive,
+        interval: Optional[float] = None,
+    ) -> None:
+        """Инициализация цикла.
+
+        Args:
+            repo: Репозиторий, который досчитывает итоги по часам
+            archive: Архив лога
+            interval: Пауза между проходами, секунды, 0 - выключено
+                (None - LOG_MAINTENANCE_INTERVAL)
+        """
+        self.repo = repo
+        self.archive = archive
+        self.interval = config.LOG_MAINTENANCE_INTERVAL if interval is None else interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def run_once(self) -> None:
+        """Один проход обслуживания; ошибка одного шага не мешает остальным."""
+        steps = (
+            ("ensure partitions", self.archive.ensure_partitions),
+            ("compact rollups", self.repo.compact_rollups),
+            ("log retention", self.archive.run_retention),
+        )
+        for name, step in steps:
+            try:
+                await step()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Maintenance step '{name}' failed: {str(e)}", exc_info=True)
+
+    async def _run(self) -> None:
+        while True:
+            await self.run_once()
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """Запустить фоновый цикл (если интервал не 0)."""
+        if self.interval <= 0 or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Остановить цикл."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
@@ -0,0 +1,256 @@
+"""
+Кто состоит в группах - по тому, что бот видел сам.
+
+Bot API не умеет отдавать список участников группы, поэтому собираем
+его из апдейтов (см. bot/middleware/membership.py):
+- автор любого сообщения в группе - участник;
+- new_chat_members / left_chat_member в сервисных сообщениях;
+- chat_member - смена статуса участника (нужны права админа и
+  "chat_member" в allowed_updates);
+- my_chat_member - кто добавил/убрал бота; если бота убрали, индекс чата
+  забываем (незаписанные изменения все равно уходят в бд).
+
+Все держится в памяти по чатам, в group_members сбрасывается раз в
+MEMBERSHIP_FLUSH_INTERVAL секунд (и при остановке) парой bulk-upsert'ов.
+GroupCleanupService берет отсюда участников для чистки; при первом
+обращении к чату в память подгружается то, что уже лежит в бд.
+"""
+
+import asyncio
+from dataclasses import dataclass
+from logging import getLogger
+from typing import Dict, List, Optional, Set
+
+from aiogram import types
+
+import config
+from bot.database.connection import SessionFactory
+from bot.database.repositories import GroupMemberRepository, GroupRepository, UserRepository
+
+logger = getLogger(__name__)
+
+# статусы, после которых человек в группе уже не состоит
+GONE_STATUSES = ("left", "kicked")
+
+
+@dataclass
+class ObservedMember:
+    """Участник группы в том же виде, что и ChatMember (user + status)."""
+
+    user: types.User
+    status: str = "member"
+
+
+class MembershipTracker:
+    """Индекс участников групп, собранный из апдейтов."""
+
+    def __init__(
+        self,
+        session_factory=SessionFactory,
+        interval: Optional[float] = None,
+    ) -> None:
+        """Инициализация индекса.
+
+        Args:
+            session_factory: Фабрика сессий БД
+            interval: Раз в сколько секунд сбрасывать изменения в бд,
+                0 - только при остановке (None - MEMBERSHIP_FLUSH_INTERVAL)
+        """
+        self._session_factory = session_factory
+        self._interval = interval
+        # chat_id -> telegram_id -> участник
+        self._members: Dict[int, Dict[int, ObservedMember]] = {}
+        # что еще не записано в бд: новые/обновленные и ушедшие
+        self._dirty: Dict[int, Dict[int, ObservedMember]] = {}
+        self._gone: Dict[int, Set[int]] = {}
+        self._titles: Dict[int, Optional[str]] = {}
+        # чаты, для которых уже подмешали участников из бд
+        self._loaded: Set[int] = set()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def interval(self) -> float:
+        if self._interval is None:
+            return config.MEMBERSHIP_FLUSH_INTERVAL
+        return self._interval
+
+    # наблюдения (синхронные - вызываются из middleware на каждый апдейт)
+
+    def observe(
+        self,
+        chat_id: int,
+        user: types.User,
+        status: Optional[str] = None,
+        title: Optional[str] = None,
+    ) -> None:
+        """Запомнить, что user состоит в чате.
+
+        Args:
+            chat_id: ID чата
+            user: Пользователь
+            status: Статус из chat_member; None (просто написал сообщение) -
+                оставить известный статус или считать "member"
+            title: Название чата, если известно
+        """
+        if user.is_bot:
+            return
+        if status in GONE_STATUSES:
+            self.forget(chat_id, user.id)
+            return
+
+        if title is not None:
+            self._titles[chat_id] = title
+
+        chat = self._members.setdefault(chat_id, {})
+        known = chat.get(user.id)
+        if status is None:
+            status = known.status if known is not None else "member"
+        if known is not None and known.status == status and known.user == user:
+            return
+
+        member = ObservedMember(user=user, status=status)
+        chat[user.id] = member
+        self._dirty.setdefault(chat_id, {})[user.id] = member
+        gone = self._gone.get(chat_id)
+        if gone:
+            gone.discard(user.id)
+
+    def forget(self, chat_id: int, user_id: int) -> None:
+        """Запомнить, что пользователь из чата ушел (или его убрали)."""
+        self._members.get(chat_id, {}).pop(user_id, None)
+        self._dirty.get(chat_id, {}).pop(user_id, None)
+        self._gone.setdefault(chat_id, set()).add(user_id)
+
+    def drop_chat(self, chat_id: int) -> None:
+        """Перестать следить за чатом (бота из него убрали).
+
+        Из памяти уходит только индекс участников; то, что еще не записано
+        в бд (_dirty/_gone), остается и уйдет при ближайшем flush.
+        """
+        self._members.pop(chat_id, None)
+        self._loaded.discard(chat_id)
+
+    # чтение
+
+    async def members(self, chat_id: int) -> List[ObservedMember]:
+        """Все известные участники чата (из апдейтов и из бд)."""
+        if chat_id not in self._loaded:
+            await self._load_chat(chat_id)
+        return list(self._members.get(chat_id, {}).values())
+
+    async def _load_chat(self, chat_id: int) -> None:
+        async with self._session_factory() as session:
+            group = await GroupRepository(session).get_by_telegram_id(chat_id)
+            rows = []
+            if group is not None:
+                rows = await GroupMemberRepository(session).get_member_profiles_for_group(group.id)
+
+        chat = self._members.setdefault(chat_id, {})
+        gone = self._gone.get(chat_id, set())
+        for telegram_id, username, first_name, last_name, status in rows:
+            # то, что видели в апдейтах, свежее того, что в бд
+            if telegram_id in chat or telegram_id in gone:
+                continue
+            user = types.User(
+                id=telegram_id,
+                is_bot=False,
+                first_name=first_name or "",
+                last_name=last_name,
+                username=username,
+            )
+            chat[telegram_id] = ObservedMember(user=user, status=status)
+        self._loaded.add(chat_id)
+
+    # запись в бд
+
+    async def flush(self) -> int:
+        """Записать накопленные изменения в groups/users/group_members.
+
+        Returns:
+            Сколько участников записано или удалено
+        """
+        async with self._flush_lock:
+            dirty, self._dirty = self._dirty, {}
+            gone, self._gone = self._gone, {}
+            if not dirty and not gone:
+                return 0
+
+            try:
+                return await self._write(dirty, gone)
+            except Exception:
+                # не потеряем изменения: вернем их, если их не перебили новые
+                for chat_id, members in dirty.items():
+                    pending = self._dirty.setdefault(chat_id, {})
+                    for user_id, member in members.items():
+                        pending.setdefault(user_id, member)
+                for chat_id, user_ids in gone.items():
+                    self._gone.setdefault(chat_id, set()).update(user_ids)
+                raise
+
+    async def _write(
+        self,
+        dirty: Dict[int, Dict[int, ObservedMember]],
+        gone: Dict[int, Set[int]],
+    ) -> int:
+        written = 0
+        async with self._session_factory() as session:
+            group_repo = GroupRepository(session)
+            user_repo = UserRepository(session)
+            member_repo = GroupMemberRepository(session)
+
+            for chat_id in set(dirty) | set(gone):
+                group = await group_repo.get_or_create(
+                    telegram_id=chat_id, title=self._titles.get(chat_id)
+                )
+
+                seen = list(dirty.get(chat_id, {}).values())
+                if seen:
+                    ids = await user_repo.upsert_many(
+                        {
+                            "telegram_id": m.user.id,
+                            "username": m.user.username,
+                            "first_name": m.user.first_name,
+                            "last_name": m.user.last_name,
+                        }
+                        for m in seen
+                    )
+                    written += await member_repo.upsert_many(
+                        group.id, ((ids[m.user.id], m.status) for m in seen)
+                    )
+
+                if gone.get(chat_id):
+                    ids = await user_repo.get_ids_by_telegram_ids(gone[chat_id])
+                    written += await member_repo.remove_many(group.id, ids.values())
+
+            await session.commit()
+        return written
+
+    # фоновый сброс
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Failed to persist observed members: {str(e)}", exc_info=True)
+
+    def start(self) -> None:
+        """Запустить периодический сброс в бд (если интервал не 0)."""
+        if self.interval <= 0 or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Остановить сброс и записать то, что накопилось."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+
+membership_tracker = MembershipTracker()
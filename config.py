@@ -3,13 +3,12 @@ from __future__ import annotations
 
 import logging
 import os
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 logger = logging.getLogger("config")
-logging.basicConfig(level=logging.INFO)
 
 
 class Settings(BaseSettings):
@@ -23,10 +22,86 @@ class Settings(BaseSettings):
     db_host: str = Field("db", env="POSTGRES_HOST")
     db_port: int = Field(5432, env="POSTGRES_PORT")
 
+    # пул соединений (один engine на процесс): постоянных соединений,
+    # сколько можно открыть сверх них, сколько секунд ждать свободное,
+    # через сколько секунд пересоздавать соединение и проверять ли его
+    # перед выдачей (SELECT 1, ловит оборванные бд соединения)
+    db_pool_size: int = Field(10, env="DB_POOL_SIZE")
+    db_max_overflow: int = Field(10, env="DB_MAX_OVERFLOW")
+    db_pool_timeout: float = Field(30.0, env="DB_POOL_TIMEOUT")
+    db_pool_recycle: int = Field(1800, env="DB_POOL_RECYCLE")
+    db_pool_pre_ping: bool = Field(True, env="DB_POOL_PRE_PING")
+    # asyncpg: сколько подготовленных выражений держим на соединение
+    # (горячие запросы не парсятся сервером заново), 0 - не кэшировать
+    db_statement_cache_size: int = Field(500, env="DB_STATEMENT_CACHE_SIZE")
+
     # «сырые» значения списков из окружения
     admin_ids_raw: Optional[str] = Field(default=None, env="ADMIN_IDS")
     moderated_chat_ids_raw: Optional[str] = Field(default=None, env="MODERATED_CHAT_IDS")
 
+    # баны через Bot API: сколько запросов держим в полете и с какой
+    # скоростью (запросов в секунду) шлем всего и в один чат.
+    # Точных лимитов на banChatMember телеграм не публикует, поэтому
+    # берем ~30 rps на бота из FAQ; если все-таки упремся - придет
+    # retry_after, и исполнитель подождет сам
+    ban_concurrency: int = Field(10, env="BAN_CONCURRENCY")
+    ban_global_rate: float = Field(30.0, env="BAN_GLOBAL_RATE")
+    ban_chat_rate: float = Field(20.0, env="BAN_CHAT_RATE")
+    ban_max_retries: int = Field(5, env="BAN_MAX_RETRIES")
+
+    # фоновая проверка чатов: раз в сколько секунд (0 - выключена),
+    # случайная добавка к паузе и сколько чатов проверяем одновременно
+    check_interval: int = Field(3600, env="CHECK_INTERVAL")
+    check_jitter: int = Field(300, env="CHECK_JITTER")
+    check_max_concurrent_chats: int = Field(5, env="CHECK_MAX_CONCURRENT_CHATS")
+
+    # сколько секунд /stats отдает закэшированные цифры
+    stats_cache_ttl: float = Field(30.0, env="STATS_CACHE_TTL")
+
+    # moderation_logs: сколько последних месяцев держим в бд (0 - все),
+    # куда складываем архив старых месяцев и как часто запускаем
+    # обслуживание (партиции, итоги по часам, архивирование), секунды
+    log_retention_months: int = Field(6, env="LOG_RETENTION_MONTHS")
+    log_archive_dir: str = Field("archive/moderation_logs", env="LOG_ARCHIVE_DIR")
+    log_maintenance_interval: int = Field(86400, env="LOG_MAINTENANCE_INTERVAL")
+
+    # журнал аудита пишется в фоне пачками: размер очереди (при заполнении
+    # писатели ждут), максимум строк в одном INSERT и сколько секунд
+    # пачка может ждать добора
+    audit_queue_size: int = Field(10000, env="AUDIT_QUEUE_SIZE")
+    audit_batch_size: int = Field(500, env="AUDIT_BATCH_SIZE")
+    audit_flush_interval: float = Field(1.0, env="AUDIT_FLUSH_INTERVAL")
+
+    # участники групп, замеченные в апдейтах, копятся в памяти и пишутся
+    # в group_members раз в столько секунд (0 - только при остановке)
+    membership_flush_interval: float = Field(60.0, env="MEMBERSHIP_FLUSH_INTERVAL")
+    # last_seen участников копится в памяти и пишется одним UPDATE раз в столько секунд
+    last_seen_flush_interval: float = Field(30.0, env="LAST_SEEN_FLUSH_INTERVAL")
+
+    # сколько групп держать в кэше списков разрешенных (LRU)
+    allowlist_cache_groups: int = Field(1000, env="ALLOWLIST_CACHE_GROUPS")
+
+    # сколько секунд помнить ответы get_chat / get_chat_administrators
+    chat_cache_ttl: float = Field(600.0, env="CHAT_CACHE_TTL")
+
+    # права на команды: сколько секунд помнить админов (из бд и по чатам)
+    # и для скольких чатов держать списки админов
+    role_cache_ttl: float = Field(600.0, env="ROLE_CACHE_TTL")
+    role_cache_chats: int = Field(1000, env="ROLE_CACHE_CHATS")
+
+    # антифлуд: не больше THROTTLE_RATE сообщений/нажатий за THROTTLE_PERIOD
+    # секунд от пользователя, плюс свои лимиты на тяжелые команды в виде
+    # "команда:сколько/секунд" через запятую; состояние держим не больше
+    # чем для THROTTLE_MAX_KEYS ключей
+    throttle_rate: int = Field(3, env="THROTTLE_RATE")
+    throttle_period: float = Field(5.0, env="THROTTLE_PERIOD")
+    throttle_command_limits_raw: str = Field(
+        "stats:2/30,logs:5/30,archivelogs:2/60,force_check:1/60,"
+        "importblacklist:1/60,exportblacklist:1/60",
+        env="THROTTLE_COMMAND_LIMITS",
+    )
+    throttle_max_keys: int = Field(100000, env="THROTTLE_MAX_KEYS")
+
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
@@ -41,7 +116,11 @@ class Settings(BaseSettings):
         )
 
 
-settings = Settings()
+# Настройки читаются не при импорте, а при первом обращении к config.X
+# (или явно через load()) - так импорт модулей бота ничего не парсит и не
+# логирует, а ошибки окружения всплывают в фазе старта в main.py.
+_settings: Optional[Settings] = None
+_exports: Optional[Dict[str, Any]] = None
 
 
 def _parse_int_list(raw: Optional[str]) -> List[int]:
@@ -63,25 +142,153 @@ def _parse_int_list(raw: Optional[str]) -> List[int]:
     return result
 
 
+def _parse_limits(raw: Optional[str]) -> Dict[str, Tuple[int, float]]:
+    """
+    Превращаем "stats:2/30, logs:5/30" в {"stats": (2, 30.0), "logs": (5, 30.0)}.
+    Битые куски пропускаем с предупреждением.
+    """
+    limits: Dict[str, Tuple[int, float]] = {}
+    for chunk in (raw or "").replace(" ", "").split(","):
+        if not chunk:
+            continue
+        try:
+            command, limit = chunk.split(":", 1)
+            count, period = limit.split("/", 1)
+            limits[command.lstrip("/").lower()] = (int(count), float(period))
+        except ValueError:
+            logger.warning("[config] не удалось разобрать лимит '%s'", chunk)
+    return limits
+
+
+def _build_exports(settings: Settings) -> Dict[str, Any]:
+    return {
+        "settings": settings,
+        "BOT_TOKEN": settings.bot_token,
+        "DATABASE_URL": settings.database_url,
+        "DB_POOL_SIZE": settings.db_pool_size,
+        "DB_MAX_OVERFLOW": settings.db_max_overflow,
+        "DB_POOL_TIMEOUT": settings.db_pool_timeout,
+        "DB_POOL_RECYCLE": settings.db_pool_recycle,
+        "DB_POOL_PRE_PING": settings.db_pool_pre_ping,
+        "DB_STATEMENT_CACHE_SIZE": settings.db_statement_cache_size,
+        # Сначала берем из pydantic (он уже прочитал .env), если вдруг пусто – напрямую из os.environ
+        "ADMIN_IDS": _parse_int_list(settings.admin_ids_raw or os.getenv("ADMIN_IDS")),
+        "MODERATED_CHAT_IDS": _parse_int_list(
+            settings.moderated_chat_ids_raw or os.getenv("MODERATED_CHAT_IDS")
+        ),
+        "BAN_CONCURRENCY": settings.ban_concurrency,
+        "BAN_GLOBAL_RATE": settings.ban_global_rate,
+        "BAN_CHAT_RATE": settings.ban_chat_rate,
+        "BAN_MAX_RETRIES": settings.ban_max_retries,
+        "CHECK_INTERVAL": settings.check_interval,
+        "CHECK_JITTER": settings.check_jitter,
+        "CHECK_MAX_CONCURRENT_CHATS": settings.check_max_concurrent_chats,
+        "STATS_CACHE_TTL": settings.stats_cache_ttl,
+        "LOG_RETENTION_MONTHS": settings.log_retention_months,
+        "LOG_ARCHIVE_DIR": settings.log_archive_dir,
+        "LOG_MAINTENANCE_INTERVAL": settings.log_maintenance_interval,
+        "AUDIT_QUEUE_SIZE": settings.audit_queue_size,
+        "AUDIT_BATCH_SIZE": settings.audit_batch_size,
+        "AUDIT_FLUSH_INTERVAL": settings.audit_flush_interval,
+        "MEMBERSHIP_FLUSH_INTERVAL": settings.membership_flush_interval,
+        "LAST_SEEN_FLUSH_INTERVAL": settings.last_seen_flush_interval,
+        "ALLOWLIST_CACHE_GROUPS": settings.allowlist_cache_groups,
+        "CHAT_CACHE_TTL": settings.chat_cache_ttl,
+        "ROLE_CACHE_TTL": settings.role_cache_ttl,
+        "ROLE_CACHE_CHATS": settings.role_cache_chats,
+        "THROTTLE_RATE": settings.throttle_rate,
+        "THROTTLE_PERIOD": settings.throttle_period,
+        "THROTTLE_COMMAND_LIMITS": _parse_limits(settings.throttle_command_limits_raw),
+        "THROTTLE_MAX_KEYS": settings.throttle_max_keys,
+    }
+
+
+def _log_summary(values: Dict[str, Any]) -> None:
+    if not values["ADMIN_IDS"]:
+        logger.info("[config] предупреждение: ADMIN_IDS пустой, команды админов будут недоступны")
+    else:
+        logger.info("[config] ADMIN_IDS = %s", values["ADMIN_IDS"])
+
+    if values["CHECK_INTERVAL"] <= 0:
+        logger.info("[config] инфо: CHECK_INTERVAL = 0, периодическая проверка чатов выключена")
+    elif not values["MODERATED_CHAT_IDS"]:
+        logger.info(
+            "[config] инфо: MODERATED_CHAT_IDS пустой, по расписанию проверяем только чаты из moderated_chats"
+        )
+    else:
+        logger.info("[config] MODERATED_CHAT_IDS = %s", values["MODERATED_CHAT_IDS"])
+
+
+def load() -> Settings:
+    """
+    Прочитать настройки (один раз за процесс) и вернуть их.
+    Повторные вызовы ничего не делают
+    """
+    global _settings, _exports
+    if _exports is None:
+        _settings = Settings()
+        _exports = _build_exports(_settings)
+        _log_summary(_exports)
+    return _settings
+
+
+def __getattr__(name: str) -> Any:
+    # вызывается только для имен, которых нет в модуле (PEP 562);
+    # значения, подмененные через setattr (monkeypatch в тестах), сюда не попадают
+    if name.startswith("__"):
+        raise AttributeError(name)
+    load()
+    try:
+        return _exports[name]
+    except KeyError:
+        raise AttributeError(f"module 'config' has no attribute '{name}'") from None
+
+
 # ==== экспортируемые значения, которые используют хендлеры/БД ====
+# (только аннотации: сами значения отдает __getattr__ после load())
 
-BOT_TOKEN: str = settings.bot_token
-DATABASE_URL: str = settings.database_url
+settings: Settings
+BOT_TOKEN: str
+DATABASE_URL: str
+DB_POOL_SIZE: int
+DB_MAX_OVERFLOW: int
+DB_POOL_TIMEOUT: float
+DB_POOL_RECYCLE: int
+DB_POOL_PRE_PING: bool
+DB_STATEMENT_CACHE_SIZE: int
 
-# Сначала берем из pydantic (он уже прочитал .env), если вдруг пусто – напрямую из os.environ
-ADMIN_IDS: List[int] = _parse_int_list(settings.admin_ids_raw or os.getenv("ADMIN_IDS"))
-MODERATED_CHAT_IDS: List[int] = _parse_int_list(
-    settings.moderated_chat_ids_raw or os.getenv("MODERATED_CHAT_IDS")
-)
+ADMIN_IDS: List[int]
+MODERATED_CHAT_IDS: List[int]
 
-if not ADMIN_IDS:
-    logger.info("[config] предупреждение: ADMIN_IDS пустой, команды админов будут недоступны")
-else:
-    logger.info("[config] ADMIN_IDS = %s", ADMIN_IDS)
+BAN_CONCURRENCY: int
+BAN_GLOBAL_RATE: float
+BAN_CHAT_RATE: float
+BAN_MAX_RETRIES: int
 
-if not MODERATED_CHAT_IDS:
-    logger.info(
-        "[config] инфо: MODERATED_CHAT_IDS пустой, периодическая проверка чатов выключена"
-    )
-else:
-    logger.info("[config] MODERATED_CHAT_IDS = %s", MODERATED_CHAT_IDS)
\ No newline at end of file
+CHECK_INTERVAL: int
+CHECK_JITTER: int
+CHECK_MAX_CONCURRENT_CHATS: int
+
+STATS_CACHE_TTL: float
+
+LOG_RETENTION_MONTHS: int
+LOG_ARCHIVE_DIR: str
+LOG_MAINTENANCE_INTERVAL: int
+
+AUDIT_QUEUE_SIZE: int
+AUDIT_BATCH_SIZE: int
+AUDIT_FLUSH_INTERVAL: float
+
+MEMBERSHIP_FLUSH_INTERVAL: float
+LAST_SEEN_FLUSH_INTERVAL: float
+
+ALLOWLIST_CACHE_GROUPS: int
+CHAT_CACHE_TTL: float
+
+ROLE_CACHE_TTL: float
+ROLE_CACHE_CHATS: int
+
+THROTTLE_RATE: int
+THROTTLE_PERIOD: float
+THROTTLE_COMMAND_LIMITS: Dict[str, Tuple[int, float]]
+THROTTLE_MAX_KEYS: int
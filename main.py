@@ -1,19 +1,12 @@
 import asyncio
 import logging
 
-from aiogram.filters import Command
-
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
 from aiogram.fsm.storage.memory import MemoryStorage
 
-from bot.handlers.start import router as start_router
-from bot.handlers.common import router as common_router
-from bot.handlers.admin import router as admin_router
-from bot.handlers import admin as admin_handlers, register_all_handlers
-
-from config import BOT_TOKEN
+import config
 
 # Базовая настройка логов
 logging.basicConfig(
@@ -23,34 +16,97 @@ logging.basicConfig(
 logger = logging.getLogger("dasha_bot")
 
 
+async def startup(bot: Bot) -> None:
+    """
+    Фаза старта: проверяем токен (get_me), поднимаем пул и пингуем бд -
+    одновременно, а не по очереди.
+    Без бд бот все равно запускается (ошибки будут в логах), без
+    валидного токена - нет.
+    """
+    from bot.database.connection import init_db
+
+    me, db_result = await asyncio.gather(
+        bot.get_me(),
+        init_db(),
+        return_exceptions=True,
+    )
+    if isinstance(me, BaseException):
+        raise me
+    if isinstance(db_result, BaseException):
+        logger.error(f"Database is not available on startup: {db_result}")
+    logger.info(f"Logged in as @{me.username}")
+
+
 async def main() -> None:
     """Точка входа для запуска бота."""
+    # Настройки читаем здесь, а не при импорте модулей
+    config.load()
+
+    from bot.database.connection import db
+    from bot.handlers import admin as admin_handlers, register_all_handlers
+    from bot.middleware import setup_middleware
+    from bot.services.audit_sink import audit_sink
+    from bot.services.chat_check_scheduler import ChatCheckScheduler
+    from bot.services.last_seen_buffer import last_seen_buffer
+    from bot.services.maintenance import MaintenanceLoop
+    from bot.services.membership_tracker import membership_tracker
+
     # Создаем бота
     bot = Bot(
-        token=BOT_TOKEN,
+        token=config.BOT_TOKEN,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML),
     )
 
     # Память — обычное in-memory хранилище FSM
     dp = Dispatcher(storage=MemoryStorage())
 
-    # Регистрируем все хендлеры
+    # Middleware (учет участников групп и т.п.)
+    setup_middleware(dp)
+
+    # Регистрируем все хендлеры (команды админа - в роутере admin)
     register_all_handlers(dp)
 
-    # Явно регистрируем команды админа
-    dp.message.register(admin_handlers.stats_cmd, Command("stats"))
-    dp.message.register(admin_handlers.cmd_force_check, Command("force_check"))
-    dp.message.register(admin_handlers.add_user_cmd, Command("adduser"))
-    dp.message.register(admin_handlers.del_user_cmd, Command("deluser"))
+    # Фоновая проверка чатов под модерацией
+    scheduler = ChatCheckScheduler(bot, check=admin_handlers.ban_blacklisted_in_chat)
+    # Партиции, итоги по часам и архивирование старых логов
+    maintenance = MaintenanceLoop()
 
     logger.info("Bot is starting...")
 
     try:
-        # Запускаем long-polling
-        await dp.start_polling(bot)
+        await startup(bot)
+        audit_sink.start()
+        scheduler.start()
+        maintenance.start()
+        membership_tracker.start()
+        last_seen_buffer.start()
+        # Запускаем long-polling; chat_member Telegram присылает,
+        # только если попросить явно - без него не видно, кто пришел/ушел
+        allowed_updates = dp.resolve_used_update_types()
+        for update_type in ("message", "chat_member", "my_chat_member"):
+            if update_type not in allowed_updates:
+                allowed_updates.append(update_type)
+        await dp.start_polling(bot, allowed_updates=allowed_updates)
     finally:
         logger.info("Bot is shutting down...")
+        await scheduler.stop()
+        await maintenance.stop()
+        # сбрасываем в бд замеченных участников групп, затем их last_seen
+        # (отметки для только что записанных участников иначе не найдут строк)
+        try:
+            await membership_tracker.stop()
+        except Exception as e:
+            logger.error(f"Failed to persist observed members: {str(e)}", exc_info=True)
+        try:
+            await last_seen_buffer.stop()
+        except Exception as e:
+            logger.error(f"Failed to write last_seen: {str(e)}", exc_info=True)
+        # дописываем в бд все, что успели положить в журнал
+        await audit_sink.stop()
+        # закрываем соединения пула
+        await db.close()
+        await bot.session.close()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
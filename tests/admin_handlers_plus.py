@@ -4,6 +4,7 @@ from config import ADMIN_IDS
 
 from bot.handlers import admin as admin_handlers
 from bot.database import repository
+from bot.database.repository import ChatCheck
 
 
 class FakeFromUser:
@@ -232,9 +233,9 @@ async def test_ban_blacklisted_handles_exceptions(monkeypatch):
     - на втором бан падает исключение, но функция не ломается
     """
 
-    async def fake_run_check_for_chat(chat_id: int):
+    async def fake_run_check_for_chat(chat_id: int, full: bool = False):
         # в черном списке два пользователя
-        return [111, 222]
+        return ChatCheck(ids=[111, 222], watermark=2)
 
     monkeypatch.setattr(
         repository.user_repo,
@@ -242,6 +243,11 @@ async def test_ban_blacklisted_handles_exceptions(monkeypatch):
         fake_run_check_for_chat,
     )
 
+    async def fake_confirm_chat_check(*args, **kwargs):
+        return None
+
+    monkeypatch.setattr(repository.user_repo, "confirm_chat_check", fake_confirm_chat_check)
+
     bot = FakeBot()
 
     async def broken_ban(chat_id: int, user_id: int):
@@ -375,9 +381,9 @@ async def test_force_check_bans_users_in_group(monkeypatch):
     """
     admin_id = ADMIN_IDS[0] if ADMIN_IDS else 1
 
-    async def fake_run_check_for_chat(chat_id: int):
+    async def fake_run_check_for_chat(chat_id: int, full: bool = False):
         # нашли трех нарушителей
-        return [101, 202, 303]
+        return ChatCheck(ids=[101, 202, 303], watermark=3)
 
     monkeypatch.setattr(
         repository.user_repo,
@@ -385,6 +391,11 @@ async def test_force_check_bans_users_in_group(monkeypatch):
         fake_run_check_for_chat,
     )
 
+    async def fake_confirm_chat_check(*args, **kwargs):
+        return None
+
+    monkeypatch.setattr(repository.user_repo, "confirm_chat_check", fake_confirm_chat_check)
+
     bot = FakeBot()
     msg = FakeMessage(from_user_id=admin_id, text="/force_check", chat_type="group")
     msg.bot = bot
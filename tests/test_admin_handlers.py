@@ -4,6 +4,7 @@ import pytest
 
 from bot.handlers.admin import add_user_cmd, del_user_cmd, stats_cmd, cmd_force_check
 from bot.database import repository
+from bot.database.repository import ChatCheck
 from config import ADMIN_IDS
 
 
@@ -92,10 +93,16 @@ async def test_stats_cmd_uses_repo(monkeypatch):
 async def test_cmd_force_check_bans_users(monkeypatch):
     admin_id = ADMIN_IDS[0] if ADMIN_IDS else 1
 
-    async def fake_run_check_for_chat(chat_id: int):
-        return [111, 222]
+    async def fake_run_check_for_chat(chat_id: int, full: bool = False):
+        return ChatCheck(ids=[111, 222], watermark=2)
+
+    confirmed = {}
+
+    async def fake_confirm_chat_check(chat_id, watermark):
+        confirmed.update(chat_id=chat_id, watermark=watermark)
 
     monkeypatch.setattr(repository.user_repo, "run_check_for_chat", fake_run_check_for_chat)
+    monkeypatch.setattr(repository.user_repo, "confirm_chat_check", fake_confirm_chat_check)
 
     bot = FakeBot()
     msg = FakeMessage(from_user_id=admin_id, chat_id=-100, text="/force_check")
@@ -104,4 +111,50 @@ async def test_cmd_force_check_bans_users(monkeypatch):
     await cmd_force_check(msg)
 
     assert bot.ban_calls, "force_check не попытался никого забанить"
-    assert msg._answers, "force_check ничего не ответил в чат"
\ No newline at end of file
+    assert msg._answers, "force_check ничего не ответил в чат"
+    # отметка из результата проверки уходит в confirm как есть
+    assert confirmed["chat_id"] == -100
+    assert confirmed["watermark"] == 2
+
+@pytest.mark.asyncio
+async def test_add_user_cmd_accepts_several_ids(monkeypatch):
+    admin_id = ADMIN_IDS[0] if ADMIN_IDS else 1
+
+    called: dict[str, list[int]] = {}
+
+    async def fake_add_many(user_ids) -> list[int]:
+        called["user_ids"] = list(user_ids)
+        return [2, 3]
+
+    monkeypatch.setattr(repository.user_repo, "add_many", fake_add_many)
+
+    msg = FakeMessage(from_user_id=admin_id, chat_id=-100, text="/adduser 1 2 3")
+    await add_user_cmd(msg)
+
+    assert called.get("user_ids") == [1, 2, 3]
+    assert "2 из 3" in msg._answers[0]
+
+
+@pytest.mark.asyncio
+async def test_stats_cmd_with_period_reads_rollups(monkeypatch):
+    admin_id = ADMIN_IDS[0] if ADMIN_IDS else 1
+
+    called: dict[str, object] = {}
+
+    async def fake_compact_rollups():
+        raise AssertionError("/stats не должен пересчитывать итоги сам")
+
+    async def fake_get_activity(period, chat_id=None):
+        called["period"] = period
+        called["chat_id"] = chat_id
+        return {"ban": 7}
+
+    monkeypatch.setattr(repository.user_repo, "compact_rollups", fake_compact_rollups)
+    monkeypatch.setattr(repository.user_repo, "get_activity", fake_get_activity)
+
+    msg = FakeMessage(from_user_id=admin_id, chat_id=-100, text="/stats 7d -100")
+    await stats_cmd(msg)
+
+    assert called["chat_id"] == -100
+    assert called["period"].days == 7
+    assert "Забанено в чатах: 7" in msg._answers[0]
@@ -20,4 +20,16 @@ def test_is_admin_uses_admin_ids():
 def test_get_args_parses_command_text():
     assert get_args("/adduser 123") == ["123"]
     assert get_args("/adduser") == []
-    assert get_args(None) == []
\ No newline at end of file
+    assert get_args(None) == []
+
+def test_logs_cursor_roundtrip_fits_callback_data():
+    import datetime
+
+    from bot.keyboards.admin import LogsPage, decode_cursor, encode_cursor
+
+    cursor = (datetime.datetime(2026, 10, 17, 12, 30, 15, 123456), 123456789)
+    ts, log_id = encode_cursor(cursor)
+    assert decode_cursor(ts, log_id) == cursor
+
+    packed = LogsPage(kind="c", value=-1001234567890, ts=ts, id=log_id).pack()
+    assert len(packed.encode()) <= 64
@@ -0,0 +1,100 @@
+import pytest
+import pytest_asyncio
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from bot.database.models import Base, Group, User
+from bot.database.repositories import AllowedUserRepository
+from bot.database.repositories.allowed_user_repository import AllowlistCache
+
+
+@pytest_asyncio.fixture
+async def engine(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'allowed.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield engine
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_checks_hit_cache_until_list_changes(engine):
+    factory = async_sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession)
+    cache = AllowlistCache(max_groups=10)
+    async with factory() as session:
+        group = Group(telegram_id=-100, title="g")
+        alice, bob = User(telegram_id=1), User(telegram_id=2)
+        session.add_all([group, alice, bob])
+        await session.flush()
+        await AllowedUserRepository(session, cache).add_allowed_user(alice.id, group.id)
+        await session.commit()
+
+    selects = []
+    event.listen(
+        engine.sync_engine, "before_cursor_execute",
+        lambda *args: selects.append(args[2]) if "allowed_users" in args[2] else None,
+    )
+
+    async with factory() as session:
+        repo = AllowedUserRepository(session, cache)
+        for _ in range(100):
+            assert await repo.is_allowed(alice.id, group.id)
+            assert not await repo.is_allowed(bob.id, group.id)
+        assert await repo.get_allowed_telegram_ids_for_group(group.id) == [1]
+        assert len(selects) == 1
+
+        await repo.add_allowed_user(bob.id, group.id)
+        assert await repo.is_allowed(bob.id, group.id)
+        assert await repo.remove_allowed_user(alice.id, group.id)
+        assert not await repo.is_allowed(alice.id, group.id)
+        await session.commit()
+
+
+def test_stale_read_is_not_cached_and_groups_are_evicted():
+    cache = AllowlistCache(max_groups=2)
+
+    version = cache.version(1)
+    cache.invalidate(1)  # список поменялся, пока шел запрос
+    cache.put(1, version, [(10, 100)])
+    assert cache.get(1) is None
+
+    cache.put(1, cache.version(1), [(11, 101)])
+    cache.put(2, cache.version(2), [])
+    assert cache.get(1).telegram_ids == {101}  # 1 теперь свежее 2
+    cache.put(3, cache.version(3), [(12, 102)])
+    assert len(cache) == 2
+    assert cache.get(2) is None
+    assert cache.get(1) is not None and cache.get(3) is not None
+
+
+@pytest.mark.asyncio
+async def test_cache_is_invalidated_only_after_commit(engine):
+    factory = async_sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession)
+    cache = AllowlistCache(max_groups=10)
+    async with factory() as session:
+        group = Group(telegram_id=-200, title="g")
+        alice, bob = User(telegram_id=1), User(telegram_id=2)
+        session.add_all([group, alice, bob])
+        await session.commit()
+
+    async with factory() as writer:
+        await AllowedUserRepository(writer, cache).add_allowed_user(alice.id, group.id)
+
+        # другая сессия коммита еще не видит; то, что она прочитала,
+        # не должно пережить коммит
+        async with factory() as reader:
+            assert not await AllowedUserRepository(reader, cache).is_allowed(alice.id, group.id)
+        await writer.commit()
+
+    async with factory() as reader:
+        assert await AllowedUserRepository(reader, cache).is_allowed(alice.id, group.id)
+
+    # откат тоже сбрасывает то, что успели прочитать, пока шла транзакция
+    async with factory() as writer:
+        repo = AllowedUserRepository(writer, cache)
+        assert await repo.remove_allowed_user(alice.id, group.id)
+        assert not await repo.is_allowed(alice.id, group.id)
+        await writer.rollback()
+
+    async with factory() as reader:
+        assert await AllowedUserRepository(reader, cache).is_allowed(alice.id, group.id)
@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from bot.database.models import ActionLog, Base, ModerationLog
+from bot.database.repository import UserRepository
+from bot.services.audit_sink import AuditSink
+
+
+@pytest_asyncio.fixture
+async def factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'audit.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession)
+    await engine.dispose()
+
+
+async def _count(factory, model) -> int:
+    async with factory() as session:
+        return await session.scalar(select(func.count()).select_from(model))
+
+
+@pytest.mark.asyncio
+async def test_sink_writes_batches_and_drains_on_stop(factory):
+    repo = UserRepository(session_factory=factory)
+    sink = AuditSink(factory, repo, max_size=100, batch_size=10, flush_interval=60)
+    sink.start()
+
+    for i in range(25):
+        await sink.log_action("user_removed", target_user_id=i)
+    await sink.log_moderation("ban", telegram_id=1, chat_id=-1)
+
+    # две полные пачки уходят сразу, не дожидаясь таймаута
+    for _ in range(50):
+        if await _count(factory, ActionLog) >= 20:
+            break
+        await asyncio.sleep(0.01)
+    assert await _count(factory, ActionLog) == 20
+
+    # остаток дописывается при остановке
+    await sink.stop()
+    assert await _count(factory, ActionLog) == 25
+    assert await _count(factory, ModerationLog) == 1
+    assert (await repo.get_stats())["total_actions"] == 1
+    assert sink.pending == 0
+
+
+@pytest.mark.asyncio
+async def test_full_queue_makes_writers_wait(factory):
+    sink = AuditSink(factory, UserRepository(session_factory=factory), max_size=2, batch_size=1)
+    gate = asyncio.Event()
+    real_write = sink._write
+
+    async def slow_write(batch):
+        await gate.wait()
+        await real_write(batch)
+
+    sink._write = slow_write
+    sink.start()
+
+    await sink.log_action("a")
+    await asyncio.sleep(0.01)  # задача забрала "a" и пишет ее
+    await sink.log_action("b")
+    await sink.log_action("c")
+    blocked = asyncio.create_task(sink.log_action("d"))
+    await asyncio.sleep(0.01)
+    assert not blocked.done()
+
+    gate.set()
+    await asyncio.wait_for(blocked, 1)
+    await sink.stop()
+    assert await _count(factory, ActionLog) == 4
+
+
+@pytest.mark.asyncio
+async def test_without_task_full_queue_is_flushed_by_writers(factory):
+    sink = AuditSink(factory, UserRepository(session_factory=factory), max_size=2, batch_size=10)
+
+    # фоновая задача не запущена - log_* не должен ждать вечно
+    for name in "abcde":
+        await asyncio.wait_for(sink.log_action(name), 1)
+    assert sink.pending <= 2
+
+    await sink.stop()
+    assert await _count(factory, ActionLog) == 5
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_retried_then_dropped(factory):
+    repo = UserRepository(session_factory=factory)
+    sink = AuditSink(factory, repo, batch_size=10, max_retries=3, retry_backoff=0)
+    real_write_logs = repo.write_logs
+    calls = []
+
+    async def flaky_write_logs(rows):
+        calls.append(len(rows))
+        if len(calls) < 3:
+            raise RuntimeError("db is down")
+        await real_write_logs(rows)
+
+    repo.write_logs = flaky_write_logs
+    await sink.log_action("cleanup")
+    await sink.log_moderation("ban", telegram_id=1, chat_id=-1)
+    await sink.flush()
+
+    # третья попытка прошла; action_logs не задвоились из-за повторов
+    assert calls == [1, 1, 1]
+    assert await _count(factory, ModerationLog) == 1
+    assert await _count(factory, ActionLog) == 1
+    assert sink.dropped == 0
+
+    async def broken_write_logs(rows):
+        raise RuntimeError("db is down")
+
+    repo.write_logs = broken_write_logs
+    await sink.log_moderation("ban", telegram_id=2, chat_id=-1)
+    await sink.flush()
+    assert sink.dropped == 1
@@ -0,0 +1,86 @@
+from types import SimpleNamespace
+
+import pytest
+import pytest_asyncio
+from aiogram.types import ChatMemberAdministrator, ChatMemberMember, ChatMemberOwner, User
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from bot.database.models import Base, User as DbUser
+from bot.services.authorization import Authorizer
+from bot.services.chat_cache import ChatCache
+
+
+def admin(uid, can_restrict=True):
+    # остальные права для проверки не важны (и их набор зависит от версии Bot API)
+    return ChatMemberAdministrator.model_construct(
+        status="administrator",
+        user=User(id=uid, is_bot=False, first_name="a"),
+        can_restrict_members=can_restrict,
+    )
+
+
+class FakeBot:
+    def __init__(self, members):
+        self.members = members
+        self.calls = 0
+
+    async def get_chat_administrators(self, chat_id):
+        self.calls += 1
+        return self.members
+
+
+@pytest_asyncio.fixture
+async def factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'roles.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    factory = async_sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession)
+    async with factory() as session:
+        session.add(DbUser(telegram_id=500, is_admin=True))
+        await session.commit()
+    yield factory
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_roles_merge_and_chat_admins_are_served_from_cache(factory, monkeypatch):
+    monkeypatch.setattr("config.ADMIN_IDS", [42], raising=False)
+    owner = ChatMemberOwner(user=User(id=10, is_bot=False, first_name="o"), is_anonymous=False)
+    bot = FakeBot([owner, admin(11), admin(12, can_restrict=False)])
+    roles = Authorizer(ChatCache(ttl=60), factory, ttl=60, max_chats=10)
+
+    assert await roles.can_moderate(42)
+    assert await roles.can_moderate(500)
+    assert not await roles.can_moderate(10)  # глобальная команда - права чата не в счет
+
+    for _ in range(10):
+        assert await roles.can_moderate(10, bot, -1)
+        assert await roles.can_moderate(11, bot, -1)
+        assert not await roles.can_moderate(12, bot, -1)
+        assert not await roles.can_moderate(13, bot, -1)
+    assert bot.calls == 1
+
+    # апдейты chat_member правят запись без запросов к API
+    roles.observe_member(-1, admin(13))
+    roles.observe_member(-1, ChatMemberMember(user=User(id=11, is_bot=False, first_name="x")))
+    assert await roles.can_moderate(13, bot, -1)
+    assert not await roles.can_moderate(11, bot, -1)
+    assert bot.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_chat_lists_are_bounded(factory):
+    bot = FakeBot([admin(11)])
+    roles = Authorizer(ChatCache(ttl=60), factory, ttl=60, max_chats=2)
+    for chat_id in (-1, -2, -3):
+        assert await roles.is_chat_admin(bot, chat_id, 11)
+    assert len(roles._chat_admins) == 2
+    assert list(roles._chat_admins) == [-2, -3]
+
+
+def test_is_admin_helper_only_checks_admin_ids(monkeypatch):
+    from bot.handlers.admin import is_admin
+
+    monkeypatch.setattr("config.ADMIN_IDS", [42], raising=False)
+    assert is_admin(SimpleNamespace(from_user=SimpleNamespace(id=42)))
+    assert not is_admin(SimpleNamespace(from_user=SimpleNamespace(id=500)))
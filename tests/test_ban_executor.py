@@ -0,0 +1,97 @@
+import pytest
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from aiogram.methods import BanChatMember
+
+from bot.services.ban_executor import (
+    BAN_FAILED,
+    BAN_OK,
+    BAN_RATE_LIMITED,
+    BanExecutor,
+)
+
+
+class FakeBot:
+    """
+    Бот, который:
+    - на 222 один раз отвечает retry_after,
+    - 333 забанить не может (BadRequest),
+    - 444 всегда упирается в flood control
+    """
+
+    def __init__(self):
+        self.calls: list[int] = []
+        self._retried: set[int] = set()
+
+    async def ban_chat_member(self, chat_id: int, user_id: int) -> None:
+        self.calls.append(user_id)
+        method = BanChatMember(chat_id=chat_id, user_id=user_id)
+
+        if user_id == 222 and user_id not in self._retried:
+            self._retried.add(user_id)
+            raise TelegramRetryAfter(method=method, message="flood", retry_after=0)
+        if user_id == 333:
+            raise TelegramBadRequest(method=method, message="user not found")
+        if user_id == 444:
+            raise TelegramRetryAfter(method=method, message="flood", retry_after=0)
+
+
+@pytest.mark.asyncio
+async def test_ban_many_reports_outcome_per_user():
+    executor = BanExecutor(concurrency=3, global_rate=1000, chat_rate=1000, max_retries=2)
+    bot = FakeBot()
+
+    outcomes = await executor.ban_many(bot, chat_id=-100, user_ids=[111, 222, 333, 444, 111])
+
+    # порядок как во входе, повторы схлопнуты
+    assert [o.user_id for o in outcomes] == [111, 222, 333, 444]
+    by_id = {o.user_id: o for o in outcomes}
+
+    assert by_id[111].status == BAN_OK
+    # после retry_after пользователя вернули в очередь и забанили
+    assert by_id[222].status == BAN_OK
+    assert by_id[222].attempts == 2
+    assert by_id[333].status == BAN_FAILED
+    assert by_id[444].status == BAN_RATE_LIMITED
+    assert bot.calls.count(444) == 2
+
+
+@pytest.mark.asyncio
+async def test_ban_many_empty_list_does_nothing():
+    executor = BanExecutor()
+    bot = FakeBot()
+
+    assert await executor.ban_many(bot, chat_id=-100, user_ids=[]) == []
+    assert bot.calls == []
+
+
+@pytest.mark.asyncio
+async def test_temporary_errors_are_retried_and_not_reported_as_failed():
+    from aiogram.exceptions import TelegramForbiddenError, TelegramNetworkError
+
+    from bot.services.ban_executor import BAN_ERROR
+
+    class FlakyBot:
+        def __init__(self):
+            self.calls: list[int] = []
+
+        async def ban_chat_member(self, chat_id: int, user_id: int) -> None:
+            self.calls.append(user_id)
+            method = BanChatMember(chat_id=chat_id, user_id=user_id)
+            if user_id == 1 and self.calls.count(1) == 1:
+                raise TelegramNetworkError(method=method, message="timeout")
+            if user_id == 2:
+                raise TelegramNetworkError(method=method, message="timeout")
+            if user_id == 3:
+                raise TelegramForbiddenError(method=method, message="not enough rights")
+
+    executor = BanExecutor(
+        concurrency=2, global_rate=1000, chat_rate=1000, max_retries=3, retry_backoff=0
+    )
+    bot = FlakyBot()
+    by_id = {o.user_id: o for o in await executor.ban_many(bot, -100, [1, 2, 3])}
+
+    assert by_id[1].ok and by_id[1].attempts == 2
+    assert by_id[2].status == BAN_ERROR and by_id[2].retryable
+    assert bot.calls.count(2) == 3
+    assert by_id[3].status == BAN_FAILED and not by_id[3].retryable
+    assert bot.calls.count(3) == 1
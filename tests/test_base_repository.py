@@ -0,0 +1,93 @@
+import pytest
+import pytest_asyncio
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from bot.database.models import Base, Group
+from bot.database.repositories import GroupMemberRepository, GroupRepository, UserRepository
+
+
+@pytest_asyncio.fixture
+async def engine(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'base.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield engine
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_writes_take_one_round_trip_each(engine):
+    factory = async_sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession)
+    statements = []
+    event.listen(
+        engine.sync_engine, "before_cursor_execute",
+        lambda *args: statements.append(args[2].split()[0].upper()),
+    )
+
+    async with factory() as session:
+        repo = GroupRepository(session)
+
+        group = await repo.create(telegram_id=-1, title="one")
+        # id, значение по умолчанию и серверное значение - из RETURNING
+        assert group.id and group.is_active and group.created_at is not None
+        assert statements == ["INSERT"]
+
+        updated = await repo.update(group.id, title="renamed")
+        assert updated is group and group.title == "renamed"
+        assert statements == ["INSERT", "UPDATE"]
+        assert await repo.update(10_000, title="missing") is None
+
+        statements.clear()
+        groups = await repo.create_many(
+            [{"telegram_id": -100 - i, "title": f"g{i}"} for i in range(2500)]
+        )
+        assert statements == ["INSERT"] * 3
+        assert [g.telegram_id for g in groups] == [-100 - i for i in range(2500)]
+        assert all(g.id and g.created_at is not None for g in groups)
+        await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_iterators_page_by_key_without_offset(engine):
+    factory = async_sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession)
+    async with factory() as session:
+        groups = await GroupRepository(session).create_many(
+            [{"telegram_id": -i, "title": f"g{i}"} for i in range(1, 251)]
+        )
+        users = await UserRepository(session).create_many(
+            [{"telegram_id": i, "is_active": i % 3 != 0} for i in range(1, 301)]
+        )
+        await GroupMemberRepository(session).upsert_many(
+            groups[0].id, ((u.id, "member") for u in users[:120])
+        )
+        await session.commit()
+
+    selects = []
+    event.listen(
+        engine.sync_engine, "before_cursor_execute",
+        lambda *args: selects.append(args[2]) if args[2].lstrip().startswith("SELECT") else None,
+    )
+
+    async with factory() as session:
+        repo = GroupRepository(session)
+        assert [g.telegram_id async for g in repo.iter_all(batch_size=100)] == [
+            g.telegram_id for g in groups
+        ]
+        # следующие страницы - по ключу (OFFSET SQLite рисует всегда, с 0)
+        assert len(selects) == 3
+        assert all("WHERE groups.id > ?" in sql for sql in selects[1:])
+
+        by_title = [g.title async for g in repo.iter_all(batch_size=40, order_by=Group.title)]
+        assert by_title == sorted(by_title) and len(by_title) == 250
+        assert len([g async for g in repo.stream(batch_size=64)]) == 250
+
+        user_repo = UserRepository(session)
+        active = [u.telegram_id for u in await user_repo.get_active_users()]
+        assert [u.telegram_id async for u in user_repo.iter_active_users(batch_size=7)] == active
+        assert [
+            u.telegram_id async for u in user_repo.iter_active_users(batch_size=7, server_side=True)
+        ] == active
+
+        members = GroupMemberRepository(session).iter_members_for_group(groups[0].id, batch_size=50)
+        assert [u.telegram_id async for u in members] == list(range(1, 121))
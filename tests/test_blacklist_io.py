@@ -0,0 +1,61 @@
+import datetime
+
+import pytest
+
+from bot.services.blacklist_io import (
+    IdFileParser,
+    open_id_file,
+    parse_id,
+    write_blacklist_csv_gz,
+)
+
+
+def test_parse_id_takes_first_field():
+    assert parse_id("123") == 123
+    assert parse_id("123,some_user") == 123
+    assert parse_id('"456";comment') == 456
+    assert parse_id("789 name") == 789
+    assert parse_id("abc") is None
+    assert parse_id("-5") is None
+    assert parse_id(str(2**63 - 1)) == 2**63 - 1
+    assert parse_id(str(2**63)) is None
+
+
+def test_parser_skips_header_and_counts_invalid():
+    lines = [
+        "telegram_id,username\n",
+        "111,u1\n",
+        "\n",
+        "# комментарий\n",
+        "oops\n",
+        "222\n",
+    ]
+    parser = IdFileParser()
+
+    assert list(parser.iter_ids(lines)) == [111, 222]
+    assert parser.invalid == 1
+
+
+def test_parser_rejects_ids_that_do_not_fit_bigint():
+    parser = IdFileParser()
+
+    ids = list(parser.iter_ids(["1\n", "99999999999999999999999\n", "2\n"]))
+
+    assert ids == [1, 2]
+    assert parser.invalid == 1
+
+
+@pytest.mark.asyncio
+async def test_export_file_can_be_imported_back(tmp_path):
+    async def chunks():
+        yield [(111, "u1", datetime.datetime(2026, 1, 1))]
+        yield [(222, None, None)]
+
+    path = str(tmp_path / "blacklist.csv.gz")
+    total = await write_blacklist_csv_gz(chunks(), path)
+    assert total == 2
+
+    parser = IdFileParser()
+    with open_id_file(path) as lines:
+        assert list(parser.iter_ids(lines)) == [111, 222]
+    assert parser.invalid == 0
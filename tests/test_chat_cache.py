@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+from bot.services.chat_cache import ChatCache
+
+
+class FakeBot:
+    def __init__(self):
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def get_chat_administrators(self, chat_id):
+        self.calls += 1
+        await self.release.wait()
+        return [f"admins-{self.calls}"]
+
+    async def get_chat(self, chat_id):
+        self.calls += 1
+        raise RuntimeError("chat not found")
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_call_until_invalidated():
+    bot = FakeBot()
+    cache = ChatCache(ttl=60)
+
+    waiters = [asyncio.create_task(cache.get_administrators(bot, -1)) for _ in range(20)]
+    await asyncio.sleep(0)
+    bot.release.set()
+    results = await asyncio.gather(*waiters)
+    assert bot.calls == 1
+    assert all(r == ["admins-1"] for r in results)
+
+    assert await cache.get_administrators(bot, -1) == ["admins-1"]
+    assert bot.calls == 1
+
+    cache.invalidate(-1, admins_only=True)
+    assert await cache.get_administrators(bot, -1) == ["admins-2"]
+    assert bot.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_errors_and_expired_entries_are_not_served():
+    bot = FakeBot()
+    bot.release.set()
+    cache = ChatCache(ttl=0)
+
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            await cache.get_chat(bot, -1)
+    assert bot.calls == 2
+
+    await cache.get_administrators(bot, -1)
+    await cache.get_administrators(bot, -1)
+    assert bot.calls == 4
@@ -0,0 +1,55 @@
+import asyncio
+import datetime
+
+import pytest
+
+from bot.services.chat_check_scheduler import ChatCheckScheduler
+
+
+class FakeRepo:
+    def __init__(self, chats, checked_at):
+        self._chats = chats
+        self._checked_at = checked_at
+
+    async def get_moderated_chats(self):
+        return list(self._chats)
+
+    async def get_chat_check_times(self):
+        return dict(self._checked_at)
+
+
+@pytest.mark.asyncio
+async def test_run_once_orders_by_last_check_and_skips_in_flight():
+    now = datetime.datetime.utcnow()
+    repo = FakeRepo(
+        chats=[-1, -2, -3],
+        checked_at={-1: now, -2: now - datetime.timedelta(hours=5)},
+    )
+
+    release = asyncio.Event()
+    checked: list[int] = []
+
+    async def slow_check(bot, chat_id):
+        checked.append(chat_id)
+        await release.wait()
+
+    scheduler = ChatCheckScheduler(
+        bot=None, check=slow_check, repo=repo, interval=0, jitter=0, max_concurrent=2
+    )
+
+    started = await scheduler.run_once()
+    # -3 ни разу не проверяли, потом самый старый -2
+    assert started == [-3, -2, -1]
+
+    await asyncio.sleep(0)
+    # одновременно проверяем не больше двух чатов
+    assert checked == [-3, -2]
+
+    # пока прошлые проверки идут, повторно их не запускаем
+    assert await scheduler.run_once() == []
+
+    release.set()
+    await asyncio.sleep(0.01)
+    assert checked == [-3, -2, -1]
+
+    await scheduler.stop()
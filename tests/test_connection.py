@@ -0,0 +1,30 @@
+import asyncio
+
+import pytest
+from sqlalchemy import text
+
+from bot.database.connection import Database, TimedQueuePool, pool_stats
+
+
+@pytest.mark.asyncio
+async def test_pool_stats_count_checkouts_and_in_use(tmp_path):
+    database = Database()
+    database.initialize(f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}")
+    assert isinstance(database.engine.pool, TimedQueuePool)
+
+    async def query():
+        async with database.get_session() as session:
+            await session.execute(text("SELECT 1"))
+
+    await asyncio.gather(*(query() for _ in range(5)))
+
+    async with database.engine.connect():
+        stats = pool_stats(database.engine)
+        assert stats["checked_out"] == 1
+
+    stats = pool_stats(database.engine)
+    assert stats["checked_out"] == 0
+    assert stats["checkouts"] >= 6
+    assert stats["wait_max_ms"] >= stats["wait_avg_ms"] >= 0
+
+    await database.close()
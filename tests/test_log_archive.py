@@ -0,0 +1,100 @@
+import datetime
+import gzip
+import json
+import os
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from bot.database.models import Base, ModerationLog
+from bot.services import log_archive as log_archive_module
+from bot.services.log_archive import LogArchive, month_bounds, shift_month
+
+
+def test_month_helpers():
+    assert shift_month((2026, 1), -1) == (2025, 12)
+    assert shift_month((2026, 11), 3) == (2027, 2)
+    assert month_bounds((2026, 12)) == (
+        datetime.datetime(2026, 12, 1),
+        datetime.datetime(2027, 1, 1),
+    )
+
+
+@pytest.mark.asyncio
+async def test_retention_archives_old_months_and_reads_them_back(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'logs.db'}")
+    factory = async_sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    now = datetime.datetime(2026, 10, 17)
+    async with factory() as session:
+        session.add_all(
+            [
+                ModerationLog(action="ban", telegram_id=1, chat_id=-1, created_at=datetime.datetime(2026, 1, 5)),
+                ModerationLog(action="add", telegram_id=2, created_at=datetime.datetime(2026, 1, 20)),
+                ModerationLog(action="ban", telegram_id=3, chat_id=-1, created_at=datetime.datetime(2026, 3, 1)),
+                ModerationLog(action="add", telegram_id=4, created_at=datetime.datetime(2026, 9, 30)),
+            ]
+        )
+        await session.commit()
+
+    archive = LogArchive(session_factory=factory, archive_dir=str(tmp_path / "archive"), retention_months=6)
+    entries = await archive.run_retention(now=now)
+
+    # январь и март старше полугода, сентябрь остается в бд
+    assert [(e["month"], e["rows"]) for e in entries] == [("2026-01", 2), ("2026-03", 1)]
+    async with factory() as session:
+        left = await session.scalar(select(func.count(ModerationLog.id)))
+    assert left == 1
+
+    # manifest описывает файлы, контрольная сумма сходится
+    manifest = archive.load_manifest()
+    assert manifest == entries
+    path = os.path.join(archive.archive_dir, manifest[0]["file"])
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        lines = f.readlines()
+    assert len(lines) == 2
+    assert json.loads(lines[0])["telegram_id"] == 1
+
+    assert [row["telegram_id"] for row in archive.iter_archived((2026, 1))] == [1, 2]
+    assert [row["telegram_id"] for row in archive.iter_archived((2026, 1), chat_id=-1)] == [1]
+
+    # повторный запуск ничего не делает
+    assert await archive.run_retention(now=now) == []
+
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_retry_after_failed_delete_does_not_duplicate_manifest(tmp_path, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'logs.db'}")
+    factory = async_sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with factory() as session:
+        session.add_all(
+            [
+                ModerationLog(action="ban", telegram_id=1, created_at=datetime.datetime(2026, 1, 5)),
+                ModerationLog(action="ban", telegram_id=2, created_at=datetime.datetime(2026, 1, 6)),
+            ]
+        )
+        await session.commit()
+
+    archive = LogArchive(session_factory=factory, archive_dir=str(tmp_path / "archive"))
+
+    # manifest уже записан, а до удаления строк не дошли
+    def broken_delete(*args, **kwargs):
+        raise RuntimeError("упали перед удалением")
+
+    monkeypatch.setattr(log_archive_module, "delete", broken_delete)
+    with pytest.raises(RuntimeError):
+        await archive.archive_month((2026, 1))
+    monkeypatch.undo()
+
+    entry = await archive.archive_month((2026, 1))
+    assert archive.load_manifest() == [entry]
+    assert [row["telegram_id"] for row in archive.iter_archived((2026, 1))] == [1, 2]
+
+    await engine.dispose()
@@ -0,0 +1,121 @@
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from bot.database.models import Base, Group, GroupMember, User
+from bot.database.repositories import GroupMemberRepository, UserRepository
+from bot.services.last_seen_buffer import LastSeenBuffer
+
+
+@pytest_asyncio.fixture
+async def engine(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'members.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield engine
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_bulk_member_sync_uses_few_statements(engine):
+    factory = async_sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession)
+    async with factory() as session:
+        group = Group(telegram_id=-100, title="g")
+        session.add(group)
+        session.add(User(telegram_id=1, username="old", first_name="Old"))
+        await session.commit()
+
+    statements = []
+    event.listen(
+        engine.sync_engine, "before_cursor_execute",
+        lambda *args: statements.append(args[2]),
+    )
+
+    profiles = [{"telegram_id": i, "username": None, "first_name": f"u{i}"} for i in range(1, 5001)]
+    async with factory() as session:
+        ids = await UserRepository(session).upsert_many(profiles)
+        written = await GroupMemberRepository(session).upsert_many(
+            group.id, ((ids[p["telegram_id"]], "member") for p in profiles)
+        )
+        await session.commit()
+
+    assert len(ids) == written == 5000
+    # по одному запросу на пачку из 1000 строк в каждую таблицу
+    assert len(statements) <= 10
+
+    async with factory() as session:
+        old = await session.scalar(select(User).where(User.telegram_id == 1))
+        # None не затирает известный username, новое имя записывается
+        assert (old.username, old.first_name) == ("old", "u1")
+        assert ids[1] == old.id
+
+    # повторная синхронизация обновляет статус, не создавая дублей
+    async with factory() as session:
+        ids = await UserRepository(session).upsert_many(profiles[:10])
+        await GroupMemberRepository(session).upsert_many(
+            group.id, [(ids[1], "restricted")]
+        )
+        await session.commit()
+        members = (await session.execute(select(GroupMember))).scalars().all()
+    assert len(members) == 5000
+    assert {m.status for m in members if m.user_id == ids[1]} == {"restricted"}
+
+
+@pytest.mark.asyncio
+async def test_remove_many_deletes_only_given_group(engine):
+    factory = async_sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession)
+    async with factory() as session:
+        first, second = Group(telegram_id=-1, title="a"), Group(telegram_id=-2, title="b")
+        session.add_all([first, second])
+        await session.flush()
+        ids = await UserRepository(session).upsert_many({"telegram_id": i} for i in range(1, 6))
+        repo = GroupMemberRepository(session)
+        for group in (first, second):
+            await repo.upsert_many(group.id, ((uid, "member") for uid in ids.values()))
+
+        removed = await repo.remove_many(first.id, [ids[1], ids[2], ids[2]])
+        await session.commit()
+
+        left = (await session.execute(select(GroupMember.group_id, GroupMember.user_id))).all()
+    assert removed == 2
+    assert len(left) == 8
+    assert (first.id, ids[1]) not in left and (second.id, ids[1]) in left
+
+
+@pytest.mark.asyncio
+async def test_last_seen_buffer_coalesces_into_one_statement(engine):
+    factory = async_sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession)
+    async with factory() as session:
+        group = Group(telegram_id=-100, title="g")
+        session.add(group)
+        await session.flush()
+        ids = await UserRepository(session).upsert_many(
+            {"telegram_id": i, "first_name": f"u{i}"} for i in range(1, 101)
+        )
+        await GroupMemberRepository(session).upsert_many(group.id, ((ids[i], "member") for i in ids))
+        await session.commit()
+
+    buffer = LastSeenBuffer(factory, interval=0)
+    base = datetime(2030, 1, 1)
+    for minute in range(50):
+        for user_tg in range(1, 101):
+            buffer.touch(-100, user_tg, base + timedelta(minutes=minute))
+    buffer.touch(-100, 1, base)  # более старая отметка не затирает свежую
+    buffer.touch(-100, 999, base)  # не участник - пропускается
+    assert buffer.pending == 101
+
+    statements = []
+    event.listen(
+        engine.sync_engine, "before_cursor_execute",
+        lambda *args: statements.append(args[2]),
+    )
+    assert await buffer.flush() == 101
+    assert buffer.pending == 0
+    assert sum(sql.lstrip().upper().startswith("UPDATE") for sql in statements) == 1
+
+    async with factory() as session:
+        seen = (await session.execute(select(GroupMember.last_seen))).scalars().all()
+    assert set(seen) == {base + timedelta(minutes=49)}
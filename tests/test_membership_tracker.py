@@ -0,0 +1,114 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+import pytest_asyncio
+from aiogram.types import Chat, ChatMemberLeft, ChatMemberMember, ChatMemberUpdated, Message, User
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from bot.database.models import Base, GroupMember
+from bot.middleware.membership import MembershipMiddleware
+from bot.services.last_seen_buffer import LastSeenBuffer
+from bot.services.membership_tracker import MembershipTracker
+
+CHAT = Chat(id=-100, type="supergroup", title="g")
+
+
+def user(uid, **kwargs):
+    return User(id=uid, is_bot=False, first_name=f"u{uid}", **kwargs)
+
+
+@pytest_asyncio.fixture
+async def factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'tracker.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession)
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_observed_members_survive_restart(factory):
+    tracker = MembershipTracker(factory, interval=0)
+    tracker.observe(-100, user(1), title="g")
+    tracker.observe(-100, user(2), status="administrator")
+    tracker.observe(-100, user(2))  # сообщение от админа не понижает статус
+    tracker.observe(-100, User(id=3, is_bot=True, first_name="bot"))
+    tracker.observe(-100, user(4))
+    tracker.forget(-100, 4)
+
+    assert await tracker.flush() == 2
+    assert await tracker.flush() == 0
+
+    async with factory() as session:
+        rows = (await session.execute(select(GroupMember.status))).scalars().all()
+    assert sorted(rows) == ["administrator", "member"]
+
+    fresh = MembershipTracker(factory, interval=0)
+    fresh.forget(-100, 1)
+    members = await fresh.members(-100)
+    assert [(m.user.id, m.status) for m in members] == [(2, "administrator")]
+
+    await fresh.flush()
+    async with factory() as session:
+        rows = (await session.execute(select(GroupMember))).scalars().all()
+    assert len(rows) == 1
+
+
+@pytest.mark.asyncio
+async def test_middleware_tracks_messages_and_chat_member_updates(factory):
+    tracker = MembershipTracker(factory, interval=0)
+    last_seen = LastSeenBuffer(factory, interval=0)
+    middleware = MembershipMiddleware(tracker, last_seen)
+    now = datetime.now()
+
+    async def handler(event, data):
+        return "handled"
+
+    joined = Message(
+        message_id=1, date=now, chat=CHAT, from_user=user(1), new_chat_members=[user(2), user(3)]
+    )
+    left = ChatMemberUpdated(
+        chat=CHAT, from_user=user(3), date=now,
+        old_chat_member=ChatMemberMember(user=user(3)),
+        new_chat_member=ChatMemberLeft(user=user(3)),
+    )
+    private = Message(message_id=2, date=now, chat=Chat(id=5, type="private"), from_user=user(5))
+
+    for event in (joined, left, private):
+        assert await middleware(handler, event, {}) == "handled"
+
+    members = await tracker.members(-100)
+    assert sorted(m.user.id for m in members) == [1, 2]
+    assert await tracker.members(5) == []
+    assert last_seen.pending == 1
+
+
+@pytest.mark.asyncio
+async def test_only_own_bot_leaving_drops_chat_and_pending_changes_survive(factory):
+    tracker = MembershipTracker(factory, interval=0)
+    middleware = MembershipMiddleware(tracker, LastSeenBuffer(factory, interval=0))
+    now = datetime.now()
+    tracker.observe(-100, user(1))
+
+    def kicked(uid):
+        bot_user = User(id=uid, is_bot=True, first_name="bot")
+        return ChatMemberUpdated(
+            chat=CHAT, from_user=user(1), date=now,
+            old_chat_member=ChatMemberMember(user=bot_user),
+            new_chat_member=ChatMemberLeft(user=bot_user),
+        )
+
+    async def handler(event, data):
+        return None
+
+    own_bot = SimpleNamespace(id=777)
+    await middleware(handler, kicked(555), {"bot": own_bot})  # чужой бот
+    assert [m.user.id for m in await tracker.members(-100)] == [1]
+
+    await middleware(handler, kicked(777), {"bot": own_bot})  # наш бот
+    assert await tracker.flush() == 1
+    async with factory() as session:
+        rows = (await session.execute(select(GroupMember))).scalars().all()
+    assert len(rows) == 1
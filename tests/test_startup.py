@@ -0,0 +1,25 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_importing_bot_modules_does_not_read_settings_or_create_engine():
+    # в чистом процессе, чтобы не зависеть от того, что уже импортировали другие тесты
+    code = (
+        "import config\n"
+        "import main\n"
+        "import bot.handlers.admin\n"
+        "import bot.services.audit_sink, bot.services.maintenance\n"
+        "import bot.database.connection as connection\n"
+        "assert config._exports is None, 'settings were loaded on import'\n"
+        "assert connection._engine is None, 'engine was created on import'\n"
+        "config.load()\n"
+        "assert config.BOT_TOKEN == 'lazy:token'\n"
+    )
+    env = dict(os.environ, BOT_TOKEN="lazy:token")
+    proc = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    assert proc.returncode == 0, proc.stderr
@@ -0,0 +1,114 @@
+from types import SimpleNamespace
+
+import pytest
+from aiogram.types import Message
+
+from bot.middleware.throttling import GCRALimiter, ThrottlingMiddleware
+
+
+def test_gcra_allows_burst_then_steady_rate():
+    limiter = GCRALimiter(3, 6.0, max_keys=100)
+    assert [limiter.hit("u", now=0.0)[0] for _ in range(4)] == [True, True, True, False]
+    allowed, retry_after = limiter.hit("u", now=0.0)
+    assert not allowed and retry_after == pytest.approx(2.0)
+    assert limiter.hit("u", now=2.0)[0]
+    assert not limiter.hit("u", now=2.0)[0]
+
+
+def test_idle_keys_are_evicted_and_memory_is_capped():
+    limiter = GCRALimiter(1, 1.0, max_keys=1000)
+    for user_id in range(1000):
+        limiter.hit(user_id, now=0.0)
+    assert len(limiter) == 1000
+    limiter.hit("late", now=5.0)  # все прежние ключи давно отдохнули
+    assert len(limiter) == 1
+
+    for user_id in range(5000):
+        limiter.hit(user_id, now=10.0)
+    assert len(limiter) == 1000
+
+
+class FakeRoles:
+    @staticmethod
+    def is_bot_admin(user_id):
+        return user_id == 1
+
+    async def is_db_admin(self, user_id):
+        return user_id == 2
+
+
+def message(user_id, text, answers, chat_type="private"):
+    msg = Message.model_construct(
+        message_id=1,
+        text=text,
+        from_user=SimpleNamespace(id=user_id),
+        chat=SimpleNamespace(id=-100 if chat_type != "private" else user_id, type=chat_type),
+        date=None,
+    )
+
+    async def answer(text, **kwargs):
+        answers.append(text)
+
+    object.__setattr__(msg, "answer", answer)
+    return msg
+
+
+@pytest.mark.asyncio
+async def test_middleware_limits_commands_warns_once_and_skips_admins():
+    middleware = ThrottlingMiddleware(
+        rate=100, period=60, command_limits={"stats": (1, 60)}, max_keys=100, roles=FakeRoles()
+    )
+    handled, answers = [], []
+
+    async def handler(event, data):
+        handled.append(event.text)
+
+    for _ in range(5):
+        await middleware(handler, message(7, "/stats@my_bot week", answers), {})
+    await middleware(handler, message(7, "/logs", answers), {})
+    assert handled == ["/stats@my_bot week", "/logs"]
+    assert len(answers) == 1 and "Слишком часто" in answers[0]
+
+    for admin_id in (1, 2):
+        for _ in range(5):
+            await middleware(handler, message(admin_id, "/stats", answers), {})
+    assert len(handled) == 12 and len(answers) == 1
+
+
+@pytest.mark.asyncio
+async def test_plain_group_messages_are_never_throttled_or_answered():
+    middleware = ThrottlingMiddleware(
+        rate=1, period=60, command_limits={}, max_keys=100, roles=FakeRoles()
+    )
+    handled, answers = [], []
+
+    async def handler(event, data):
+        handled.append(event.text)
+
+    for i in range(10):
+        await middleware(handler, message(7, f"привет {i}", answers, "supergroup"), {})
+    assert len(handled) == 10 and answers == []
+
+    # команды в группе по-прежнему считаются
+    await middleware(handler, message(7, "/stats", answers, "group"), {})
+    await middleware(handler, message(7, "/stats", answers, "group"), {})
+    assert len(handled) == 11 and len(answers) == 1
+
+
+@pytest.mark.asyncio
+async def test_command_in_document_caption_is_limited():
+    middleware = ThrottlingMiddleware(
+        rate=100, period=60, command_limits={"importblacklist": (1, 60)}, max_keys=100, roles=FakeRoles()
+    )
+    handled, answers = [], []
+
+    async def handler(event, data):
+        handled.append(event.caption)
+
+    for _ in range(3):
+        msg = message(7, None, answers, "group")
+        object.__setattr__(msg, "caption", "/importblacklist")
+        object.__setattr__(msg, "document", SimpleNamespace(file_id="f"))
+        await middleware(handler, msg, {})
+    assert handled == ["/importblacklist"]
+    assert len(answers) == 1
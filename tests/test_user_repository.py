@@ -1,17 +1,20 @@
+import datetime
 import os
+import tempfile
 
-# для тестов используем отдельную SQLite-базу
-os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///./test_repo.db")
+# для тестов - отдельная SQLite-база во временной папке: каждый прогон
+# начинается с пустой базы и не пачкает рабочее дерево
+TEST_DB_URL = f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(prefix='bot_tests_'), 'test_repo.db')}"
+os.environ.setdefault("DATABASE_URL", TEST_DB_URL)
 
 import pytest
 import pytest_asyncio
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 
 from bot.database.models import Base
 from bot.database.repository import UserRepository
 
-TEST_DB_URL = "sqlite+aiosqlite:///./test_repo.db"
-
 # движок для тестовой бд
 test_engine = create_async_engine(TEST_DB_URL, echo=False)
 TestSessionFactory = async_sessionmaker(
@@ -63,6 +66,202 @@ async def test_run_check_for_chat_returns_list(repo: UserRepository):
 
     result = await repo.run_check_for_chat(chat_id=-100)
 
-    assert isinstance(result, list)
-    assert 111 in result
-    assert 222 in result
\ No newline at end of file
+    assert isinstance(result.ids, list)
+    assert 111 in result.ids
+    assert 222 in result.ids
+    assert result.watermark > 0
+
+@pytest.mark.asyncio
+async def test_blacklist_reads_see_writes_of_other_repositories(repo: UserRepository):
+    await repo.add_to_blacklist(user_id=333, username="u3")
+    assert await repo.is_blacklisted(333) is True
+    assert 333 in await repo.get_blacklisted_ids()
+
+    # другой репозиторий (другой процесс) видит то же самое
+    other = UserRepository(session_factory=TestSessionFactory)
+    assert await other.is_blacklisted(333) is True
+
+    await repo.remove_from_blacklist(user_id=333)
+    assert await repo.is_blacklisted(333) is False
+
+    # и удаление второй репозиторий видит сразу
+    assert await other.remove_from_blacklist(user_id=333) is False
+    assert await other.is_blacklisted(333) is False
+
+
+@pytest.mark.asyncio
+async def test_run_check_for_chat_is_incremental(repo: UserRepository):
+    chat_id = -200
+    await repo.add_to_blacklist(user_id=501, username="u501")
+
+    first = await repo.run_check_for_chat(chat_id=chat_id)
+    assert 501 in first.ids
+    await repo.confirm_chat_check(chat_id, first.watermark)
+
+    # после подтвержденной проверки отдаем только новых
+    await repo.add_to_blacklist(user_id=502, username="u502")
+    delta = await repo.run_check_for_chat(chat_id=chat_id)
+    assert delta.ids == [502]
+
+    # без confirm отметка не сдвигается
+    again = await repo.run_check_for_chat(chat_id=chat_id)
+    assert again.ids == [502]
+    await repo.confirm_chat_check(chat_id, again.watermark)
+    assert (await repo.run_check_for_chat(chat_id=chat_id)).ids == []
+
+    # полная пересинхронизация отдает весь чс
+    full = await repo.run_check_for_chat(chat_id=chat_id, full=True)
+    assert {501, 502} <= set(full.ids)
+
+
+@pytest.mark.asyncio
+async def test_overlapping_checks_keep_their_own_watermarks(repo: UserRepository):
+    chat_id = -210
+    await repo.add_to_blacklist(user_id=511)
+
+    # первая проверка чата еще идет, а в чс уже добавили нового
+    # и запустили вторую
+    older = await repo.run_check_for_chat(chat_id=chat_id)
+    await repo.add_to_blacklist(user_id=512)
+    newer = await repo.run_check_for_chat(chat_id=chat_id, full=True)
+    assert 512 not in older.ids and 512 in newer.ids
+
+    # первая закончилась раньше: отметка - ее, 512 еще не проверен
+    await repo.confirm_chat_check(chat_id, older.watermark)
+    assert (await repo.run_check_for_chat(chat_id=chat_id)).ids == [512]
+
+    # вторая подтвердилась, а запоздавший confirm первой отметку не откатит
+    await repo.confirm_chat_check(chat_id, newer.watermark)
+    await repo.confirm_chat_check(chat_id, older.watermark)
+    assert (await repo.run_check_for_chat(chat_id=chat_id)).ids == []
+
+
+@pytest.mark.asyncio
+async def test_import_blacklist_counts_inserted_and_duplicates(repo: UserRepository):
+    await repo.add_to_blacklist(user_id=601, username="u601")
+
+    counts = await repo.import_blacklist([601, 602, 603, 603, 604], batch_size=2)
+
+    assert counts == {"inserted": 3, "duplicates": 2, "failed": 0}
+    assert await repo.is_blacklisted(604) is True
+
+
+@pytest.mark.asyncio
+async def test_import_blacklist_stops_on_db_error_and_keeps_committed(repo: UserRepository):
+    real_insert = repo._insert_blacklist_rows
+    calls = []
+
+    async def flaky_insert(session, rows):
+        calls.append(len(rows))
+        if len(calls) == 2:
+            raise SQLAlchemyError("db is down")
+        return await real_insert(session, rows)
+
+    repo._insert_blacklist_rows = flaky_insert
+    counts = await repo.import_blacklist([611, 612, 613, 614, 615], batch_size=2)
+
+    # первая пачка записана, на второй импорт остановился
+    assert counts == {"inserted": 2, "duplicates": 0, "failed": 2}
+    assert calls == [2, 2]
+    assert await repo.is_blacklisted(612) is True
+    assert await repo.is_blacklisted(613) is False
+
+
+@pytest.mark.asyncio
+async def test_iter_blacklist_streams_in_chunks(repo: UserRepository):
+    await repo.import_blacklist([701, 702, 703])
+
+    chunks = [chunk async for chunk in repo.iter_blacklist(chunk_size=2)]
+
+    assert all(len(chunk) <= 2 for chunk in chunks)
+    ids = [row.telegram_id for chunk in chunks for row in chunk]
+    assert {701, 702, 703} <= set(ids)
+
+
+@pytest.mark.asyncio
+async def test_add_many_and_remove_many(repo: UserRepository):
+    await repo.add_to_blacklist(user_id=801)
+
+    added = await repo.add_many([801, 802, 803, 803], batch_size=2)
+    assert sorted(added) == [802, 803]
+    assert await repo.is_blacklisted(803) is True
+
+    removed = await repo.remove_many([802, 803, 804])
+    assert sorted(removed) == [802, 803]
+    assert await repo.is_blacklisted(802) is False
+    assert await repo.is_blacklisted(801) is True
+
+
+@pytest.mark.asyncio
+async def test_get_stats_uses_counters_and_cache(repo: UserRepository):
+    before = await repo.get_stats()
+
+    await repo.add_many([901, 902])
+    await repo.remove_from_blacklist(user_id=901)
+
+    after = await repo.get_stats()
+    assert after["blacklist_count"] == before["blacklist_count"] + 1
+    # 2 add + 1 remove
+    assert after["total_actions"] == before["total_actions"] + 3
+    assert after["last_action"] == "remove (user_id=901)"
+
+    # счетчики совпадают с честным count(*)
+    fresh = UserRepository(session_factory=TestSessionFactory)
+    ids = await fresh.get_blacklisted_ids()
+    assert after["blacklist_count"] == len(ids)
+
+    # без изменений второй вызов отдает кэш, не трогая бд
+    async def broken_load():
+        raise AssertionError("должны были отдать из кэша")
+
+    repo._load_stats = broken_load
+    assert await repo.get_stats() == after
+
+
+@pytest.mark.asyncio
+async def test_rollups_are_idempotent_and_filter_by_chat(repo: UserRepository):
+    chat_id = -300
+    week = datetime.timedelta(days=7)
+
+    check = await repo.run_check_for_chat(chat_id=chat_id)
+    await repo.confirm_chat_check(chat_id, check.watermark)
+    await repo.write_logs(
+        [{"action": "ban", "telegram_id": uid, "chat_id": chat_id, "details": None} for uid in (11, 12)]
+    )
+
+    await repo.compact_rollups()
+    first = await repo.get_activity(week, chat_id=chat_id)
+    assert first == {"check_chat": 1, "ban": 2}
+
+    # повторный пересчет без новых логов ничего не меняет
+    assert await repo.compact_rollups() == 0
+    assert await repo.get_activity(week, chat_id=chat_id) == first
+
+    # новый лог в том же часе пересчитывает час целиком, без задвоения
+    await repo.run_check_for_chat(chat_id=chat_id)
+    await repo.compact_rollups()
+    second = await repo.get_activity(week, chat_id=chat_id)
+    assert second == {"check_chat": 2, "ban": 2}
+
+    total = await repo.get_activity(week)
+    assert total["ban"] >= 2
+
+
+@pytest.mark.asyncio
+async def test_get_logs_page_keyset_pagination(repo: UserRepository):
+    await repo.add_many([1001, 1002, 1003, 1004, 1005])
+
+    seen: list[int] = []
+    cursor = None
+    while True:
+        rows, cursor = await repo.get_logs_page(limit=2, before=cursor, telegram_id=None)
+        seen.extend(row.id for row in rows)
+        if cursor is None:
+            break
+
+    # все строки лога ровно по разу, от новых к старым
+    assert len(seen) == len(set(seen))
+    assert seen == sorted(seen, reverse=True)
+
+    rows, _ = await repo.get_logs_page(limit=10, telegram_id=1003)
+    assert [row.action for row in rows] == ["add"]